@@ -0,0 +1,123 @@
+import json
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional
+
+from app.config import settings
+from app.redis_client import redis_client, async_redis_client
+
+# Сигналы перегрузки сайта
+OVERLOAD_STATUSES = {429, 503}
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After в секундах: число или HTTP-дата"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class DomainState:
+    def __init__(self, limit: float, delay: float):
+        self.limit = limit
+        self.delay = delay
+        self.latency = None
+        self.baseline_latency = None
+        self.samples = 0
+        self.last_decrease = 0.0
+
+    def to_dict(self) -> Dict:
+        return {
+            "limit": round(self.limit, 2),
+            "delay": round(self.delay, 3),
+            "latency": round(self.latency or 0, 3),
+            "baseline_latency": round(self.baseline_latency or 0, 3)
+        }
+
+
+class AdaptiveController:
+    """AIMD по доменам: лимит параллельности растёт на единицу за "окно" успешных
+    ответов и пауза между запросами уменьшается; на 429/503, таймаутах и всплесках
+    задержки лимит умножается на ADAPTIVE_DECREASE, а пауза удваивается.
+    """
+
+    SNAPSHOT_KEY = "adaptive:domains"
+
+    def __init__(self):
+        self.enabled = settings.ADAPTIVE_CONCURRENCY_ENABLED
+        self.min_limit = settings.ADAPTIVE_MIN_CONCURRENCY
+        self.max_limit = settings.ADAPTIVE_MAX_CONCURRENCY
+        self.min_delay = settings.ADAPTIVE_MIN_DELAY
+        self.max_delay = settings.ADAPTIVE_MAX_DELAY
+        self.domains: Dict[str, DomainState] = {}
+
+    def _state(self, domain: str) -> DomainState:
+        state = self.domains.get(domain)
+        if state is None:
+            state = DomainState(settings.MAX_CONCURRENT_REQUESTS_PER_DOMAIN, settings.REQUEST_DELAY)
+            # Новый воркер начинает с того, до чего уже дошли остальные
+            snapshot = redis_client.hget(self.SNAPSHOT_KEY, domain)
+            if snapshot:
+                data = json.loads(snapshot)
+                state.limit, state.delay = data["limit"], data["delay"]
+            self.domains[domain] = state
+        return state
+
+    def limit(self, domain: str) -> int:
+        if not self.enabled:
+            return settings.MAX_CONCURRENT_REQUESTS_PER_DOMAIN
+        return max(self.min_limit, int(self._state(domain).limit))
+
+    def delay(self, domain: str) -> float:
+        if not self.enabled:
+            return settings.REQUEST_DELAY
+        return self._state(domain).delay
+
+    async def record(self, domain: str, status: Optional[int], latency: float, timed_out: bool = False) -> None:
+        """Учитывает результат запроса к домену и подстраивает лимит и паузу"""
+        if not self.enabled:
+            return
+        state = self._state(domain)
+
+        spike = False
+        if latency is not None and not timed_out:
+            state.samples += 1
+            if state.baseline_latency is None:
+                state.latency = state.baseline_latency = latency
+            else:
+                spike = state.samples > 5 and latency > settings.ADAPTIVE_LATENCY_SPIKE * state.baseline_latency
+                state.latency = 0.7 * state.latency + 0.3 * latency
+                state.baseline_latency = 0.95 * state.baseline_latency + 0.05 * latency
+
+        if timed_out or status in OVERLOAD_STATUSES or spike:
+            now = time.monotonic()
+            # Одновременные ошибки одной волны снижают лимит один раз
+            if now - state.last_decrease < max(state.latency or 0, 1.0):
+                return
+            state.last_decrease = now
+            state.limit = max(self.min_limit, state.limit * settings.ADAPTIVE_DECREASE)
+            state.delay = min(self.max_delay, max(state.delay * 2, self.min_delay or 0.1))
+        elif status is not None and status < 400:
+            state.limit = min(self.max_limit, state.limit + 1 / max(state.limit, 1))
+            state.delay = max(self.min_delay, state.delay - settings.ADAPTIVE_DELAY_STEP / max(state.limit, 1))
+        else:
+            return
+
+        await async_redis_client.hset(self.SNAPSHOT_KEY, domain, json.dumps(state.to_dict()))
+
+    @classmethod
+    def get_stats(cls) -> Dict:
+        """Текущие лимиты и паузы по доменам (последнее, что сообщили воркеры)"""
+        return {
+            k.decode('utf-8'): json.loads(v) for k, v in redis_client.hgetall(cls.SNAPSHOT_KEY).items()
+        }
+
+
+adaptive_controller = AdaptiveController()
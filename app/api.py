@@ -1,18 +1,45 @@
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
-from typing import Optional, Dict, Any, List
-from app.tasks import scrape_url
-from app.redis_client import get_task_result
-from app.domain_limiter import domain_limiter
+from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, Field
+from typing import Optional, Dict, Any, List, Literal
+from app.tasks import scrape_batch, enqueue_scrape, crawl_site
+from app.redis_client import (
+    get_task_result_async, get_task_index_async, read_task_items, count_task_items, get_batch_result
+)
+from app.domain_limiter import domain_limiter, get_domain_stats
+from app.http_pool import HttpPool, limit_per_host
+from app.transports import get_transport_stats
+from app.http_cache import ResponseCache
+from app.proxy_pool import ProxyPool
+from app.feed_discovery import FeedDiscovery
+from app.result_store import result_store
+from app import dedup, fair_queue, change_feed
+from app.crawler import CrawlFrontier
+from app.task_events import task_events, TERMINAL_STATUSES
+from app.metrics import TASKS_SUBMITTED, render_metrics
+from app.config import settings
+import asyncio
+import json
 import uvicorn
+import uuid
 
 app = FastAPI(title="Web Scraper API", description="A FastAPI application for web scraping")
 
 class TaskRequest(BaseModel):
     url: str
+    # interactive - одиночные срочные запросы, bulk - массовая загрузка
+    priority: Literal["interactive", "bulk"] = "bulk"
+    # Вернуть только новости, которых по этому источнику ещё не было
+    incremental: bool = False
+
+class BatchTaskRequest(BaseModel):
+    urls: List[str]
 
 class TaskResponse(BaseModel):
     task_id: str
+    # "inflight" - присоединились к уже идущей задаче, "fresh" - отдан недавний результат
+    deduplicated: Optional[str] = None
 
 class NewsItem(BaseModel):
     entity_title: str
@@ -24,17 +51,146 @@ class TaskStatusResponse(BaseModel):
     data: Optional[List[NewsItem]] = None
     error: Optional[str] = None
 
+class TaskItemsResponse(BaseModel):
+    status: str
+    total: int = 0
+    # Новости без проверки по NewsItem: с fields в них только запрошенные поля
+    items: List[Dict[str, Any]] = []
+    # Передайте как cursor, чтобы получить следующую страницу; None - дальше новостей нет
+    next_cursor: Optional[str] = None
+    error: Optional[str] = None
+
+class BatchItemStatus(BaseModel):
+    url: str
+    status: str
+    data: Optional[List[NewsItem]] = None
+    error: Optional[str] = None
+
+class BatchStatusResponse(BaseModel):
+    status: str
+    total: int = 0
+    completed: int = 0
+    items: List[BatchItemStatus] = []
+
+class CrawlRequest(BaseModel):
+    url: str
+    max_depth: int = Field(2, ge=0, le=settings.CRAWL_MAX_DEPTH)
+    max_pages: int = Field(100, ge=1, le=settings.CRAWL_MAX_PAGES)
+
+class CrawlPage(BaseModel):
+    url: str
+    depth: int
+    items: Optional[List[NewsItem]] = None
+    error: Optional[str] = None
+
+class CrawlStatusResponse(BaseModel):
+    status: str
+    start_url: Optional[str] = None
+    max_depth: int = 0
+    max_pages: int = 0
+    pages_done: int = 0
+    pages_failed: int = 0
+    items_found: int = 0
+    urls_seen: int = 0
+    frontier_size: int = 0
+    pages_stored: int = 0
+    elapsed_seconds: float = 0
+    pages_per_second: float = 0
+    pages: List[CrawlPage] = []
+
+class FeedResponse(BaseModel):
+    source: str
+    items: List[NewsItem]
+    # Передайте в следующий запрос, чтобы получить только то, что появилось после
+    cursor: str
+
 @app.post("/tasks", response_model=TaskResponse)
 async def create_task(request: TaskRequest):
     if not request.url:
         raise HTTPException(status_code=400, detail="URL is required")
     
-    task = scrape_url.delay(request.url)
+    task_id = str(uuid.uuid4())
+    # Синхронные вызовы Redis и публикации в брокер - в пуле потоков, не в event loop API
+    # Результат инкрементальной задачи зависит от того, что видели раньше, поэтому его не склеиваем
+    if not settings.DEDUP_ENABLED or request.incremental:
+        await run_in_threadpool(enqueue_scrape, request.url, task_id, request.priority, request.incremental)
+        TASKS_SUBMITTED.labels("scrape", "new").inc()
+        return TaskResponse(task_id=task_id)
+
+    source, task_id = await run_in_threadpool(dedup.claim, request.url, task_id)
+    TASKS_SUBMITTED.labels("scrape", source).inc()
+    if source == "new":
+        try:
+            await run_in_threadpool(enqueue_scrape, request.url, task_id, request.priority)
+        except Exception:
+            # Задача не поставлена: иначе следующие запросы этого URL ждали бы её до истечения отметки
+            await run_in_threadpool(dedup.release, request.url, task_id, success=False)
+            raise
+        return TaskResponse(task_id=task_id)
+
+    return TaskResponse(task_id=task_id, deduplicated=source)
+
+@app.post("/tasks/batch", response_model=TaskResponse)
+async def create_batch_task(request: BatchTaskRequest):
+    urls = list(dict.fromkeys(url for url in request.urls if url))
+    if not urls:
+        raise HTTPException(status_code=400, detail="At least one URL is required")
+    if len(urls) > settings.BATCH_MAX_URLS:
+        raise HTTPException(status_code=400, detail=f"Too many URLs (max {settings.BATCH_MAX_URLS})")
+
+    task = await run_in_threadpool(scrape_batch.delay, urls)
+    TASKS_SUBMITTED.labels("batch", "new").inc()
+    return TaskResponse(task_id=task.id)
+
+@app.get("/tasks/batch/{batch_id}", response_model=BatchStatusResponse)
+def get_batch_status(batch_id: str):
+    result = get_batch_result(batch_id)
+
+    if not result:
+        return BatchStatusResponse(status="PENDING")
+
+    return BatchStatusResponse(**result)
+
+@app.post("/crawl", response_model=TaskResponse)
+async def create_crawl(request: CrawlRequest):
+    if not request.url:
+        raise HTTPException(status_code=400, detail="URL is required")
+
+    task = await run_in_threadpool(
+        crawl_site.delay, dedup.normalize_url(request.url), request.max_depth, request.max_pages
+    )
+    TASKS_SUBMITTED.labels("crawl", "new").inc()
     return TaskResponse(task_id=task.id)
 
+@app.get("/crawl/{job_id}", response_model=CrawlStatusResponse)
+def get_crawl_status(job_id: str, offset: int = Query(0, ge=0), limit: int = Query(0, ge=0, le=1000)):
+    """Прогресс обхода (страниц/с, размер очереди) и, при limit > 0, страницы с новостями"""
+    frontier = CrawlFrontier(job_id)
+    progress = frontier.get_progress()
+    if not progress:
+        return CrawlStatusResponse(status="PENDING")
+
+    pages = frontier.get_pages(offset, limit) if limit else []
+    return CrawlStatusResponse(**progress, pages=pages)
+
+@app.get("/feeds")
+def list_feeds():
+    """Источники с лентой новых новостей: id источника -> URL"""
+    return change_feed.list_sources()
+
+@app.get("/feeds/{source}", response_model=FeedResponse)
+async def read_feed(
+    source: str,
+    cursor: str = Query("0-0", pattern=r"^\d+-\d+$"),
+    count: int = Query(100, ge=1, le=1000),
+    wait: float = Query(0, ge=0)
+):
+    """Новости источника, появившиеся после cursor; с wait ждёт новых до wait секунд"""
+    return await change_feed.read(source, cursor, count, min(wait, settings.FEED_MAX_WAIT))
+
 @app.get("/tasks/{task_id}", response_model=TaskStatusResponse)
-def get_task_status(task_id: str):
-    result = get_task_result(task_id)
+async def get_task_status(task_id: str):
+    result = await get_task_result_async(task_id)
 
     if not result:
         return TaskStatusResponse(status="PENDING", data=None, error=None)
@@ -48,16 +204,200 @@ def get_task_status(task_id: str):
         error=result.get("error", None)
     )
 
+def parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Проекция ?fields=entity_title,url: только эти поля каждой новости"""
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = set(names) - set(NewsItem.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return names
+
+def project(items: List[Dict], names: Optional[List[str]]) -> List[Dict]:
+    if names is None:
+        return items
+    return [{name: item.get(name) for name in names} for item in items]
+
+@app.get("/tasks/{task_id}/items", response_model=TaskItemsResponse)
+async def get_task_items(
+    task_id: str,
+    cursor: str = Query("0", pattern=r"^\d+$"),
+    limit: int = Query(100, ge=1, le=1000),
+    fields: Optional[str] = None
+):
+    """Новости задачи постранично: из хранилища результатов читаются только нужные куски"""
+    names = parse_fields(fields)
+    result = await get_task_index_async(task_id)
+    if not result:
+        return TaskItemsResponse(status="PENDING")
+
+    start = int(cursor)
+    total = count_task_items(result)
+    items = await asyncio.get_running_loop().run_in_executor(None, read_task_items, task_id, result, start, limit)
+    return TaskItemsResponse(
+        status=result.get("status", "PENDING"),
+        total=total,
+        items=project(items, names),
+        next_cursor=str(start + len(items)) if items and start + len(items) < total else None,
+        error=result.get("error") or None
+    )
+
+@app.get("/tasks/{task_id}/items/stream")
+async def stream_task_items(task_id: str, cursor: str = Query("0", pattern=r"^\d+$"), fields: Optional[str] = None):
+    """Новости задачи в NDJSON (по новости в строке), отдаются по мере чтения кусков из хранилища.
+
+    Статус задачи и число новостей - в заголовках X-Task-Status и X-Total-Count.
+    """
+    names = parse_fields(fields)
+    result = await get_task_index_async(task_id)
+    status = result.get("status", "PENDING") if result else "PENDING"
+    total = count_task_items(result) if result else 0
+    loop = asyncio.get_running_loop()
+
+    async def lines():
+        offset = int(cursor)
+        while offset < total:
+            # Кусок за куском: память на запрос не растёт с размером результата
+            items = await loop.run_in_executor(None, read_task_items, task_id, result, offset,
+                                               settings.RESULT_CHUNK_ITEMS)
+            if not items:
+                break
+            yield "".join(json.dumps(item, ensure_ascii=False) + "\n" for item in project(items, names))
+            offset += len(items)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson",
+                             headers={"X-Task-Status": status, "X-Total-Count": str(total)})
+
+@app.get("/tasks/{task_id}/wait", response_model=TaskStatusResponse)
+async def wait_task_status(task_id: str, timeout: float = Query(30.0, ge=0, le=settings.TASK_WAIT_MAX_TIMEOUT)):
+    """Ждёт завершения задачи (long-poll) вместо частых GET /tasks/{task_id}"""
+    await task_events.start()
+    future = task_events.subscribe(task_id)
+    try:
+        response = await get_task_status(task_id)
+        if response.status not in TERMINAL_STATUSES and await task_events.wait(future, timeout):
+            response = await get_task_status(task_id)
+        return response
+    finally:
+        task_events.unsubscribe(task_id, future)
+
+@app.on_event("shutdown")
+async def stop_task_events():
+    await task_events.stop()
+
 @app.get("/stats/domain-limiter")
-async def get_domain_limiter_stats():
+def get_domain_limiter_stats():
     """Получить статистику по ограничениям доменов"""
     return {
-        "domain_stats": domain_limiter.get_stats(),
+        "domain_stats": get_domain_stats(),
+        "config": {
+            "backend": settings.DOMAIN_LIMITER_BACKEND,
+            "max_concurrent_per_domain": domain_limiter.max_concurrent_per_domain,
+            "adaptive": {
+                "enabled": settings.ADAPTIVE_CONCURRENCY_ENABLED,
+                "min_concurrency": settings.ADAPTIVE_MIN_CONCURRENCY,
+                "max_concurrency": settings.ADAPTIVE_MAX_CONCURRENCY,
+                "min_delay": settings.ADAPTIVE_MIN_DELAY,
+                "max_delay": settings.ADAPTIVE_MAX_DELAY
+            }
+        }
+    }
+
+@app.get("/stats/http-pool")
+def get_http_pool_stats():
+    """Статистика переиспользования соединений воркеров и протоколов по транспортам"""
+    pool_stats = HttpPool.get_stats()
+    return {
+        "pool_stats": pool_stats,
+        "transports": get_transport_stats(pool_stats),
+        "config": {
+            "transport": settings.HTTP_TRANSPORT,
+            "transport_domains": settings.HTTP_TRANSPORT_DOMAINS,
+            "limit": settings.HTTP_POOL_LIMIT,
+            "limit_per_host": limit_per_host(),
+            "dns_cache_ttl": settings.HTTP_DNS_CACHE_TTL,
+            "keepalive_timeout": settings.HTTP_KEEPALIVE_TIMEOUT
+        }
+    }
+
+@app.get("/stats/http-cache")
+def get_http_cache_stats():
+    """Сколько загрузок обошлось без повторного парсинга"""
+    return {
+        "cache_stats": ResponseCache.get_stats(),
+        "config": {
+            "enabled": settings.HTTP_CACHE_ENABLED,
+            "ttl": settings.HTTP_CACHE_TTL
+        }
+    }
+
+@app.get("/stats/dedup")
+def get_dedup_stats():
+    """Сколько запросов обслужено без нового скрапинга"""
+    return {
+        "dedup_stats": dedup.get_stats(),
         "config": {
-            "max_concurrent_per_domain": domain_limiter.max_concurrent_per_domain
+            "enabled": settings.DEDUP_ENABLED,
+            "freshness_seconds": settings.DEDUP_FRESHNESS_SECONDS
         }
     }
 
+@app.get("/stats/fair-queue")
+def get_fair_queue_stats():
+    """Ожидающие задачи по полосам и доменам и задачи в работе по доменам"""
+    return {
+        "queue_stats": fair_queue.get_stats(),
+        "config": {
+            "enabled": settings.FAIR_SCHEDULING_ENABLED,
+            "max_in_flight_per_domain": settings.FAIR_DOMAIN_INFLIGHT
+        }
+    }
+
+@app.get("/stats/feeds")
+def get_feed_stats():
+    """Сколько скрапингов обслужено лентой, а сколько ушло в HTML, и итоги поиска лент"""
+    return {
+        "feed_stats": FeedDiscovery.get_stats(),
+        "config": {
+            "enabled": settings.FEED_FAST_PATH_ENABLED,
+            "discovery_ttl": settings.FEED_DISCOVERY_TTL,
+            "well_known_paths": settings.FEED_WELL_KNOWN_PATHS
+        }
+    }
+
+@app.get("/stats/proxies")
+def get_proxy_stats():
+    """Здоровье прокси по данным воркеров: задержка, доля ошибок, состояние и закреплённые домены"""
+    return {
+        **ProxyPool.get_stats(),
+        "config": {
+            "proxies": len(settings.PROXIES),
+            "failure_threshold": settings.PROXY_FAILURE_THRESHOLD,
+            "cooldown": settings.PROXY_COOLDOWN,
+            "pin_domains": settings.PROXY_PIN_DOMAINS
+        }
+    }
+
+@app.get("/stats/results")
+def get_result_store_stats():
+    """Сколько результатов и новостей лежит в хранилище результатов и размер его файла"""
+    return {
+        "result_stats": result_store.get_stats() if result_store.enabled else {},
+        "config": {
+            "enabled": settings.RESULT_STORE_ENABLED,
+            "path": settings.RESULT_STORE_PATH,
+            "chunk_items": settings.RESULT_CHUNK_ITEMS,
+            "retention": settings.RESULT_RETENTION
+        }
+    }
+
+@app.get("/metrics")
+def get_metrics():
+    """Метрики процесса API в формате Prometheus; метрики воркеров - на их WORKER_METRICS_PORT"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
 
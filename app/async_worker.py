@@ -0,0 +1,270 @@
+import argparse
+import asyncio
+import logging
+import queue
+import signal
+import socket
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Optional, Set
+
+from kombu.common import QoS
+
+from app.celery import celery
+from app.config import settings
+from app import metrics
+from app.http_pool import http_pool, get_worker_loop
+from app.parse_executor import parse_executor
+from app.tasks import (
+    scrape_url, scrape_url_async, scrape_batch_async, crawl_async, discover_feed_async, dispatch_fair_queue,
+    finish_task, scrape_retry_countdown
+)
+
+logger = logging.getLogger(__name__)
+
+# Как часто поток брокера отрывается от ожидания сообщений, чтобы отправить ack'и
+DRAIN_TIMEOUT = 0.2
+
+
+class AsyncWorker:
+    """Воркер без prefork: задачи скрапинга выполняются корутинами в одном event loop.
+
+    Сообщения Celery забирает отдельный поток kombu; в работе одновременно не
+    больше concurrency задач (prefetch_count канала). Как и у Celery-воркера с
+    task_acks_late, ack отправляется только после завершения задачи, поэтому
+    при падении процесса неподтверждённые задачи вернутся в очередь.
+    """
+
+    def __init__(self, queues=None, concurrency: int = None):
+        self.queues = queues or settings.ASYNC_WORKER_QUEUES
+        self.concurrency = concurrency or settings.ASYNC_WORKER_CONCURRENCY
+        self.jobs: Set[asyncio.Task] = set()
+        self.handlers = {
+            'app.tasks.scrape_url': self._scrape_url,
+            'app.tasks.scrape_batch': self._scrape_batch,
+            'app.tasks.crawl_site': self._crawl_site,
+            'app.tasks.dispatch_fair_queue': self._dispatch_fair_queue,
+            'app.tasks.discover_feed': self._discover_feed,
+        }
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.qos: Optional[QoS] = None
+        # Решения по сообщениям из event loop; выполняет их поток, владеющий соединением
+        self._settlements = queue.SimpleQueue()
+        self._stopping: Optional[asyncio.Event] = None
+        self._stop_consuming = threading.Event()
+        self._drained = threading.Event()
+
+    def _consume(self) -> None:
+        try:
+            with celery.connection_for_read() as connection:
+                consumer = connection.Consumer(
+                    queues=[celery.amqp.queues[name] for name in self.queues],
+                    callbacks=[self._on_message],
+                    accept=celery.conf.accept_content,
+                )
+                self.qos = QoS(consumer.qos, self.concurrency)
+                self.qos.update()
+                consumer.consume()
+                logger.info("Async worker: consuming %s, up to %s tasks in flight",
+                            ', '.join(self.queues), self.concurrency)
+
+                while not self._stop_consuming.is_set():
+                    self._settle_pending()
+                    if self.qos.prev != self.qos.value:
+                        self.qos.update()
+                    try:
+                        connection.drain_events(timeout=DRAIN_TIMEOUT)
+                    except socket.timeout:
+                        pass
+
+                consumer.cancel()
+                # Новых сообщений больше не берём, но ack'и завершающихся задач ещё нужны
+                while not self._drained.is_set() or not self._settlements.empty():
+                    self._settle_pending()
+                    time.sleep(DRAIN_TIMEOUT / 4)
+        except Exception as e:
+            logger.error("Async worker: broker connection failed: %s", e)
+            if self.loop is not None:
+                self.loop.call_soon_threadsafe(self.stop)
+
+    def _on_message(self, body, message) -> None:
+        self.loop.call_soon_threadsafe(self._dispatch, message)
+
+    def _settle_pending(self) -> None:
+        while True:
+            try:
+                message, requeue = self._settlements.get_nowait()
+            except queue.Empty:
+                return
+            if requeue:
+                message.requeue()
+            else:
+                message.ack()
+
+    def _settle(self, message, requeue: bool = False) -> None:
+        self._settlements.put((message, requeue))
+
+    def _dispatch(self, message) -> None:
+        if self._stopping.is_set():
+            self._settle(message, requeue=True)
+            return
+        job = asyncio.ensure_future(self._execute(message))
+        self.jobs.add(job)
+        job.add_done_callback(self.jobs.discard)
+
+    async def _wait_for_eta(self, eta: Optional[str]) -> None:
+        if not eta:
+            return
+        eta_time = datetime.fromisoformat(eta)
+        if eta_time.tzinfo is None:
+            eta_time = eta_time.replace(tzinfo=timezone.utc)
+        delay = (eta_time - datetime.now(timezone.utc)).total_seconds()
+        if delay <= 0:
+            return
+        # Отложенная задача не должна занимать место в concurrency, пока ждёт своего времени
+        self.qos.increment_eventually()
+        try:
+            await asyncio.sleep(delay)
+        finally:
+            self.qos.decrement_eventually()
+
+    async def _execute(self, message) -> None:
+        headers = message.headers
+        name, task_id = headers.get('task'), headers.get('id')
+        request = {
+            "id": task_id,
+            "retries": headers.get('retries') or 0,
+            "queue": message.delivery_info.get('routing_key'),
+        }
+        try:
+            await self._wait_for_eta(headers.get('eta'))
+            if not request["retries"]:
+                metrics.observe_queue_wait(name, headers.get('enqueued_at'))
+
+            handler = self.handlers.get(name)
+            if handler is None:
+                logger.error("Async worker: unsupported task %s[%s], discarding", name, task_id)
+            else:
+                args, kwargs, _ = message.decode()
+                await self._run(name, task_id, handler(request, *args, **kwargs))
+        except asyncio.CancelledError:
+            self._settle(message, requeue=True)
+            raise
+        except Exception as e:
+            logger.error("Async worker: bad message %s[%s]: %s", name, task_id, e)
+        self._settle(message)
+
+    async def _run(self, name: str, task_id: str, coroutine) -> None:
+        task = celery.tasks[name]
+        try:
+            result = await coroutine
+        except Exception as exc:
+            logger.warning("Task %s[%s] failed: %s", name, task_id, exc)
+            if not task.ignore_result:
+                await self.loop.run_in_executor(None, celery.backend.mark_as_failure, task_id, exc)
+            return
+        if not task.ignore_result:
+            await self.loop.run_in_executor(None, celery.backend.mark_as_done, task_id, result)
+
+    def _retry_or_fail(self, request: Dict, url, incremental, exc) -> bool:
+        """Ставит повтор скрапинга или завершает задачу с ошибкой; True - повтор поставлен.
+
+        Синхронный Redis и публикация в брокер - вызывается в пуле потоков.
+        """
+        task_id, retries = request["id"], request["retries"]
+        countdown = scrape_retry_countdown(url, task_id, exc, retries)
+        if countdown is None:
+            return False
+        # Как Task.retry: та же задача с увеличенным retries и countdown в ту же очередь
+        scrape_url.apply_async(args=[url], kwargs={"incremental": incremental}, task_id=task_id,
+                               countdown=countdown, retries=retries + 1, queue=request["queue"])
+        return True
+
+    async def _scrape_url(self, request: Dict, url, incremental=False):
+        task_id, retries = request["id"], request["retries"]
+        try:
+            result = await scrape_url_async(url, task_id, first_attempt=not retries, incremental=incremental)
+        except Exception as exc:
+            if not await self.loop.run_in_executor(None, self._retry_or_fail, request, url, incremental, exc):
+                raise
+            return None
+        # Снятие отметок и раздача следующих задач - синхронные Redis и брокер, в пуле потоков
+        await self.loop.run_in_executor(None, finish_task, url, task_id, True)
+        return result
+
+    async def _scrape_batch(self, request: Dict, urls):
+        return await scrape_batch_async(urls, request["id"])
+
+    async def _crawl_site(self, request: Dict, start_url, max_depth, max_pages):
+        return await crawl_async(request["id"], start_url, max_depth, max_pages)
+
+    async def _discover_feed(self, request: Dict, url, candidates=None):
+        return await discover_feed_async(url, candidates)
+
+    async def _dispatch_fair_queue(self, request: Dict):
+        # Lua-скрипт и публикации синхронные: в пуле потоков, чтобы не останавливать идущие загрузки
+        await self.loop.run_in_executor(None, dispatch_fair_queue)
+
+    async def _dispatch_ticker(self) -> None:
+        """Замена beat для честной очереди, когда Celery-воркеров с --beat нет"""
+        while not self._stopping.is_set():
+            try:
+                await self.loop.run_in_executor(None, dispatch_fair_queue)
+            except Exception as e:
+                logger.warning("Async worker: fair queue dispatch failed: %s", e)
+            try:
+                await asyncio.wait_for(self._stopping.wait(), settings.FAIR_DISPATCH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    def stop(self) -> None:
+        if self._stopping is not None and not self._stopping.is_set():
+            logger.info("Async worker: stopping, %s tasks in flight", len(self.jobs))
+            self._stopping.set()
+
+    async def serve(self) -> None:
+        self.loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            self.loop.add_signal_handler(sig, self.stop)
+
+        await http_pool.start()
+        metrics.start_worker_exporter()
+        consumer_thread = threading.Thread(target=self._consume, name="async-worker-broker", daemon=True)
+        consumer_thread.start()
+        ticker = asyncio.ensure_future(self._dispatch_ticker()) if settings.FAIR_SCHEDULING_ENABLED else None
+
+        await self._stopping.wait()
+        self._stop_consuming.set()
+
+        if self.jobs:
+            # Незавершённые за отведённое время задачи вернутся в очередь (requeue)
+            _, pending = await asyncio.wait(set(self.jobs), timeout=settings.ASYNC_WORKER_SHUTDOWN_TIMEOUT)
+            for job in pending:
+                job.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+        if ticker is not None:
+            ticker.cancel()
+
+        self._drained.set()
+        await self.loop.run_in_executor(None, consumer_thread.join)
+        await http_pool.close()
+        await http_pool.flush_stats()
+        parse_executor.shutdown()
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Asyncio-воркер скрапинга: много задач в одном процессе")
+    parser.add_argument('--queues', help="очереди через запятую, в порядке приоритета")
+    parser.add_argument('--concurrency', type=int, help="сколько задач выполнять одновременно")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format="[%(asctime)s: %(levelname)s/%(name)s] %(message)s")
+    metrics.configure_logging()
+    worker = AsyncWorker(args.queues.split(',') if args.queues else None, args.concurrency)
+    get_worker_loop().run_until_complete(worker.serve())
+
+
+if __name__ == "__main__":
+    main()
@@ -20,8 +20,18 @@ celery.conf.update(
     worker_prefetch_multiplier=1,
     task_routes={
         'app.tasks.scrape_url': {'queue': 'scraping'},
+        'app.tasks.scrape_batch': {'queue': 'scraping'},
+        'app.tasks.crawl_site': {'queue': 'scraping'},
+        # Поиск ленты - фоновая работа: в bulk-очередь, после интерактивных задач
+        'app.tasks.discover_feed': {'queue': 'scraping'},
+        'app.tasks.dispatch_fair_queue': {'queue': 'scraping_interactive'},
+    },
+    # Воркер сначала забирает задачи из очередей, указанных в --queues первыми
+    broker_transport_options={'queue_order_strategy': 'priority'},
+    beat_schedule={
+        'dispatch-fair-queue': {
+            'task': 'app.tasks.dispatch_fair_queue',
+            'schedule': settings.FAIR_DISPATCH_INTERVAL,
+        },
     },
-    task_annotations={
-        'app.tasks.scrape_url': {'rate_limit': '10/m'}
-    }
 )
\ No newline at end of file
@@ -0,0 +1,133 @@
+import asyncio
+import hashlib
+import json
+import time
+import uuid
+from typing import Dict, List
+
+import redis.asyncio as aioredis
+
+from app.config import settings
+from app.dedup import normalize_url
+from app.redis_client import redis_client, async_redis_client
+from app.result_store import result_store
+
+SOURCES_KEY = "feed:sources"
+
+# Отпечатки хранятся в ZSET со временем последней встречи: старше TTL - забываются.
+# Новые отпечатки добавляются в поток источника; возвращаются номера новых новостей (с 1).
+# ARGV[6] - id результата в хранилище результатов: тогда в поток пишется ссылка (ref, номер
+# новости в результате), иначе - сама новость.
+RECORD_SCRIPT = """
+local now = tonumber(ARGV[1])
+local ttl = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - ttl)
+local new = {}
+for i = 7, #ARGV, 2 do
+    if redis.call('ZADD', KEYS[1], now, ARGV[i]) == 1 then
+        if ARGV[6] ~= '' then
+            redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[3], '*', 'ref', ARGV[6], 'index', ARGV[i + 1])
+        else
+            redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[3], '*', 'item', ARGV[i + 1])
+        end
+        table.insert(new, (i - 5) / 2)
+    end
+end
+redis.call('HSET', KEYS[3], ARGV[4], ARGV[5])
+redis.call('EXPIRE', KEYS[1], ttl)
+redis.call('EXPIRE', KEYS[2], ttl)
+return new
+"""
+
+_record_script = async_redis_client.register_script(RECORD_SCRIPT)
+
+# Ожидание (XREAD BLOCK) держит соединение до wait секунд: у таких чтений свой пул,
+# иначе FEED_MAX_WAITERS ожидающих клиентов заняли бы общий пул API целиком
+_blocking_client = aioredis.Redis(connection_pool=aioredis.ConnectionPool.from_url(
+    settings.REDIS_URL, max_connections=settings.FEED_MAX_WAITERS
+))
+_waiters = asyncio.Semaphore(settings.FEED_MAX_WAITERS)
+
+
+def source_id(url: str) -> str:
+    return hashlib.sha1(normalize_url(url).encode('utf-8')).hexdigest()[:16]
+
+
+def _keys(sid: str) -> List[str]:
+    return [f"feed:{sid}:seen", f"feed:{sid}:stream", SOURCES_KEY]
+
+
+def fingerprint(item: Dict) -> str:
+    """Компактный отпечаток новости: 8 байт хэша от URL и заголовка"""
+    raw = f"{item.get('url', '')}\x00{item.get('entity_title', '')}".encode('utf-8')
+    return hashlib.blake2b(raw, digest_size=8).hexdigest()
+
+
+async def record(url: str, items: List[Dict]) -> List[Dict]:
+    """Запоминает новости источника и возвращает только те, которых раньше не было.
+
+    С RESULT_STORE_ENABLED новости сохраняются в хранилище результатов до записи
+    в поток, а поток хранит только ссылки на них: читатель, разбуженный XADD,
+    уже найдёт новость в хранилище.
+    """
+    if not items:
+        return []
+    sid = source_id(url)
+    loop = asyncio.get_running_loop()
+    ref = ""
+    if result_store.enabled:
+        ref = f"feed:{sid}:{uuid.uuid4().hex}"
+        await loop.run_in_executor(None, result_store.put, ref, items)
+
+    args = [int(time.time()), settings.FEED_FINGERPRINT_TTL, settings.FEED_STREAM_MAXLEN, sid, normalize_url(url), ref]
+    for index, item in enumerate(items):
+        args.extend((fingerprint(item), index if ref else json.dumps(item, ensure_ascii=False)))
+    new_indexes = await _record_script(keys=_keys(sid), args=args)
+
+    if ref and not new_indexes:
+        # Новых новостей нет - ссылаться на сохранённый результат некому
+        await loop.run_in_executor(None, result_store.delete, ref)
+    return [items[int(i) - 1] for i in new_indexes]
+
+
+def _load_items(entries) -> List[Dict]:
+    """Новости записей потока: сами новости или ссылки на результаты в хранилище"""
+    results = {}
+    items = []
+    for _, fields in entries:
+        if b"item" in fields:
+            items.append(json.loads(fields[b"item"]))
+            continue
+        ref = fields[b"ref"].decode('utf-8')
+        if ref not in results:
+            results[ref] = result_store.get(ref) or []
+        index = int(fields[b"index"])
+        # Результат старше RESULT_RETENTION уже удалён: такие записи пропускаются
+        if index < len(results[ref]):
+            items.append(results[ref][index])
+    return items
+
+
+def list_sources() -> Dict[str, str]:
+    return {k.decode('utf-8'): v.decode('utf-8') for k, v in redis_client.hgetall(SOURCES_KEY).items()}
+
+
+async def read(sid: str, cursor: str = "0-0", count: int = 100, wait: float = 0) -> Dict:
+    """Новые новости источника после cursor; с wait ждёт появления до wait секунд.
+
+    Если все FEED_MAX_WAITERS мест ожидания заняты, отвечает сразу, как без wait.
+    """
+    stream_key = _keys(sid)[1]
+    if wait > 0 and not _waiters.locked():
+        async with _waiters:
+            reply = await _blocking_client.xread({stream_key: cursor}, count=count, block=int(wait * 1000))
+        entries = reply[0][1] if reply else []
+    else:
+        entries = await async_redis_client.xrange(stream_key, min=f"({cursor}", max="+", count=count)
+
+    if any(b"ref" in fields for _, fields in entries):
+        items = await asyncio.get_running_loop().run_in_executor(None, _load_items, entries)
+    else:
+        items = _load_items(entries)
+    next_cursor = entries[-1][0].decode('utf-8') if entries else cursor
+    return {"source": sid, "items": items, "cursor": next_cursor}
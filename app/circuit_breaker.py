@@ -0,0 +1,153 @@
+import time
+from typing import Dict, Tuple
+
+from app.config import settings
+from app.redis_client import redis_client, async_redis_client
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Ответ с таким статусом - сайт болен; 4xx означает, что сайт жив
+SERVER_ERROR_STATUS = 500
+
+# KEYS: circuit:{domain}; ARGV: now_ms, probe_timeout_ms.
+# Открытый выключатель по истечении паузы пропускает один пробный запрос (half-open);
+# пока проба в работе (не дольше probe_timeout), остальные запросы отклоняются.
+# Возвращает {пропущен ли запрос, через сколько мс пробовать снова, пробный ли он}.
+ALLOW_SCRIPT = """
+local state = redis.call('HGET', KEYS[1], 'state')
+if not state or state == 'closed' then
+    return {1, 0, 0}
+end
+local now = tonumber(ARGV[1])
+if state == 'open' then
+    local retry_at = tonumber(redis.call('HGET', KEYS[1], 'retry_at')) or 0
+    if now < retry_at then
+        return {0, retry_at - now, 0}
+    end
+else
+    local probe_until = tonumber(redis.call('HGET', KEYS[1], 'probe_until')) or 0
+    if now < probe_until then
+        return {0, probe_until - now, 0}
+    end
+end
+redis.call('HSET', KEYS[1], 'state', 'half_open', 'probe_until', now + tonumber(ARGV[2]))
+return {1, 0, 1}
+"""
+
+# KEYS: circuit:{domain}, circuit:domains; ARGV: ok, now_ms, threshold, cooldown_ms, max_cooldown_ms, domain.
+# Возвращает {состояние, через сколько мс можно пробовать снова}.
+RECORD_SCRIPT = """
+local state = redis.call('HGET', KEYS[1], 'state') or 'closed'
+local now = tonumber(ARGV[2])
+
+if ARGV[1] == '1' then
+    if state == 'half_open' then
+        redis.call('HSET', KEYS[1], 'state', 'closed', 'failures', 0, 'trips', 0)
+        redis.call('HDEL', KEYS[1], 'retry_at', 'probe_until')
+    elseif state == 'closed' and tonumber(redis.call('HGET', KEYS[1], 'failures') or '0') > 0 then
+        redis.call('HSET', KEYS[1], 'failures', 0)
+    end
+    if state == 'open' then
+        return {state, tonumber(redis.call('HGET', KEYS[1], 'retry_at')) - now}
+    end
+    return {'closed', 0}
+end
+
+redis.call('SADD', KEYS[2], ARGV[6])
+local failures = redis.call('HINCRBY', KEYS[1], 'failures', 1)
+if state == 'half_open' or (state == 'closed' and failures >= tonumber(ARGV[3])) then
+    local trips = redis.call('HINCRBY', KEYS[1], 'trips', 1)
+    local cooldown = math.min(tonumber(ARGV[5]), tonumber(ARGV[4]) * math.pow(2, trips - 1))
+    redis.call('HSET', KEYS[1], 'state', 'open', 'opened_at', now, 'retry_at', math.floor(now + cooldown))
+    redis.call('HDEL', KEYS[1], 'probe_until')
+    redis.call('HINCRBY', KEYS[1], 'opened', 1)
+    return {'open', math.floor(cooldown)}
+end
+if state == 'open' then
+    return {state, tonumber(redis.call('HGET', KEYS[1], 'retry_at')) - now}
+end
+redis.call('HSET', KEYS[1], 'state', state)
+return {state, 0}
+"""
+
+
+class CircuitOpenError(Exception):
+    """Домен недоступен: запрос отклонён без обращения к сети"""
+
+    def __init__(self, domain: str, retry_in: float):
+        super().__init__(f"Circuit open for {domain}, retry in {retry_in:.0f}s")
+        self.domain = domain
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    """Выключатель по доменам, общий для всех воркеров (через Redis).
+
+    После CIRCUIT_FAILURE_THRESHOLD ошибок подряд (таймаут, ошибка соединения,
+    ответ 5xx) запросы к домену отклоняются сразу, без сети. Через паузу
+    (удваивается с каждым срабатыванием подряд) проходит один пробный запрос:
+    успех закрывает выключатель, ошибка снова открывает.
+    """
+
+    DOMAINS_KEY = "circuit:domains"
+
+    def __init__(self):
+        self.enabled = settings.CIRCUIT_BREAKER_ENABLED
+        self._allow_script = async_redis_client.register_script(ALLOW_SCRIPT)
+        self._record_script = async_redis_client.register_script(RECORD_SCRIPT)
+
+    def _key(self, domain: str) -> str:
+        return f"circuit:{domain}"
+
+    async def allow(self, domain: str) -> bool:
+        """Пропускает запрос к домену или бросает CircuitOpenError; True - запрос пробный"""
+        if not self.enabled:
+            return False
+        allowed, retry_ms, probe = await self._allow_script(
+            keys=[self._key(domain)],
+            args=[int(time.time() * 1000), int(settings.CIRCUIT_PROBE_TIMEOUT * 1000)],
+        )
+        if not allowed:
+            raise CircuitOpenError(domain, retry_ms / 1000)
+        return bool(probe)
+
+    async def record(self, domain: str, ok: bool) -> Tuple[str, float]:
+        """Учитывает исход запроса; возвращает (состояние, через сколько секунд пробовать снова)"""
+        if not self.enabled:
+            return CLOSED, 0.0
+        state, retry_ms = await self._record_script(
+            keys=[self._key(domain), self.DOMAINS_KEY],
+            args=[1 if ok else 0, int(time.time() * 1000), settings.CIRCUIT_FAILURE_THRESHOLD,
+                  int(settings.CIRCUIT_COOLDOWN * 1000), int(settings.CIRCUIT_MAX_COOLDOWN * 1000), domain],
+        )
+        return state.decode('utf-8'), max(0.0, retry_ms / 1000)
+
+    def get_stats(self) -> Dict[str, Dict]:
+        """Состояние выключателей доменов, на которых случались ошибки"""
+        domains = sorted(d.decode('utf-8') for d in redis_client.smembers(self.DOMAINS_KEY))
+        if not domains:
+            return {}
+
+        pipeline = redis_client.pipeline()
+        for domain in domains:
+            pipeline.hgetall(self._key(domain))
+        now_ms = int(time.time() * 1000)
+
+        stats = {}
+        for domain, raw in zip(domains, pipeline.execute()):
+            data = {k.decode('utf-8'): v.decode('utf-8') for k, v in raw.items()}
+            if not data:
+                continue
+            retry_at = int(data.get("retry_at", 0))
+            stats[domain] = {
+                "state": data.get("state", CLOSED),
+                "consecutive_failures": int(data.get("failures", 0)),
+                "times_opened": int(data.get("opened", 0)),
+                "retry_in": round(max(0, retry_at - now_ms) / 1000, 1)
+            }
+        return stats
+
+
+circuit_breaker = CircuitBreaker()
@@ -5,11 +5,124 @@ load_dotenv()
 
 class Settings:
     REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+    REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "100"))
     MAX_CONCURRENT_REQUESTS_PER_DOMAIN = int(os.getenv("MAX_CONCURRENT_REQUESTS_PER_DOMAIN", "3"))
     REQUEST_DELAY = float(os.getenv("REQUEST_DELAY", "1.0"))
     MAX_RETRIES = int(os.getenv("MAX_RETRIES", "5"))
     RETRY_BACKOFF = float(os.getenv("RETRY_BACKOFF", "2.0"))
 
+    # Бэкенд ограничителя доменов: "local" (в процессе) или "redis" (общий для всех воркеров)
+    DOMAIN_LIMITER_BACKEND = os.getenv("DOMAIN_LIMITER_BACKEND", "local")
+    DOMAIN_LEASE_TIMEOUT = float(os.getenv("DOMAIN_LEASE_TIMEOUT", "60"))
+    DOMAIN_RATE_LIMIT = float(os.getenv("DOMAIN_RATE_LIMIT", "1.0"))
+    DOMAIN_RATE_BURST = int(os.getenv("DOMAIN_RATE_BURST", "3"))
+    DOMAIN_LIMITER_POLL_INTERVAL = float(os.getenv("DOMAIN_LIMITER_POLL_INTERVAL", "0.1"))
+
+    # Адаптивный (AIMD) лимит параллельности и пауза по каждому домену
+    ADAPTIVE_CONCURRENCY_ENABLED = os.getenv("ADAPTIVE_CONCURRENCY_ENABLED", "false").lower() == "true"
+    ADAPTIVE_MIN_CONCURRENCY = int(os.getenv("ADAPTIVE_MIN_CONCURRENCY", "1"))
+    ADAPTIVE_MAX_CONCURRENCY = int(os.getenv("ADAPTIVE_MAX_CONCURRENCY", "10"))
+    ADAPTIVE_MIN_DELAY = float(os.getenv("ADAPTIVE_MIN_DELAY", "0.2"))
+    ADAPTIVE_MAX_DELAY = float(os.getenv("ADAPTIVE_MAX_DELAY", "30"))
+    ADAPTIVE_DECREASE = float(os.getenv("ADAPTIVE_DECREASE", "0.5"))
+    ADAPTIVE_DELAY_STEP = float(os.getenv("ADAPTIVE_DELAY_STEP", "0.1"))
+    ADAPTIVE_LATENCY_SPIKE = float(os.getenv("ADAPTIVE_LATENCY_SPIKE", "3.0"))
+
+    # Пул соединений воркера
+    HTTP_POOL_LIMIT = int(os.getenv("HTTP_POOL_LIMIT", "100"))
+    HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+    HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+
+    # HTTP-клиент: "aiohttp" (HTTP/1.1), "httpx" (HTTP/2) или "curl_cffi"; для доменов - "domain=httpx,..."
+    HTTP_TRANSPORT = os.getenv("HTTP_TRANSPORT", "aiohttp")
+    HTTP_TRANSPORT_DOMAINS = dict(
+        item.strip().split("=", 1) for item in os.getenv("HTTP_TRANSPORT_DOMAINS", "").split(",") if "=" in item
+    )
+    CURL_IMPERSONATE = os.getenv("CURL_IMPERSONATE", "chrome")
+
+    # Условные запросы (ETag / Last-Modified) и кэш разобранного результата
+    HTTP_CACHE_ENABLED = os.getenv("HTTP_CACHE_ENABLED", "true").lower() == "true"
+    HTTP_CACHE_TTL = int(os.getenv("HTTP_CACHE_TTL", "86400"))
+
+    # Движок парсинга: "bs4" (BeautifulSoup, html.parser) или "lxml" (XPath + план селекторов по домену)
+    PARSER_ENGINE = os.getenv("PARSER_ENGINE", "bs4")
+
+    # Где парсить HTML: "inline" (в event loop), "thread" (для lxml, который отпускает GIL) или "process"
+    PARSE_EXECUTOR = os.getenv("PARSE_EXECUTOR", "inline")
+    PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", str(os.cpu_count() or 1)))
+    PARSE_QUEUE_SIZE = int(os.getenv("PARSE_QUEUE_SIZE", str(2 * (os.cpu_count() or 1))))
+
+    # Потоковый разбор: новости извлекаются по мере загрузки, чтение обрывается по лимитам
+    STREAMING_ENABLED = os.getenv("STREAMING_ENABLED", "false").lower() == "true"
+    STREAM_MAX_BYTES = int(os.getenv("STREAM_MAX_BYTES", str(2 * 1024 * 1024)))
+    STREAM_MAX_ITEMS = int(os.getenv("STREAM_MAX_ITEMS", "200"))
+    STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", str(64 * 1024)))
+
+    # Обход сайта: параллельные загрузки в одной задаче, лимиты и размер фильтра Блума в битах
+    CRAWL_CONCURRENCY = int(os.getenv("CRAWL_CONCURRENCY", "5"))
+    CRAWL_MAX_DEPTH = int(os.getenv("CRAWL_MAX_DEPTH", "5"))
+    CRAWL_MAX_PAGES = int(os.getenv("CRAWL_MAX_PAGES", "10000"))
+    # Фильтр Блума обхода считается от max_pages: ссылок на страницу и допустимая доля ложных "уже видели";
+    # CRAWL_BLOOM_BITS - потолок (2^25 бит = 4 МБ), CRAWL_BLOOM_MIN_BITS - нижняя граница
+    CRAWL_BLOOM_BITS = int(os.getenv("CRAWL_BLOOM_BITS", str(2 ** 25)))
+    CRAWL_BLOOM_MIN_BITS = int(os.getenv("CRAWL_BLOOM_MIN_BITS", str(2 ** 16)))
+    CRAWL_BLOOM_URLS_PER_PAGE = int(os.getenv("CRAWL_BLOOM_URLS_PER_PAGE", "50"))
+    CRAWL_BLOOM_FP_RATE = float(os.getenv("CRAWL_BLOOM_FP_RATE", "0.01"))
+    CRAWL_TTL = int(os.getenv("CRAWL_TTL", "86400"))
+
+    # Максимальное время ожидания в GET /tasks/{task_id}/wait, секунд
+    TASK_WAIT_MAX_TIMEOUT = float(os.getenv("TASK_WAIT_MAX_TIMEOUT", "120"))
+
+    # Склейка одинаковых URL: присоединение к идущему скрапингу и повторное использование свежего результата
+    DEDUP_ENABLED = os.getenv("DEDUP_ENABLED", "true").lower() == "true"
+    DEDUP_FRESHNESS_SECONDS = int(os.getenv("DEDUP_FRESHNESS_SECONDS", "60"))
+    DEDUP_INFLIGHT_TTL = int(os.getenv("DEDUP_INFLIGHT_TTL", "900"))
+
+    # Честная очередь: подочереди по доменам, круговая раздача и полосы interactive/bulk
+    FAIR_SCHEDULING_ENABLED = os.getenv("FAIR_SCHEDULING_ENABLED", "false").lower() == "true"
+    FAIR_DOMAIN_INFLIGHT = int(os.getenv("FAIR_DOMAIN_INFLIGHT", os.getenv("MAX_CONCURRENT_REQUESTS_PER_DOMAIN", "3")))
+    FAIR_DISPATCH_BATCH = int(os.getenv("FAIR_DISPATCH_BATCH", "100"))
+    FAIR_DISPATCH_INTERVAL = float(os.getenv("FAIR_DISPATCH_INTERVAL", "5"))
+    FAIR_INFLIGHT_TTL = int(os.getenv("FAIR_INFLIGHT_TTL", "3600"))
+
+    # Лента новых новостей: сколько помнить отпечатки новостей источника и длина потока
+    FEED_ENABLED = os.getenv("FEED_ENABLED", "true").lower() == "true"
+    FEED_FINGERPRINT_TTL = int(os.getenv("FEED_FINGERPRINT_TTL", str(7 * 24 * 3600)))
+    FEED_STREAM_MAXLEN = int(os.getenv("FEED_STREAM_MAXLEN", "10000"))
+    FEED_MAX_WAIT = float(os.getenv("FEED_MAX_WAIT", "60"))
+    # Сколько запросов ленты с wait могут ждать одновременно (у них отдельный пул соединений Redis)
+    FEED_MAX_WAITERS = int(os.getenv("FEED_MAX_WAITERS", "50"))
+
+    # Наблюдаемость: порт экспортёра метрик воркера (0 - выключен) и уровень логов пакета app
+    WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9100"))
+    LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+
+    # Asyncio-воркер (python -m app.async_worker): очереди по приоритету, задач в работе, ожидание при остановке
+    ASYNC_WORKER_QUEUES = os.getenv("ASYNC_WORKER_QUEUES", "scraping_interactive,scraping").split(",")
+    ASYNC_WORKER_CONCURRENCY = int(os.getenv("ASYNC_WORKER_CONCURRENCY", "200"))
+    ASYNC_WORKER_SHUTDOWN_TIMEOUT = float(os.getenv("ASYNC_WORKER_SHUTDOWN_TIMEOUT", "30"))
+
+    # Ленты вместо HTML: RSS/Atom/news-sitemap источника, найденные по <link rel="alternate"> или известным путям
+    FEED_FAST_PATH_ENABLED = os.getenv("FEED_FAST_PATH_ENABLED", "false").lower() == "true"
+    FEED_DISCOVERY_TTL = int(os.getenv("FEED_DISCOVERY_TTL", "86400"))
+    FEED_PARSE_MAX_ITEMS = int(os.getenv("FEED_PARSE_MAX_ITEMS", "100"))
+    FEED_WELL_KNOWN_PATHS = os.getenv(
+        "FEED_WELL_KNOWN_PATHS", "/rss,/feed,/rss.xml,/feed.xml,/atom.xml,/news-sitemap.xml,/sitemap-news.xml"
+    ).split(",")
+
+    # Хранилище результатов: новости задач в сжатом SQLite на общем томе, в Redis - только статус
+    RESULT_STORE_ENABLED = os.getenv("RESULT_STORE_ENABLED", "false").lower() == "true"
+    RESULT_STORE_PATH = os.getenv("RESULT_STORE_PATH", "data/results.db")
+    RESULT_CHUNK_ITEMS = int(os.getenv("RESULT_CHUNK_ITEMS", "200"))
+    RESULT_RETENTION = int(os.getenv("RESULT_RETENTION", str(7 * 24 * 3600)))
+    RESULT_PURGE_INTERVAL = float(os.getenv("RESULT_PURGE_INTERVAL", "3600"))
+    RESULT_STORE_BUSY_TIMEOUT = float(os.getenv("RESULT_STORE_BUSY_TIMEOUT", "30"))
+    RESULT_STORE_COMPRESSION_LEVEL = int(os.getenv("RESULT_STORE_COMPRESSION_LEVEL", "3"))
+
+    # Пакетный скрапинг: сколько URL в одном пакете и сколько из них качаем одновременно
+    BATCH_MAX_URLS = int(os.getenv("BATCH_MAX_URLS", "1000"))
+    BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "20"))
+
     USER_AGENTS = [
         # Chrome
         "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
@@ -26,5 +139,21 @@ class Settings:
     ]
     PROXIES = os.getenv("PROXIES", "").split(",") if os.getenv("PROXIES") else []
 
+    # Пул прокси: сколько ошибок подряд выбивает прокси, пауза до пробы (удваивается), закрепление доменов
+    PROXY_FAILURE_THRESHOLD = int(os.getenv("PROXY_FAILURE_THRESHOLD", "3"))
+    PROXY_COOLDOWN = float(os.getenv("PROXY_COOLDOWN", "30"))
+    PROXY_MAX_COOLDOWN = float(os.getenv("PROXY_MAX_COOLDOWN", "600"))
+    PROXY_PIN_DOMAINS = os.getenv("PROXY_PIN_DOMAINS", "false").lower() == "true"
+    PROXY_POOL_LIMIT = int(os.getenv("PROXY_POOL_LIMIT", "20"))
+
+    # Выключатель доменов: ошибок подряд до открытия, пауза до пробы (удваивается), время на пробу,
+    # что делать с задачами открытого домена: "defer" (повтор после паузы) или "fail"
+    CIRCUIT_BREAKER_ENABLED = os.getenv("CIRCUIT_BREAKER_ENABLED", "true").lower() == "true"
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv("CIRCUIT_FAILURE_THRESHOLD", "5"))
+    CIRCUIT_COOLDOWN = float(os.getenv("CIRCUIT_COOLDOWN", "30"))
+    CIRCUIT_MAX_COOLDOWN = float(os.getenv("CIRCUIT_MAX_COOLDOWN", "600"))
+    CIRCUIT_PROBE_TIMEOUT = float(os.getenv("CIRCUIT_PROBE_TIMEOUT", "60"))
+    CIRCUIT_OPEN_ACTION = os.getenv("CIRCUIT_OPEN_ACTION", "defer")
+
 settings = Settings()
     
\ No newline at end of file
@@ -0,0 +1,174 @@
+import asyncio
+import hashlib
+import json
+import math
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from app.config import settings
+from app.redis_client import redis_client, async_redis_client
+from app.result_store import result_store
+
+
+def bloom_size(max_pages: int) -> Tuple[int, int]:
+    """(бит, хэш-функций) фильтра Блума на обход из max_pages страниц.
+
+    Ожидаемое число URL - max_pages * CRAWL_BLOOM_URLS_PER_PAGE; размер считается
+    под вероятность ложного "уже видели" CRAWL_BLOOM_FP_RATE: m = -n*ln(p)/ln(2)^2,
+    k = m/n*ln(2). Не меньше CRAWL_BLOOM_MIN_BITS и не больше CRAWL_BLOOM_BITS.
+    """
+    urls = max(1, max_pages) * settings.CRAWL_BLOOM_URLS_PER_PAGE
+    bits = math.ceil(-urls * math.log(settings.CRAWL_BLOOM_FP_RATE) / math.log(2) ** 2)
+    bits = min(max(bits, settings.CRAWL_BLOOM_MIN_BITS), settings.CRAWL_BLOOM_BITS)
+    hashes = max(1, round(-math.log2(settings.CRAWL_BLOOM_FP_RATE)))
+    return bits, hashes
+
+
+class CrawlFrontier:
+    """Состояние обхода сайта в Redis: очередь URL, фильтр Блума просмотренных, страницы и счётчики"""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.meta_key = f"crawl:{job_id}"
+        self.frontier_key = f"crawl:{job_id}:frontier"
+        self.seen_key = f"crawl:{job_id}:seen"
+        self.pages_key = f"crawl:{job_id}:pages"
+        # Размер фильтра задаётся при init и хранится в meta: возобновлённый обход читает его оттуда
+        self.bloom_bits: Optional[int] = None
+        self.bloom_hashes: Optional[int] = None
+
+    def _keys(self) -> List[str]:
+        return [self.meta_key, self.frontier_key, self.seen_key, self.pages_key]
+
+    def _load_bloom_size(self) -> None:
+        if self.bloom_bits is None:
+            bits, hashes = redis_client.hmget(self.meta_key, "bloom_bits", "bloom_hashes")
+            # Обходы, начатые до расчёта размера, жили с фильтром максимального размера и 7 хэшами
+            self.bloom_bits = int(bits) if bits else settings.CRAWL_BLOOM_BITS
+            self.bloom_hashes = int(hashes) if hashes else 7
+
+    def _bit_positions(self, url: str) -> List[int]:
+        # Двойное хэширование: k позиций из двух 64-битных половин одного дайджеста
+        digest = hashlib.blake2b(url.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:], 'big') | 1
+        return [(h1 + i * h2) % self.bloom_bits for i in range(self.bloom_hashes)]
+
+    def init(self, start_url: str, max_depth: int, max_pages: int) -> bool:
+        """Создаёт обход; False, если он уже был (задачу перезапустили после падения воркера)"""
+        created = redis_client.hsetnx(self.meta_key, "start_url", start_url)
+        if not created:
+            return False
+        self.bloom_bits, self.bloom_hashes = bloom_size(max_pages)
+        pipeline = redis_client.pipeline()
+        pipeline.hset(self.meta_key, mapping={
+            "status": "RUNNING",
+            "max_depth": max_depth,
+            "max_pages": max_pages,
+            "bloom_bits": self.bloom_bits,
+            "bloom_hashes": self.bloom_hashes,
+            "pages_done": 0,
+            "pages_failed": 0,
+            "items_found": 0,
+            "urls_seen": 0,
+            "started_at": time.time()
+        })
+        for key in self._keys():
+            pipeline.expire(key, settings.CRAWL_TTL)
+        pipeline.execute()
+        self.add_urls([start_url], 0)
+        return True
+
+    def add_urls(self, urls: List[str], depth: int) -> int:
+        """Добавляет в очередь только ещё не виденные URL"""
+        if not urls:
+            return 0
+        self._load_bloom_size()
+        pipeline = redis_client.pipeline()
+        for url in urls:
+            for position in self._bit_positions(url):
+                pipeline.setbit(self.seen_key, position, 1)
+        old_bits = pipeline.execute()
+
+        new_urls = []
+        for i, url in enumerate(urls):
+            if not all(old_bits[i * self.bloom_hashes:(i + 1) * self.bloom_hashes]):
+                new_urls.append(url)
+        if new_urls:
+            pipeline = redis_client.pipeline()
+            pipeline.rpush(self.frontier_key, *(json.dumps({"url": url, "depth": depth}) for url in new_urls))
+            pipeline.hincrby(self.meta_key, "urls_seen", len(new_urls))
+            pipeline.expire(self.frontier_key, settings.CRAWL_TTL)
+            pipeline.expire(self.seen_key, settings.CRAWL_TTL)
+            pipeline.execute()
+        return len(new_urls)
+
+    def pop(self) -> Optional[Dict]:
+        raw = redis_client.lpop(self.frontier_key)
+        return json.loads(raw) if raw else None
+
+    async def record_page(self, url: str, depth: int, items: Optional[list], error: Optional[str] = None) -> None:
+        """Записывает страницу обхода.
+
+        С RESULT_STORE_ENABLED новости страницы сохраняются в хранилище результатов,
+        а в списке страниц остаётся только ссылка (ref) и их число.
+        """
+        page = {"url": url, "depth": depth, "items": items, "error": error}
+        if items and result_store.enabled:
+            ref = f"{self.pages_key}:{uuid.uuid4().hex}"
+            await asyncio.get_running_loop().run_in_executor(None, result_store.put, ref, items)
+            page.update(items=None, ref=ref, item_count=len(items))
+
+        async with async_redis_client.pipeline() as pipeline:
+            pipeline.rpush(self.pages_key, json.dumps(page, ensure_ascii=False))
+            pipeline.expire(self.pages_key, settings.CRAWL_TTL)
+            if error is None:
+                pipeline.hincrby(self.meta_key, "pages_done", 1)
+                pipeline.hincrby(self.meta_key, "items_found", len(items or []))
+            else:
+                pipeline.hincrby(self.meta_key, "pages_failed", 1)
+            await pipeline.execute()
+
+    def finish(self, status: str = "SUCCESS") -> None:
+        redis_client.hset(self.meta_key, mapping={"status": status, "finished_at": time.time()})
+
+    def get_progress(self) -> Dict:
+        pipeline = redis_client.pipeline(transaction=False)
+        pipeline.hgetall(self.meta_key)
+        pipeline.llen(self.frontier_key)
+        pipeline.llen(self.pages_key)
+        raw, frontier_size, pages_stored = pipeline.execute()
+        if not raw:
+            return {}
+
+        meta = {k.decode('utf-8'): v.decode('utf-8') for k, v in raw.items()}
+        started = float(meta.get("started_at", time.time()))
+        finished = float(meta["finished_at"]) if "finished_at" in meta else time.time()
+        pages = int(meta.get("pages_done", 0)) + int(meta.get("pages_failed", 0))
+        elapsed = max(finished - started, 1e-6)
+        return {
+            "status": meta.get("status", "PENDING"),
+            "start_url": meta.get("start_url"),
+            "max_depth": int(meta.get("max_depth", 0)),
+            "max_pages": int(meta.get("max_pages", 0)),
+            "pages_done": int(meta.get("pages_done", 0)),
+            "pages_failed": int(meta.get("pages_failed", 0)),
+            "items_found": int(meta.get("items_found", 0)),
+            "urls_seen": int(meta.get("urls_seen", 0)),
+            "frontier_size": frontier_size,
+            "pages_stored": pages_stored,
+            "elapsed_seconds": round(elapsed, 2),
+            "pages_per_second": round(pages / elapsed, 3)
+        }
+
+    def get_pages(self, start: int = 0, count: int = 100) -> List[Dict]:
+        """Страницы обхода; новости по ссылкам читаются из хранилища результатов"""
+        pages = [json.loads(raw) for raw in redis_client.lrange(self.pages_key, start, start + count - 1)]
+        for page in pages:
+            ref = page.pop("ref", None)
+            page.pop("item_count", None)
+            if ref:
+                # Результат старше RESULT_RETENTION уже удалён: страница отдаётся без новостей
+                page["items"] = result_store.get(ref)
+        return pages
@@ -0,0 +1,73 @@
+import hashlib
+from typing import Dict, Tuple
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+from app.config import settings
+from app.redis_client import redis_client
+
+STATS_KEY = "stats:dedup"
+
+# Свежий результат -> сразу отдаём его; идущий скрапинг -> присоединяемся; иначе занимаем URL сами
+CLAIM_SCRIPT = """
+local fresh = redis.call('GET', KEYS[2])
+if fresh then
+    redis.call('HINCRBY', KEYS[3], 'fresh', 1)
+    return {'fresh', fresh}
+end
+local current = redis.call('SET', KEYS[1], ARGV[1], 'NX', 'GET', 'EX', ARGV[2])
+if current then
+    redis.call('HINCRBY', KEYS[3], 'inflight', 1)
+    return {'inflight', current}
+end
+redis.call('HINCRBY', KEYS[3], 'new', 1)
+return {'new', ARGV[1]}
+"""
+
+# Снимаем отметку "в работе", только если она наша, и при успехе запоминаем свежий результат.
+# Задача, не занимавшая URL (инкрементальная, без claim), свежим результатом не становится.
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) ~= ARGV[1] then
+    return 0
+end
+redis.call('DEL', KEYS[1])
+if ARGV[2] == '1' and tonumber(ARGV[3]) > 0 then
+    redis.call('SET', KEYS[2], ARGV[1], 'EX', ARGV[3])
+end
+return 1
+"""
+
+_claim_script = redis_client.register_script(CLAIM_SCRIPT)
+_release_script = redis_client.register_script(RELEASE_SCRIPT)
+
+
+def normalize_url(url: str) -> str:
+    """Приводит URL к каноническому виду, чтобы одинаковые запросы совпадали"""
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.netloc.lower()
+    if (scheme, netloc.rsplit(':', 1)[-1]) in (("http", "80"), ("https", "443")):
+        netloc = netloc.rsplit(':', 1)[0]
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    return urlunsplit((scheme, netloc, parts.path or '/', query, ''))
+
+
+def _keys(url: str):
+    digest = hashlib.sha1(normalize_url(url).encode('utf-8')).hexdigest()
+    return [f"inflight:{digest}", f"fresh:{digest}", STATS_KEY]
+
+
+def claim(url: str, task_id: str) -> Tuple[str, str]:
+    """Возвращает (new|inflight|fresh, task_id, к которому надо обращаться за результатом)"""
+    source, owner = _claim_script(keys=_keys(url), args=[task_id, settings.DEDUP_INFLIGHT_TTL])
+    return source.decode('utf-8'), owner.decode('utf-8')
+
+
+def release(url: str, task_id: str, success: bool) -> None:
+    _release_script(keys=_keys(url)[:2], args=[task_id, int(success), settings.DEDUP_FRESHNESS_SECONDS])
+
+
+def get_stats() -> Dict:
+    data = {k.decode('utf-8'): int(v) for k, v in redis_client.hgetall(STATS_KEY).items()}
+    total = sum(data.values())
+    data["dedupe_rate"] = (data.get("fresh", 0) + data.get("inflight", 0)) / total if total else 0
+    return data
@@ -1,73 +1,237 @@
 import asyncio
+import logging
+import random
 import time
+import uuid
 from urllib.parse import urlparse
 from collections import defaultdict
 from typing import Dict, Optional
 
 from app.config import settings
+from app.redis_client import redis_client, async_redis_client
+from app.adaptive import adaptive_controller
+from app.circuit_breaker import circuit_breaker
+from app.metrics import LIMITER_WAIT
+
+logger = logging.getLogger(__name__)
 
 class DomainLimiter:
     def __init__(self, max_concurrent_per_domain: int = None):
         self.max_concurrent_per_domain = max_concurrent_per_domain or settings.MAX_CONCURRENT_REQUESTS_PER_DOMAIN
-        self.domain_semaphores = defaultdict(lambda: asyncio.Semaphore(self.max_concurrent_per_domain))
+        # Условие вместо семафора: лимит домена может меняться на ходу (адаптивный режим)
+        self.domain_conditions = defaultdict(asyncio.Condition)
         self.active_requests = defaultdict(int)
         self.total_requests = defaultdict(int)
-        self.wait_times = defaultdict(list)
+        # Только сумма и максимум ожидания: память не растёт с числом запросов
+        self.total_wait_time = defaultdict(float)
+        self.max_wait_time = defaultdict(float)
     
     def get_domain(self, url: str) -> str:
         """Извлекает домен из URL"""
         return urlparse(url).netloc
-    
-    def get_domain_semaphore(self, url: str) -> asyncio.Semaphore:
-        domain = self.get_domain(url)
-        return self.domain_semaphores[domain]
 
-    async def acquire(self, url: str) -> asyncio.Semaphore:
+    def get_limit(self, domain: str) -> int:
+        if adaptive_controller.enabled:
+            return adaptive_controller.limit(domain)
+        return self.max_concurrent_per_domain
+
+    async def acquire(self, url: str) -> None:
         domain = self.get_domain(url)
-        semaphore = self.get_domain_semaphore(url)
+        condition = self.domain_conditions[domain]
     
         start_wait = time.time()
         
-        print(f"Domain limiter: Requesting access to {domain} "
-              f"(active: {self.active_requests[domain]}/{self.max_concurrent_per_domain})")
-        
-        await semaphore.acquire()
+        async with condition:
+            await condition.wait_for(lambda: self.active_requests[domain] < self.get_limit(domain))
+            self.active_requests[domain] += 1
         
         wait_time = time.time() - start_wait
-        self.wait_times[domain].append(wait_time)
-        self.active_requests[domain] += 1
+        self.total_wait_time[domain] += wait_time
+        self.max_wait_time[domain] = max(self.max_wait_time[domain], wait_time)
         self.total_requests[domain] += 1
+        LIMITER_WAIT.observe(wait_time)
         
-        if wait_time > 0.1:
-            print(f"Domain limiter: Waited {wait_time:.2f}s for {domain}")
-        
-        print(f"Domain limiter: Access granted to {domain} "
-              f"(active: {self.active_requests[domain]}/{self.max_concurrent_per_domain})")
-        
-        return semaphore
+        logger.debug("Domain limiter: access granted to %s after %.2fs (active: %s/%s)",
+                     domain, wait_time, self.active_requests[domain], self.get_limit(domain))
 
     async def release(self, url: str) -> None:
         domain = self.get_domain(url)
-        semaphore = self.get_domain_semaphore(url)
-        semaphore.release()
-        
-        self.active_requests[domain] = max(0, self.active_requests[domain] - 1)
+        condition = self.domain_conditions[domain]
+
+        async with condition:
+            self.active_requests[domain] = max(0, self.active_requests[domain] - 1)
+            # Будим всех: лимит мог вырасти больше чем на одно место
+            condition.notify_all()
         
-        print(f"Domain limiter: Released access to {domain} "
-              f"(active: {self.active_requests[domain]}/{self.max_concurrent_per_domain})")
+        logger.debug("Domain limiter: released access to %s (active: %s/%s)",
+                     domain, self.active_requests[domain], self.get_limit(domain))
 
     def get_stats(self) -> Dict:
         """Возвращает статистику по доменам"""
         stats = {}
         for domain in set(list(self.active_requests.keys()) + list(self.total_requests.keys())):
-            wait_times = self.wait_times[domain]
+            total = self.total_requests[domain]
             stats[domain] = {
                 "active_requests": self.active_requests[domain],
-                "total_requests": self.total_requests[domain],
+                "total_requests": total,
+                "max_concurrent": self.get_limit(domain),
+                "avg_wait_time": self.total_wait_time[domain] / total if total else 0,
+                "max_wait_time": self.max_wait_time[domain]
+            }
+        return stats
+
+
+# Атомарный захват слота: аренда с истечением (ZSET) + token bucket по скорости
+ACQUIRE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local max_concurrent = tonumber(ARGV[2])
+local lease_ms = tonumber(ARGV[3])
+local rate = tonumber(ARGV[4])
+local burst = tonumber(ARGV[5])
+
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+if redis.call('ZCARD', KEYS[1]) >= max_concurrent then
+    return {0, 0}
+end
+
+if rate > 0 then
+    local bucket = redis.call('HMGET', KEYS[2], 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or burst
+    local ts = tonumber(bucket[2]) or now
+    tokens = math.min(burst, tokens + (now - ts) * rate / 1000)
+    if tokens < 1 then
+        redis.call('HSET', KEYS[2], 'tokens', tostring(tokens), 'ts', now)
+        return {0, math.ceil((1 - tokens) * 1000 / rate)}
+    end
+    redis.call('HSET', KEYS[2], 'tokens', tostring(tokens - 1), 'ts', now)
+    redis.call('PEXPIRE', KEYS[2], math.ceil(burst * 1000 / rate) + 1000)
+end
+
+redis.call('ZADD', KEYS[1], now + lease_ms, ARGV[1])
+redis.call('PEXPIRE', KEYS[1], lease_ms)
+
+local wait = tonumber(ARGV[6])
+redis.call('SADD', KEYS[4], ARGV[7])
+redis.call('HINCRBY', KEYS[3], 'total_requests', 1)
+redis.call('HINCRBYFLOAT', KEYS[3], 'total_wait_time', wait)
+local max_wait = tonumber(redis.call('HGET', KEYS[3], 'max_wait_time')) or 0
+if wait > max_wait then
+    redis.call('HSET', KEYS[3], 'max_wait_time', tostring(wait))
+end
+return {1, 0}
+"""
+
+RELEASE_SCRIPT = """
+return redis.call('ZREM', KEYS[1], ARGV[1])
+"""
+
+
+class RedisDomainLimiter:
+    """Ограничитель доменов, общий для всех воркеров кластера (через Redis)"""
+
+    DOMAINS_KEY = "domain_limiter:domains"
+
+    def __init__(self, max_concurrent_per_domain: int = None):
+        self.max_concurrent_per_domain = max_concurrent_per_domain or settings.MAX_CONCURRENT_REQUESTS_PER_DOMAIN
+        self.lease_timeout = settings.DOMAIN_LEASE_TIMEOUT
+        self.rate_limit = settings.DOMAIN_RATE_LIMIT
+        self.rate_burst = settings.DOMAIN_RATE_BURST
+        self.poll_interval = settings.DOMAIN_LIMITER_POLL_INTERVAL
+        # Токены аренды, выданные этому процессу, чтобы release(url) знал, что освобождать
+        self.leases = defaultdict(list)
+        self._acquire_script = async_redis_client.register_script(ACQUIRE_SCRIPT)
+        self._release_script = async_redis_client.register_script(RELEASE_SCRIPT)
+
+    def get_domain(self, url: str) -> str:
+        """Извлекает домен из URL"""
+        return urlparse(url).netloc
+
+    def get_limit(self, domain: str) -> int:
+        if adaptive_controller.enabled:
+            return adaptive_controller.limit(domain)
+        return self.max_concurrent_per_domain
+
+    def _keys(self, domain: str):
+        prefix = f"domain_limiter:{domain}"
+        return [f"{prefix}:slots", f"{prefix}:bucket", f"{prefix}:stats", self.DOMAINS_KEY]
+
+    async def acquire(self, url: str) -> str:
+        domain = self.get_domain(url)
+        keys = self._keys(domain)
+        token = uuid.uuid4().hex
+        start_wait = time.time()
+
+        while True:
+            wait_time = time.time() - start_wait
+            granted, retry_ms = await self._acquire_script(
+                keys=keys,
+                args=[token, self.get_limit(domain), int(self.lease_timeout * 1000),
+                      self.rate_limit, self.rate_burst, wait_time, domain],
+            )
+            if granted:
+                break
+            delay = max(self.poll_interval, retry_ms / 1000)
+            await asyncio.sleep(delay + random.uniform(0, self.poll_interval))
+
+        self.leases[domain].append(token)
+        LIMITER_WAIT.observe(wait_time)
+        logger.debug("Domain limiter: access granted to %s after %.2fs", domain, wait_time)
+
+        return token
+
+    async def release(self, url: str) -> None:
+        domain = self.get_domain(url)
+        if not self.leases[domain]:
+            return
+        token = self.leases[domain].pop()
+        await self._release_script(keys=self._keys(domain)[:1], args=[token])
+
+    def get_stats(self) -> Dict:
+        """Возвращает статистику по доменам со всех воркеров"""
+        domains = sorted(d.decode('utf-8') for d in redis_client.smembers(self.DOMAINS_KEY))
+        if not domains:
+            return {}
+
+        now_ms = int(time.time() * 1000)
+        pipeline = redis_client.pipeline()
+        for domain in domains:
+            slots_key, _, stats_key, _ = self._keys(domain)
+            pipeline.zcount(slots_key, now_ms, "+inf")
+            pipeline.hgetall(stats_key)
+        replies = pipeline.execute()
+
+        stats = {}
+        for i, domain in enumerate(domains):
+            active, raw = replies[2 * i], replies[2 * i + 1]
+            data = {k.decode('utf-8'): v.decode('utf-8') for k, v in raw.items()}
+            total = int(data.get("total_requests", 0))
+            stats[domain] = {
+                "active_requests": active,
+                "total_requests": total,
                 "max_concurrent": self.max_concurrent_per_domain,
-                "avg_wait_time": sum(wait_times) / len(wait_times) if wait_times else 0,
-                "max_wait_time": max(wait_times) if wait_times else 0
+                "avg_wait_time": float(data.get("total_wait_time", 0)) / total if total else 0,
+                "max_wait_time": float(data.get("max_wait_time", 0))
             }
         return stats
 
-domain_limiter = DomainLimiter()
+
+def get_domain_stats() -> Dict:
+    """Статистика ограничителя вместе с текущими адаптивными лимитами и выключателями доменов"""
+    stats = domain_limiter.get_stats()
+    for domain, circuit in circuit_breaker.get_stats().items():
+        stats.setdefault(domain, {})["circuit"] = circuit
+    if adaptive_controller.enabled:
+        for domain, adaptive in adaptive_controller.get_stats().items():
+            stats.setdefault(domain, {})["adaptive"] = adaptive
+            if "limit" in adaptive:
+                stats[domain]["max_concurrent"] = max(adaptive_controller.min_limit, int(adaptive["limit"]))
+    return stats
+
+
+def create_domain_limiter():
+    if settings.DOMAIN_LIMITER_BACKEND == "redis":
+        return RedisDomainLimiter()
+    return DomainLimiter()
+
+domain_limiter = create_domain_limiter()
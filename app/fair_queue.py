@@ -0,0 +1,120 @@
+import json
+from typing import Dict, List, Tuple
+from urllib.parse import urlparse
+
+from app.config import settings
+from app.redis_client import redis_client
+
+# Полосы в порядке приоритета и очереди Celery, в которые уходят их задачи
+LANES = ["interactive", "bulk"]
+LANE_QUEUES = {"interactive": "scraping_interactive", "bulk": "scraping"}
+
+SUBMIT_SCRIPT = """
+redis.call('RPUSH', KEYS[1], ARGV[1])
+if redis.call('SADD', KEYS[2], ARGV[2]) == 1 then
+    redis.call('RPUSH', KEYS[3], ARGV[2])
+end
+return 1
+"""
+
+# Круговой обход доменов каждой полосы: из домена берётся одна задача за проход,
+# если у него не исчерпан лимит задач "в работе". Полоса interactive обходится первой.
+DISPATCH_SCRIPT = """
+local lanes = cjson.decode(ARGV[1])
+local cap = tonumber(ARGV[2])
+local budget = tonumber(ARGV[3])
+local ttl = tonumber(ARGV[4])
+local out = {}
+
+for _, lane in ipairs(lanes) do
+    local ring = 'fair:' .. lane .. ':ring'
+    local active = 'fair:' .. lane .. ':active'
+    local idle = 0
+    while budget > 0 do
+        local size = redis.call('LLEN', ring)
+        if size == 0 or idle >= size then
+            break
+        end
+        local domain = redis.call('LMOVE', ring, ring, 'LEFT', 'RIGHT')
+        local inflight_key = 'fair:inflight:' .. domain
+        local queue = 'fair:' .. lane .. ':queue:' .. domain
+        if tonumber(redis.call('GET', inflight_key) or '0') < cap then
+            local job = redis.call('LPOP', queue)
+            if job then
+                -- TTL только у нового счётчика: иначе утёкшее место занятого домена не истечёт никогда
+                if redis.call('INCR', inflight_key) == 1 then
+                    redis.call('EXPIRE', inflight_key, ttl)
+                end
+                table.insert(out, lane)
+                table.insert(out, job)
+                budget = budget - 1
+                idle = 0
+            end
+            if redis.call('LLEN', queue) == 0 then
+                redis.call('LREM', ring, 0, domain)
+                redis.call('SREM', active, domain)
+            end
+        else
+            idle = idle + 1
+        end
+    end
+end
+return out
+"""
+
+DONE_SCRIPT = """
+if redis.call('DECR', KEYS[1]) <= 0 then
+    redis.call('DEL', KEYS[1])
+end
+return 1
+"""
+
+_submit_script = redis_client.register_script(SUBMIT_SCRIPT)
+_dispatch_script = redis_client.register_script(DISPATCH_SCRIPT)
+_done_script = redis_client.register_script(DONE_SCRIPT)
+
+
+def get_domain(url: str) -> str:
+    """Извлекает домен из URL"""
+    return urlparse(url).netloc
+
+
+def submit(url: str, task_id: str, lane: str, incremental: bool = False) -> None:
+    """Ставит задачу в подочередь своего домена вместо общей очереди Celery"""
+    domain = get_domain(url)
+    job = json.dumps({"task_id": task_id, "url": url, "incremental": incremental})
+    _submit_script(
+        keys=[f"fair:{lane}:queue:{domain}", f"fair:{lane}:active", f"fair:{lane}:ring"],
+        args=[job, domain]
+    )
+
+
+def pop_ready(max_jobs: int = None) -> List[Tuple[str, Dict]]:
+    """Забирает задачи, готовые к отправке воркерам: (полоса, задача)"""
+    reply = _dispatch_script(keys=[], args=[
+        json.dumps(LANES),
+        settings.FAIR_DOMAIN_INFLIGHT,
+        max_jobs or settings.FAIR_DISPATCH_BATCH,
+        settings.FAIR_INFLIGHT_TTL
+    ])
+    return [(reply[i].decode('utf-8'), json.loads(reply[i + 1])) for i in range(0, len(reply), 2)]
+
+
+def task_done(url: str) -> None:
+    """Освобождает место домена в работе; вызывается по окончательному завершению задачи"""
+    _done_script(keys=[f"fair:inflight:{get_domain(url)}"])
+
+
+def get_stats() -> Dict:
+    stats = {}
+    for lane in LANES:
+        domains = sorted(d.decode('utf-8') for d in redis_client.smembers(f"fair:{lane}:active"))
+        pipeline = redis_client.pipeline(transaction=False)
+        for domain in domains:
+            pipeline.llen(f"fair:{lane}:queue:{domain}")
+        stats[lane] = dict(zip(domains, pipeline.execute()))
+
+    in_flight = {}
+    for key in redis_client.scan_iter(match="fair:inflight:*", count=1000):
+        in_flight[key.decode('utf-8').split(':', 2)[2]] = int(redis_client.get(key) or 0)
+    return {"pending": stats, "in_flight": in_flight}
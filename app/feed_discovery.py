@@ -0,0 +1,213 @@
+import hashlib
+import json
+import logging
+import re
+from typing import Dict, List, Optional
+from urllib.parse import urljoin, urlsplit
+
+from lxml import etree
+
+from app.config import settings
+from app.redis_client import redis_client, async_redis_client
+
+logger = logging.getLogger(__name__)
+
+FEED_TYPES = ('application/rss+xml', 'application/atom+xml', 'application/xml', 'text/xml')
+
+# <link rel="alternate" type="application/rss+xml" href="..."> в начале страницы
+_LINK_TAG = re.compile(rb'<link\b[^>]*>', re.IGNORECASE)
+_ATTR = re.compile(rb'([\w-]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))')
+HEAD_SCAN_BYTES = 65536
+
+# Элементы новостей: RSS item, Atom entry, url в news-sitemap
+ITEM_TAGS = {'item', 'entry', 'url'}
+TITLE_TAGS = {'title'}
+DATE_TAGS = {'pubDate', 'published', 'updated', 'publication_date', 'date', 'lastmod'}
+LINK_TAGS = {'link', 'loc', 'guid'}
+
+
+def _localname(tag) -> str:
+    return etree.QName(tag).localname if isinstance(tag, str) else ''
+
+
+def feed_links(html: bytes, base_url: str) -> List[str]:
+    """Адреса лент из <link rel="alternate"> страницы"""
+    links = []
+    for tag in _LINK_TAG.findall(html[:HEAD_SCAN_BYTES]):
+        attrs = {
+            name.decode('ascii').lower(): (a or b or c).decode('utf-8', errors='replace')
+            for name, a, b, c in _ATTR.findall(tag)
+        }
+        if 'alternate' in attrs.get('rel', '').lower().split() and attrs.get('type', '').lower() in FEED_TYPES \
+                and attrs.get('href'):
+            links.append(urljoin(base_url, attrs['href'].strip()))
+    return list(dict.fromkeys(links))
+
+
+class FeedParser:
+    """Потоковый разбор RSS/Atom/news-sitemap в новости той же схемы, что у parse_html.
+
+    Интерфейс тот же, что у StreamingNewsParser, поэтому fetch читает ленту
+    кусками и прекращает чтение, набрав max_items новостей.
+    """
+
+    def __init__(self, max_items: int = None, chunk_size: int = None):
+        self.max_items = max_items or settings.FEED_PARSE_MAX_ITEMS
+        self.chunk_size = chunk_size or settings.STREAM_CHUNK_SIZE
+        self.encoding = None
+        self.bytes_read = 0
+        self.items: List[Dict] = []
+
+    def _item(self, element) -> Optional[Dict]:
+        title = date = url = None
+        for child in element.iter():
+            name = _localname(child.tag)
+            text = (child.text or '').strip()
+            if name in TITLE_TAGS and title is None and child is not element:
+                title = text
+            elif name in DATE_TAGS and date is None:
+                date = text
+            elif name in LINK_TAGS and url is None and child is not element:
+                # В Atom ссылка в атрибуте href, в RSS и sitemap - в тексте
+                href = child.get('href')
+                if href and child.get('rel', 'alternate') != 'alternate':
+                    continue
+                url = href or text or None
+
+        if not title or len(title) <= 5:
+            return None
+        return {
+            'entity_title': title,
+            'entry_meta_date': date or 'Дата не найдена',
+            'url': url or 'URL не найден'
+        }
+
+    def _process_events(self, parser) -> None:
+        for _, element in parser.read_events():
+            if _localname(element.tag) not in ITEM_TAGS:
+                continue
+            item = self._item(element)
+            if item:
+                self.items.append(item)
+            # Разобранную запись выбрасываем: память не растёт с длиной ленты
+            element.clear()
+
+    async def consume(self, response) -> List[Dict]:
+        """Новости ленты; не лента (HTML, битый XML) - пустой список, а не ошибка и повтор запроса"""
+        self.encoding = response.charset
+        self.bytes_read = 0
+        self.items = []
+        if 'html' in (response.content_type or ''):
+            response.close()
+            return []
+
+        parser = etree.XMLPullParser(events=('end',), resolve_entities=False, no_network=True)
+        try:
+            async for chunk in response.iter_chunked(self.chunk_size):
+                self.bytes_read += len(chunk)
+                parser.feed(chunk)
+                self._process_events(parser)
+                if len(self.items) >= self.max_items:
+                    response.close()
+                    break
+            else:
+                parser.close()
+                self._process_events(parser)
+        except etree.XMLSyntaxError as e:
+            logger.debug("Not a feed: %s (%s)", response.url, e)
+            response.close()
+            return []
+
+        return self.items[:self.max_items]
+
+
+class FeedDiscovery:
+    """Какую ленту читать вместо HTML: по источнику и по домену (известные пути), с TTL"""
+
+    STATS_KEY = "stats:feeds"
+    # Отметка "поиск поставлен в очередь": пока она жива, повторные скрапинги источника новый поиск не ставят
+    PENDING_TTL = 3600
+
+    def _source_key(self, url: str) -> str:
+        return f"feed_discovery:{hashlib.sha1(url.encode('utf-8')).hexdigest()}"
+
+    def _domain_key(self, domain: str) -> str:
+        return f"feed_discovery:domain:{domain}"
+
+    async def _get(self, key: str) -> Optional[Dict]:
+        data = await async_redis_client.get(key)
+        return json.loads(data) if data else None
+
+    async def _set(self, key: str, feed_url: Optional[str]) -> None:
+        await async_redis_client.set(key, json.dumps({"feed_url": feed_url or ""}), ex=settings.FEED_DISCOVERY_TTL)
+
+    async def get(self, url: str) -> Optional[Dict]:
+        """{"feed_url": ...} (пустой, если ленты нет) или None, если источник ещё не проверяли"""
+        return await self._get(self._source_key(url))
+
+    async def forget(self, url: str) -> None:
+        await async_redis_client.delete(self._source_key(url))
+
+    async def mark_pending(self, url: str) -> bool:
+        """Занимает поиск ленты источника; False - поиск уже поставлен другой задачей"""
+        return bool(await async_redis_client.set(f"{self._source_key(url)}:pending", 1, nx=True, ex=self.PENDING_TTL))
+
+    async def release_pending(self, url: str) -> None:
+        await async_redis_client.delete(f"{self._source_key(url)}:pending")
+
+    async def count(self, event: str) -> None:
+        await async_redis_client.hincrby(self.STATS_KEY, event, 1)
+
+    async def _probe(self, feed_url: str, fetch_feed) -> bool:
+        try:
+            return bool(await fetch_feed(feed_url))
+        except Exception as e:
+            logger.debug("Feed candidate %s rejected: %s", feed_url, e)
+            return False
+
+    async def discover(self, url: str, candidates: List[str], fetch_feed) -> Optional[str]:
+        """Ищет ленту источника: сначала ссылки со страницы (candidates), потом известные пути домена.
+
+        Известные пути (/rss, /feed...) - лента всего сайта, поэтому они пробуются
+        только для главной страницы: новости раздела не подменяются общей лентой.
+        """
+        try:
+            return await self._discover(url, candidates, fetch_feed)
+        finally:
+            await self.release_pending(url)
+
+    async def _discover(self, url: str, candidates: List[str], fetch_feed) -> Optional[str]:
+        for candidate in candidates:
+            if await self._probe(candidate, fetch_feed):
+                await self._set(self._source_key(url), candidate)
+                await self.count("discovered")
+                return candidate
+
+        parts = urlsplit(url)
+        if parts.path not in ('', '/') or parts.query:
+            await self._set(self._source_key(url), None)
+            await self.count("no_feed")
+            return None
+
+        domain_key = self._domain_key(parts.netloc)
+        domain_entry = await self._get(domain_key)
+        if domain_entry is None:
+            domain_entry = {"feed_url": ""}
+            for path in settings.FEED_WELL_KNOWN_PATHS:
+                candidate = f"{parts.scheme}://{parts.netloc}{path}"
+                if await self._probe(candidate, fetch_feed):
+                    domain_entry["feed_url"] = candidate
+                    break
+            await self._set(domain_key, domain_entry["feed_url"])
+
+        feed_url = domain_entry["feed_url"] or None
+        await self._set(self._source_key(url), feed_url)
+        await self.count("discovered" if feed_url else "no_feed")
+        return feed_url
+
+    @classmethod
+    def get_stats(cls) -> Dict:
+        return {k.decode('utf-8'): int(v) for k, v in redis_client.hgetall(cls.STATS_KEY).items()}
+
+
+feed_discovery = FeedDiscovery()
@@ -0,0 +1,98 @@
+import asyncio
+import hashlib
+import json
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.redis_client import redis_client, async_redis_client
+from app.result_store import result_store
+
+
+class ResponseCache:
+    """Кэш валидаторов ответа (ETag / Last-Modified) и разобранного результата по URL.
+
+    С RESULT_STORE_ENABLED разобранный результат лежит в хранилище результатов
+    под ключом записи, а в Redis остаются только валидаторы и хэш тела.
+    """
+
+    STATS_KEY = "stats:http_cache"
+
+    def __init__(self, ttl: int = None):
+        self.ttl = ttl or settings.HTTP_CACHE_TTL
+
+    def _key(self, url: str) -> str:
+        return f"http_cache:{hashlib.sha1(url.encode('utf-8')).hexdigest()}"
+
+    @staticmethod
+    def content_hash(body: bytes) -> str:
+        return hashlib.sha1(body).hexdigest()
+
+    async def get(self, url: str) -> Optional[Dict]:
+        data = await async_redis_client.hgetall(self._key(url))
+        if not data:
+            return None
+        entry = {k.decode('utf-8'): v.decode('utf-8') for k, v in data.items()}
+        if "result" in entry:
+            entry["result"] = json.loads(entry["result"])
+        return entry
+
+    async def load_result(self, url: str, entry: Dict) -> Optional[List]:
+        """Прошлый результат записи; None - его уже нет в хранилище результатов (удалён по сроку)"""
+        if "result" in entry:
+            return entry["result"]
+        if not result_store.enabled:
+            return None
+        return await asyncio.get_running_loop().run_in_executor(None, result_store.get, self._key(url))
+
+    def conditional_headers(self, entry: Optional[Dict]) -> Dict:
+        """Заголовки If-None-Match / If-Modified-Since для повторного запроса"""
+        if not entry:
+            return {}
+        headers = {}
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    async def store(self, url: str, response_headers: Dict, content_hash: str, result: list) -> None:
+        key = self._key(url)
+        fields = {
+            "etag": response_headers.get("ETag", ""),
+            "last_modified": response_headers.get("Last-Modified", ""),
+            "content_hash": content_hash,
+        }
+        if result_store.enabled:
+            # SQLite и сжатие - в пуле потоков, как и запись результатов задач
+            await asyncio.get_running_loop().run_in_executor(None, result_store.put, key, result)
+        else:
+            fields["result"] = json.dumps(result, ensure_ascii=False)
+        async with async_redis_client.pipeline() as pipeline:
+            # Запись целиком заменяется: поле result прежнего режима не должно пережить переключение
+            pipeline.delete(key)
+            pipeline.hset(key, mapping=fields)
+            pipeline.expire(key, self.ttl)
+            pipeline.hincrby(self.STATS_KEY, "misses", 1)
+            await pipeline.execute()
+
+    async def refresh(self, url: str, response_headers: Dict, reason: str) -> None:
+        """Продлевает запись без перезаписи результата (304 или тот же хэш тела)"""
+        key = self._key(url)
+        validators = {
+            "etag": response_headers.get("ETag"),
+            "last_modified": response_headers.get("Last-Modified")
+        }
+        validators = {k: v for k, v in validators.items() if v}
+        async with async_redis_client.pipeline() as pipeline:
+            if validators:
+                pipeline.hset(key, mapping=validators)
+            pipeline.expire(key, self.ttl)
+            pipeline.hincrby(self.STATS_KEY, reason, 1)
+            await pipeline.execute()
+
+    @classmethod
+    def get_stats(cls) -> Dict:
+        return {k.decode('utf-8'): int(v) for k, v in redis_client.hgetall(cls.STATS_KEY).items()}
+
+
+response_cache = ResponseCache()
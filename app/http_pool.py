@@ -0,0 +1,134 @@
+import asyncio
+import time
+from collections import defaultdict
+from typing import Dict, Optional
+
+import aiohttp
+
+from app.config import settings
+from app.redis_client import redis_client, async_redis_client
+
+
+def limit_per_host() -> int:
+    """Потолок соединений к хосту: не ниже предела, до которого адаптивный режим поднимает лимит домена"""
+    if settings.ADAPTIVE_CONCURRENCY_ENABLED:
+        return max(settings.MAX_CONCURRENT_REQUESTS_PER_DOMAIN, settings.ADAPTIVE_MAX_CONCURRENCY)
+    return settings.MAX_CONCURRENT_REQUESTS_PER_DOMAIN
+
+
+class HttpPool:
+    """Долгоживущая HTTP-сессия воркера: пул keep-alive соединений + кэш DNS"""
+
+    STATS_KEY = "stats:http_pool"
+
+    def __init__(self):
+        self.session: Optional[aiohttp.ClientSession] = None
+        # Отдельный пул соединений на каждый прокси: тёплые соединения не вытесняют друг друга
+        self.proxy_sessions: Dict[str, aiohttp.ClientSession] = {}
+        # Транспорты httpx/curl-cffi со своими пулами соединений: закрываются вместе с пулом
+        self.transports = []
+        self.counters = defaultdict(int)
+        self._flushed = defaultdict(int)
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_reuse(session, ctx, params):
+            self.counters["connection_hits"] += 1
+
+        async def on_create(session, ctx, params):
+            self.counters["connection_misses"] += 1
+
+        async def on_dns_hit(session, ctx, params):
+            self.counters["dns_hits"] += 1
+
+        async def on_dns_miss(session, ctx, params):
+            self.counters["dns_misses"] += 1
+
+        async def on_headers_sent(session, ctx, params):
+            # Соединение уже получено: отсюда fetch считает задержку ответа, без ожидания в пуле
+            if isinstance(ctx.trace_request_ctx, dict):
+                ctx.trace_request_ctx["sent_at"] = time.monotonic()
+
+        trace_config.on_connection_reuseconn.append(on_reuse)
+        trace_config.on_request_headers_sent.append(on_headers_sent)
+        trace_config.on_connection_create_end.append(on_create)
+        trace_config.on_dns_cache_hit.append(on_dns_hit)
+        trace_config.on_dns_cache_miss.append(on_dns_miss)
+        return trace_config
+
+    def _new_session(self, limit: int) -> aiohttp.ClientSession:
+        connector = aiohttp.TCPConnector(
+            limit=limit,
+            limit_per_host=limit_per_host(),
+            ttl_dns_cache=settings.HTTP_DNS_CACHE_TTL,
+            keepalive_timeout=settings.HTTP_KEEPALIVE_TIMEOUT,
+        )
+        self.counters["sessions_created"] += 1
+        return aiohttp.ClientSession(connector=connector, trace_configs=[self._trace_config()])
+
+    async def start(self) -> aiohttp.ClientSession:
+        if self.session is None or self.session.closed:
+            self.session = self._new_session(settings.HTTP_POOL_LIMIT)
+        return self.session
+
+    async def get_session(self) -> aiohttp.ClientSession:
+        return await self.start()
+
+    async def get_proxy_session(self, proxy: str) -> aiohttp.ClientSession:
+        session = self.proxy_sessions.get(proxy)
+        if session is None or session.closed:
+            session = self.proxy_sessions[proxy] = self._new_session(settings.PROXY_POOL_LIMIT)
+        return session
+
+    def add_transport(self, transport) -> None:
+        self.transports.append(transport)
+
+    async def close(self) -> None:
+        for transport in self.transports:
+            await transport.close()
+        for session in [self.session, *self.proxy_sessions.values()]:
+            if session is not None and not session.closed:
+                await session.close()
+        self.session = None
+        self.proxy_sessions = {}
+
+    async def flush_stats(self) -> None:
+        """Сбрасывает в Redis прирост счётчиков с прошлого сброса"""
+        deltas = {}
+        for name, value in list(self.counters.items()):
+            delta = value - self._flushed[name]
+            if delta:
+                deltas[name] = delta
+                self._flushed[name] = value
+        if not deltas:
+            return
+        async with async_redis_client.pipeline() as pipeline:
+            for name, delta in deltas.items():
+                pipeline.hincrby(self.STATS_KEY, name, delta)
+            await pipeline.execute()
+
+    @classmethod
+    def get_stats(cls) -> Dict:
+        """Суммарные счётчики пула по всем воркерам"""
+        data = {k.decode('utf-8'): int(v) for k, v in redis_client.hgetall(cls.STATS_KEY).items()}
+        hits = data.get("connection_hits", 0)
+        misses = data.get("connection_misses", 0)
+        data["connection_reuse_ratio"] = hits / (hits + misses) if hits + misses else 0
+        return data
+
+
+http_pool = HttpPool()
+
+
+def get_worker_loop() -> asyncio.AbstractEventLoop:
+    """Event loop процесса, в котором живёт пул соединений"""
+    try:
+        loop = asyncio.get_event_loop()
+    except RuntimeError:
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+    if loop.is_closed():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+    return loop
@@ -0,0 +1,286 @@
+import logging
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urljoin, urlsplit, urlunsplit
+
+from cssselect import HTMLTranslator
+from lxml import etree, html as lxml_html
+
+from app.news_selectors import (
+    CONTAINER_SELECTORS, CONTAINER_CLASS_KEYWORDS, TITLE_SELECTORS, DATE_SELECTORS,
+    LINK_SELECTORS, FALLBACK_TITLE_TAGS, FALLBACK_MAX_TITLES
+)
+from app.redis_client import redis_client
+
+logger = logging.getLogger(__name__)
+
+_translator = HTMLTranslator()
+
+
+def _compile_all(selector: str) -> etree.XPath:
+    """Аналог soup.select: все совпадения в порядке документа"""
+    return etree.XPath(_translator.css_to_xpath(selector, prefix='descendant-or-self::'))
+
+
+def _compile_first(selector: str) -> etree.XPath:
+    """Аналог tag.select_one: первое совпадение среди потомков"""
+    return etree.XPath(f"({_translator.css_to_xpath(selector, prefix='descendant::')})[1]")
+
+
+CONTAINER_XPATHS = [_compile_all(selector) for selector in CONTAINER_SELECTORS]
+TITLE_XPATHS = [_compile_first(selector) for selector in TITLE_SELECTORS]
+DATE_XPATHS = [_compile_first(selector) for selector in DATE_SELECTORS]
+LINK_XPATHS = [_compile_first(selector) for selector in LINK_SELECTORS]
+LINK_ALL_XPATHS = [_compile_all(selector) for selector in LINK_SELECTORS]
+
+# Номер контейнера в плане, когда карточки нашлись по ключевым словам в class
+KEYWORD_CONTAINERS = -1
+
+
+class SelectorPlans:
+    """Запоминает по домену, какая комбинация селекторов сработала в прошлый раз"""
+
+    def __init__(self):
+        self.plans = {}
+
+    def _key(self, domain: str) -> str:
+        return f"selector_plan:{domain}"
+
+    def get(self, domain: str) -> Optional[Dict[str, int]]:
+        if domain not in self.plans:
+            data = redis_client.hgetall(self._key(domain))
+            self.plans[domain] = {k.decode('utf-8'): int(v) for k, v in data.items()} or None
+        return self.plans[domain]
+
+    def save(self, domain: str, plan: Dict[str, int]) -> None:
+        if self.plans.get(domain) == plan:
+            return
+        self.plans[domain] = plan
+        redis_client.hset(self._key(domain), mapping=plan)
+
+
+selector_plans = SelectorPlans()
+
+
+# BeautifulSoup не включает в get_text содержимое script/style/template
+_TEXT_XPATH = etree.XPath("descendant-or-self::text()[not(parent::script or parent::style or ancestor::template)]")
+
+
+def _text(element) -> str:
+    """Аналог get_text(strip=True) из BeautifulSoup"""
+    return ''.join(part.strip() for part in _TEXT_XPATH(element))
+
+
+def _title_value(element) -> str:
+    return _text(element)
+
+def _title_ok(title: str) -> bool:
+    return bool(title) and len(title) > 10 and not title.isdigit()
+
+def _date_value(element) -> str:
+    return element.get('datetime') or _text(element)
+
+def _date_ok(date: str) -> bool:
+    return bool(date) and len(date) < 50
+
+def _link_value(element) -> str:
+    return element.get('href')
+
+def _link_ok(href: str) -> bool:
+    return bool(href)
+
+
+def _search(article, xpaths, value_fn, ok_fn, preferred: Optional[int]) -> Tuple[Optional[str], Optional[int]]:
+    """Перебирает селекторы как parse_html, начиная с селектора из плана"""
+    if preferred is not None and 0 <= preferred < len(xpaths):
+        found = xpaths[preferred](article)
+        if found:
+            value = value_fn(found[0])
+            if ok_fn(value):
+                return value, preferred
+
+    value = None
+    for index, xpath in enumerate(xpaths):
+        found = xpath(article)
+        if found:
+            value = value_fn(found[0])
+            if ok_fn(value):
+                return value, index
+    return value, None
+
+
+def _absolute_url(url: str) -> str:
+    if url.startswith('/'):
+        return f"https://24.kz{url}"
+    elif url.startswith('http'):
+        return url
+    return f"https://24.kz/{url}"
+
+
+def _find_containers(root, plan: Optional[Dict[str, int]]) -> Tuple[list, int]:
+    if plan is not None:
+        # Контейнер из плана ничего не нашёл - план устарел, пусть решает полный поиск
+        index = plan.get("container")
+        if index == KEYWORD_CONTAINERS:
+            return _keyword_containers(root), KEYWORD_CONTAINERS
+        if index is not None and 0 <= index < len(CONTAINER_XPATHS):
+            return CONTAINER_XPATHS[index](root), index
+        return [], KEYWORD_CONTAINERS
+
+    for index, xpath in enumerate(CONTAINER_XPATHS):
+        found = xpath(root)
+        if found:
+            return found, index
+    return _keyword_containers(root), KEYWORD_CONTAINERS
+
+
+def _keyword_containers(root) -> list:
+    containers = []
+    for div in root.iter('div'):
+        classes = div.get('class')
+        if classes and any(keyword in classes.lower() for keyword in CONTAINER_CLASS_KEYWORDS):
+            containers.append(div)
+    return containers
+
+
+def extract_article(article, plan: Optional[Dict[str, int]] = None) -> Tuple[Optional[Dict], Dict[str, Optional[int]]]:
+    """Новость из одной карточки и номера сработавших селекторов"""
+    plan = plan or {}
+    title, title_index = _search(article, TITLE_XPATHS, _title_value, _title_ok, plan.get("title"))
+    date, date_index = _search(article, DATE_XPATHS, _date_value, _date_ok, plan.get("date"))
+    href, link_index = _search(article, LINK_XPATHS, _link_value, _link_ok, plan.get("link"))
+    url = _absolute_url(href) if link_index is not None else None
+    indexes = {"title": title_index, "date": date_index, "link": link_index}
+
+    if not title or len(title) <= 5:
+        return None, indexes
+
+    return {
+        'entity_title': title,
+        'entry_meta_date': date or 'Дата не найдена',
+        'url': url or 'URL не найден'
+    }, indexes
+
+
+def _extract(root, plan: Optional[Dict[str, int]]) -> Tuple[List[Dict], Dict[str, int]]:
+    plan = plan or {}
+    articles, container_index = _find_containers(root, plan or None)
+    winners = {"title": Counter(), "date": Counter(), "link": Counter()}
+    news_items = []
+
+    for article in articles:
+        try:
+            news_item, indexes = extract_article(article, plan)
+        except Exception as e:
+            logger.warning("Error parsing article: %s", e)
+            continue
+
+        if news_item:
+            news_items.append(news_item)
+            for field, index in indexes.items():
+                if index is not None:
+                    winners[field][index] += 1
+
+    learned = {"container": container_index}
+    for field, counter in winners.items():
+        if counter:
+            learned[field] = counter.most_common(1)[0][0]
+    return news_items, learned
+
+
+def _has_string(element) -> bool:
+    """Аналог tag.string is not None из BeautifulSoup"""
+    children = list(element)
+    if not children:
+        return element.text is not None
+    if len(children) == 1 and not element.text and not children[0].tail:
+        child = children[0]
+        return not isinstance(child.tag, str) or _has_string(child)
+    return False
+
+
+def fallback_items(root) -> List[Dict]:
+    news_items = []
+    title_elements = [
+        element for element in root.iter(*FALLBACK_TITLE_TAGS) if _has_string(element)
+    ]
+    for title_elem in title_elements[:FALLBACK_MAX_TITLES]:
+        title = _text(title_elem)
+        if len(title) > 10 and not title.isdigit():
+            date = 'Дата не найдена'
+            parent = title_elem.getparent()
+            if parent is not None:
+                for element in parent.iterdescendants():
+                    classes = element.get('class') if isinstance(element.tag, str) else None
+                    if classes and 'date' in classes.lower():
+                        date = _text(element)
+                        break
+
+            url = 'URL не найден'
+            link = next(title_elem.iterdescendants('a'), None)
+            if link is None and parent is not None:
+                link = next(parent.iterdescendants('a'), None)
+            if link is not None and link.get('href'):
+                url = link.get('href')
+                if url.startswith('/'):
+                    url = f"https://24.kz{url}"
+
+            news_items.append({
+                'entity_title': title,
+                'entry_meta_date': date,
+                'url': url
+            })
+    return news_items
+
+
+def _build_tree(html):
+    try:
+        return lxml_html.document_fromstring(html)
+    except ValueError:
+        # Строка с XML-объявлением кодировки: lxml принимает такие документы только в байтах
+        return lxml_html.document_fromstring(html.encode('utf-8'))
+    except etree.ParserError:
+        return None
+
+
+def parse_html_lxml(html, domain: str = None) -> List[Dict]:
+    """Тот же результат, что у parse_html, но на lxml и с планом селекторов по домену"""
+    root = _build_tree(html)
+    if root is None:
+        return []
+
+    news_items = []
+    plan = selector_plans.get(domain) if domain else None
+    if plan:
+        news_items, _ = _extract(root, plan)
+
+    if not news_items:
+        news_items, learned = _extract(root, None)
+        if news_items and domain:
+            selector_plans.save(domain, learned)
+
+    if not news_items:
+        logger.debug("No articles found, trying fallback method...")
+        news_items = fallback_items(root)
+
+    logger.debug("Total news items found: %s", len(news_items))
+    return news_items
+
+
+def extract_links(html, base_url: str) -> List[str]:
+    """Ссылки страницы на тот же домен (по селекторам ссылок новостей), без повторов"""
+    root = _build_tree(html)
+    if root is None:
+        return []
+
+    domain = urlsplit(base_url).netloc
+    links = {}
+    for xpath in LINK_ALL_XPATHS:
+        for element in xpath(root):
+            href = element.get('href')
+            if not href:
+                continue
+            parts = urlsplit(urljoin(base_url, href.strip()))
+            if parts.scheme in ('http', 'https') and parts.netloc == domain:
+                links.setdefault(urlunsplit(parts._replace(fragment='')), None)
+    return list(links)
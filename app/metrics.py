@@ -0,0 +1,79 @@
+import logging
+import os
+import time
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest, multiprocess,
+    start_http_server
+)
+
+from app.config import settings
+
+# Бакеты фиксированы: память на метрику не растёт, сколько бы запросов ни прошло
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+BYTES_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216)
+
+QUEUE_WAIT = Histogram(
+    "scraper_queue_wait_seconds", "Время от постановки задачи в очередь до начала выполнения",
+    ["task"], buckets=SECONDS_BUCKETS
+)
+LIMITER_WAIT = Histogram(
+    "scraper_limiter_wait_seconds", "Ожидание слота домена в domain_limiter", buckets=SECONDS_BUCKETS
+)
+POLITENESS_DELAY = Histogram(
+    "scraper_politeness_delay_seconds", "Вежливая пауза перед запросом к домену", buckets=SECONDS_BUCKETS
+)
+FETCH_LATENCY = Histogram(
+    "scraper_fetch_latency_seconds", "Длительность одной попытки запроса вместе с чтением тела",
+    buckets=SECONDS_BUCKETS
+)
+RESPONSE_BYTES = Histogram(
+    "scraper_response_bytes", "Скачано байт тела ответа", buckets=BYTES_BUCKETS
+)
+PARSE_TIME = Histogram(
+    "scraper_parse_seconds", "Разбор одной страницы", ["engine"], buckets=SECONDS_BUCKETS
+)
+FETCH_RESPONSES = Counter(
+    "scraper_fetch_responses_total", "Ответы по доменам: код HTTP, timeout или error", ["domain", "status"]
+)
+TASKS_SUBMITTED = Counter(
+    "scraper_tasks_submitted_total", "Задачи, принятые API: new или склеенные inflight/fresh", ["kind", "source"]
+)
+
+logger = logging.getLogger(__name__)
+
+
+def metrics_registry() -> CollectorRegistry:
+    """Реестр для выдачи: в многопроцессном режиме собирает метрики всех процессов воркера"""
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return registry
+
+
+def render_metrics():
+    """Тело и Content-Type ответа для /metrics"""
+    return generate_latest(metrics_registry()), CONTENT_TYPE_LATEST
+
+
+def start_worker_exporter() -> None:
+    if not settings.WORKER_METRICS_PORT:
+        return
+    start_http_server(settings.WORKER_METRICS_PORT, registry=metrics_registry())
+    logger.info("Worker metrics exporter listening on :%s", settings.WORKER_METRICS_PORT)
+
+
+def mark_process_dead(pid: int) -> None:
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        multiprocess.mark_process_dead(pid)
+
+
+def observe_queue_wait(task_name: str, enqueued_at) -> None:
+    if enqueued_at:
+        QUEUE_WAIT.labels(task_name).observe(max(0.0, time.time() - float(enqueued_at)))
+
+
+def configure_logging() -> None:
+    """Подробные сообщения горячего пути пишутся на уровне DEBUG и по умолчанию не выводятся"""
+    logging.getLogger("app").setLevel(settings.LOG_LEVEL)
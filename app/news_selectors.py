@@ -0,0 +1,64 @@
+# Селекторы новостных карточек, общие для всех движков парсинга
+
+CONTAINER_SELECTORS = [
+    'article',
+    '.entry',
+    '.entry_card',
+    '.news-item',
+    '.post',
+    'div[class*="entry"]',
+    'div[class*="article"]',
+    'div[class*="news"]',
+    'div[class*="card"]'
+]
+
+# Ключевые слова в class у div, если ни один селектор контейнера не сработал
+CONTAINER_CLASS_KEYWORDS = ['entry', 'article', 'news', 'post', 'card', 'item', 'block']
+
+TITLE_SELECTORS = [
+    '.entry_title',
+    'h2.entry_title',
+    'h3.entry_title',
+    # Альтернативные варианты
+    '.entity_title',
+    '.entry-title',
+    'h1', 'h2', 'h3', 'h4',
+    '.title',
+    '.headline',
+    'a[href*="/news/"]',
+    'a[href*="/world/"]',
+    'a[href*="/"]',  # Любые ссылки
+    '[class*="title"]'
+]
+
+DATE_SELECTORS = [
+    # Точные классы
+    '.entry_meta_date',
+    'li.entry_meta_date',
+    # Альтернативные варианты
+    '.entry-meta-date',
+    '.entry_meta .entry_meta_date',
+    '.meta_date',
+    '.date',
+    '.publish-date',
+    '.entry-date',
+    'time',
+    '[datetime]',
+    '[class*="date"]',
+    '[class*="time"]',
+    '.entry_meta li',  # Элементы внутри метаданных
+    '.meta li'
+]
+
+# Ищем ссылку в заголовке или в статье
+LINK_SELECTORS = [
+    'a[href*="/news/"]',
+    'a[href*="/world/"]',
+    '.entry_title a',
+    'h2 a',
+    'h3 a',
+    'a[href]'
+]
+
+FALLBACK_TITLE_TAGS = ['h1', 'h2', 'h3', 'h4']
+FALLBACK_MAX_TITLES = 15
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+import multiprocessing
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from app.config import settings
+
+try:
+    import billiard
+except ImportError:
+    billiard = None
+
+logger = logging.getLogger(__name__)
+
+
+def _in_daemon_process() -> bool:
+    """Дочерний процесс prefork-пула Celery (billiard) - демон, своих процессов ему заводить нельзя"""
+    if multiprocessing.current_process().daemon:
+        return True
+    return billiard is not None and billiard.current_process().daemon
+
+
+class ParseExecutor:
+    """Выносит CPU-парсинг из event loop в пул процессов или потоков.
+
+    Семафор ограничивает число страниц, ожидающих парсинга или
+    разбираемых прямо сейчас: загрузки продолжаются, пока парсинг
+    идёт на других ядрах, а память под HTML остаётся ограниченной.
+    """
+
+    def __init__(self, mode: str = None, workers: int = None, queue_size: int = None):
+        self.mode = mode or settings.PARSE_EXECUTOR
+        self.workers = workers or settings.PARSE_WORKERS
+        self.queue_size = queue_size or settings.PARSE_QUEUE_SIZE
+        self.executor: Optional[Executor] = None
+        self.semaphore: Optional[asyncio.Semaphore] = None
+
+    def _get_executor(self) -> Executor:
+        if self.executor is None:
+            if self.mode == "process" and _in_daemon_process():
+                logger.warning("Parse executor: process pool is not available in a daemonic "
+                               "(prefork) worker process, using threads")
+                self.mode = "thread"
+            if self.mode == "process":
+                self.executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="parser")
+        return self.executor
+
+    async def run(self, func: Callable, *args):
+        if self.mode == "inline":
+            return func(*args)
+
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.queue_size)
+
+        async with self.semaphore:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+
+parse_executor = ParseExecutor()
@@ -0,0 +1,199 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import aiohttp
+
+from app.config import settings
+from app.redis_client import redis_client, async_redis_client
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Ошибки, в которых виноват прокси, а не сайт: соединение, таймаут, 407 от прокси
+PROXY_ERRORS = (aiohttp.ClientConnectionError, aiohttp.ClientHttpProxyError, asyncio.TimeoutError)
+PROXY_AUTH_REQUIRED = 407
+
+
+def mask_proxy(proxy: str) -> str:
+    """URL прокси без логина и пароля - для статистики и логов"""
+    parts = urlsplit(proxy)
+    host = parts.hostname or ''
+    if parts.port:
+        host = f"{host}:{parts.port}"
+    return urlunsplit(parts._replace(netloc=host))
+
+
+class ProxyState:
+    def __init__(self, proxy: str):
+        self.proxy = proxy
+        self.state = CLOSED
+        self.latency: Optional[float] = None
+        self.error_rate = 0.0
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.in_flight = 0
+        # Сколько раз подряд прокси выбивался: от этого растёт пауза до пробы
+        self.trips = 0
+        self.retry_at = 0.0
+        self.probing = False
+
+    @property
+    def weight(self) -> float:
+        """Чем меньше ошибок и задержка, тем чаще прокси выбирается"""
+        latency = max(self.latency or 1.0, 0.05)
+        return (1 - self.error_rate) ** 2 / latency / (1 + self.in_flight)
+
+    def to_dict(self) -> Dict:
+        return {
+            "state": self.state,
+            "latency": round(self.latency or 0, 3),
+            "error_rate": round(self.error_rate, 3),
+            "requests": self.requests,
+            "failures": self.failures,
+            "in_flight": self.in_flight,
+            "retry_in": round(max(0.0, self.retry_at - time.monotonic()), 1) if self.state != CLOSED else 0
+        }
+
+
+class ProxyPool:
+    """Выбор прокси по здоровью: задержка и доля ошибок по каждому прокси,
+    выбивание после PROXY_FAILURE_THRESHOLD ошибок подряд и одиночная проба
+    (half-open) по истечении паузы; при PROXY_PIN_DOMAINS домен закрепляется
+    за одним прокси, пока тот здоров.
+    """
+
+    SNAPSHOT_KEY = "proxy_pool:proxies"
+    PINS_KEY = "proxy_pool:pins"
+
+    def __init__(self, proxies: Iterable[str] = None):
+        self.proxies: Dict[str, ProxyState] = {
+            proxy: ProxyState(proxy) for proxy in (settings.PROXIES if proxies is None else proxies)
+        }
+        self.pin_domains = settings.PROXY_PIN_DOMAINS
+        self.pins: Dict[str, Optional[str]] = {}
+        # Незавершённые фоновые записи закреплений (ссылки держим, чтобы задачи не собрал GC)
+        self._writes = set()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.proxies)
+
+    def _available(self, exclude: Iterable[str]) -> List[ProxyState]:
+        now = time.monotonic()
+        available = []
+        for state in self.proxies.values():
+            if state.proxy in exclude:
+                continue
+            if state.state == CLOSED:
+                available.append(state)
+            elif not state.probing and now >= state.retry_at:
+                available.append(state)
+        return available
+
+    def _persist(self, coro) -> None:
+        """Закрепления пишутся в Redis в фоне: выбор прокси не ждёт сети"""
+        task = asyncio.ensure_future(coro)
+        self._writes.add(task)
+        task.add_done_callback(self._write_done)
+
+    def _write_done(self, task: asyncio.Future) -> None:
+        self._writes.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.warning("Proxy pool: failed to save domain pin: %s", task.exception())
+
+    async def _pinned(self, domain: str) -> Optional[ProxyState]:
+        # Из Redis закрепление читается один раз на домен, дальше - из локального кэша
+        if domain not in self.pins:
+            pinned = await async_redis_client.hget(self.PINS_KEY, domain)
+            self.pins[domain] = pinned.decode('utf-8') if pinned else None
+        state = self.proxies.get(self.pins[domain]) if self.pins[domain] else None
+        return state if state is not None and state.state == CLOSED else None
+
+    async def choose(self, domain: str, exclude: Iterable[str] = ()) -> Optional[str]:
+        """Прокси для следующего запроса к домену; exclude - уже подведшие в этом запросе"""
+        if not self.enabled:
+            return None
+
+        if self.pin_domains:
+            pinned = await self._pinned(domain)
+            if pinned is not None and pinned.proxy not in exclude:
+                pinned.in_flight += 1
+                return pinned.proxy
+
+        candidates = self._available(exclude)
+        if not candidates:
+            # Все выбиты: лучше прокси, который раньше всех вернётся, чем вовсе без запроса
+            candidates = [min(self.proxies.values(), key=lambda s: s.retry_at)]
+
+        state = random.choices(candidates, weights=[max(c.weight, 1e-6) for c in candidates])[0]
+        if state.state != CLOSED:
+            state.state = HALF_OPEN
+            state.probing = True
+        state.in_flight += 1
+
+        if self.pin_domains and self.pins.get(domain) != state.proxy and state.state == CLOSED:
+            self.pins[domain] = state.proxy
+            self._persist(async_redis_client.hset(self.PINS_KEY, domain, state.proxy))
+        return state.proxy
+
+    def _open(self, state: ProxyState) -> None:
+        state.state = OPEN
+        state.trips += 1
+        cooldown = min(settings.PROXY_MAX_COOLDOWN, settings.PROXY_COOLDOWN * 2 ** (state.trips - 1))
+        state.retry_at = time.monotonic() + cooldown
+        for domain, proxy in list(self.pins.items()):
+            if proxy == state.proxy:
+                self.pins[domain] = None
+                self._persist(async_redis_client.hdel(self.PINS_KEY, domain))
+
+    def release(self, proxy: Optional[str]) -> None:
+        """Запрос закончился без ответа, но не по вине прокси: только снимаем отметку «в работе»"""
+        state = self.proxies.get(proxy) if proxy else None
+        if state is not None:
+            state.in_flight = max(0, state.in_flight - 1)
+            state.probing = False
+
+    async def record(self, proxy: Optional[str], ok: bool, latency: Optional[float]) -> None:
+        """Учитывает исход запроса через прокси; ok=False - ошибка самого прокси"""
+        state = self.proxies.get(proxy) if proxy else None
+        if state is None:
+            return
+
+        state.in_flight = max(0, state.in_flight - 1)
+        state.requests += 1
+        state.error_rate = 0.9 * state.error_rate + 0.1 * (0.0 if ok else 1.0)
+        was_probe, state.probing = state.probing, False
+
+        if ok:
+            if latency is not None:
+                state.latency = latency if state.latency is None else 0.8 * state.latency + 0.2 * latency
+            state.consecutive_failures = 0
+            if state.state != CLOSED:
+                state.state = CLOSED
+                state.trips = 0
+        else:
+            state.failures += 1
+            state.consecutive_failures += 1
+            if was_probe or state.consecutive_failures >= settings.PROXY_FAILURE_THRESHOLD:
+                self._open(state)
+
+        await async_redis_client.hset(self.SNAPSHOT_KEY, mask_proxy(proxy), json.dumps(state.to_dict()))
+
+    @classmethod
+    def get_stats(cls) -> Dict:
+        """Здоровье прокси (последнее, что сообщили воркеры) и закреплённые домены"""
+        proxies = {k.decode('utf-8'): json.loads(v) for k, v in redis_client.hgetall(cls.SNAPSHOT_KEY).items()}
+        pins = {k.decode('utf-8'): mask_proxy(v.decode('utf-8')) for k, v in redis_client.hgetall(cls.PINS_KEY).items()}
+        return {"proxies": proxies, "pins": pins}
+
+
+proxy_pool = ProxyPool()
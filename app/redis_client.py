@@ -1,22 +1,100 @@
+import asyncio
 import json
 import redis
+import redis.asyncio as aioredis
 from app.config import settings
+from app.result_store import result_store
 
 redis_client = redis.Redis.from_url(settings.REDIS_URL)
+# Общий пул соединений для асинхронного кода (API, ограничитель доменов в воркерах)
+async_redis_pool = aioredis.ConnectionPool.from_url(settings.REDIS_URL, max_connections=settings.REDIS_MAX_CONNECTIONS)
+async_redis_client = aioredis.Redis(connection_pool=async_redis_pool)
 
 
-def save_task(task_id: str, task_data: dict):
-    pipeline = redis_client.pipeline()
-    pipeline.hset(f"task:{task_id}", mapping=task_data)
-    pipeline.lpush(f"task_queue", task_id)
-    pipeline.ltrim(f"task_queue", 0,  99)
-    pipeline.expire(f"task:{task_id}", 86400)
-    pipeline.execute()
+def _task_keys(task_id: str):
+    return f"celery-task-meta-{task_id}", f"task:{task_id}"
 
 def get_task_result(task_id: str) -> dict:
-    celery_key = f"celery-task-meta-{task_id}"
-    celery_result = redis_client.get(celery_key)
-    
+    celery_key, task_key = _task_keys(task_id)
+    pipeline = redis_client.pipeline(transaction=False)
+    pipeline.get(celery_key)
+    pipeline.hgetall(task_key)
+    celery_result, data = pipeline.execute()
+    return load_stored_result(task_id, index_from_store(task_id, decode_task_result(celery_result, data)))
+
+async def get_task_index_async(task_id: str) -> dict:
+    """Статус задачи и число новостей (item_count) без чтения самих новостей из хранилища результатов"""
+    celery_key, task_key = _task_keys(task_id)
+    async with async_redis_client.pipeline(transaction=False) as pipeline:
+        pipeline.get(celery_key)
+        pipeline.hgetall(task_key)
+        celery_result, data = await pipeline.execute()
+    result = decode_task_result(celery_result, data)
+    if not result and result_store.enabled:
+        # SQLite синхронный: читаем в пуле потоков, чтобы не останавливать event loop API
+        result = await asyncio.get_running_loop().run_in_executor(None, index_from_store, task_id, result)
+    return result
+
+async def get_task_result_async(task_id: str) -> dict:
+    """То же, что get_task_result, но без блокировки event loop и за один запрос к Redis"""
+    result = await get_task_index_async(task_id)
+    if not result_store.enabled or 'item_count' not in result:
+        return result
+    return await asyncio.get_running_loop().run_in_executor(None, load_stored_result, task_id, result)
+
+def index_from_store(task_id: str, result: dict) -> dict:
+    """Запись в Redis живёт сутки, результат в хранилище - RESULT_RETENTION:
+    по истечении первой статус восстанавливается по второму.
+    """
+    if result or not result_store.enabled:
+        return result
+    info = result_store.info(task_id)
+    if info is None:
+        return result
+    return {"status": "SUCCESS", "error": "", "item_count": str(info["item_count"])}
+
+def load_stored_result(task_id: str, result: dict) -> dict:
+    """Подставляет новости из хранилища результатов вместо индексной записи Redis"""
+    if not result_store.enabled or 'item_count' not in result:
+        return result
+    result["data"] = result_store.get(task_id)
+    if result["data"] is None and result.get("status") == "SUCCESS":
+        result["error"] = "Result expired"
+    return result
+
+def read_task_items(task_id: str, result: dict, start: int, limit: int) -> list:
+    """Срез новостей задачи; из хранилища результатов читаются только нужные куски"""
+    if result_store.enabled and 'item_count' in result:
+        return result_store.read_items(task_id, start, limit) or []
+    data = result.get("data")
+    return data[start:start + limit] if isinstance(data, list) else []
+
+def count_task_items(result: dict) -> int:
+    if 'item_count' in result:
+        return int(result['item_count'])
+    data = result.get("data")
+    return len(data) if isinstance(data, list) else 0
+
+def decode_task_result(celery_result, data) -> dict:
+    """Собирает статус задачи: хэш task:* главный, результат Celery - запасной вариант"""
+    if data:
+        decoded_data = {}
+        for key, value in data.items():
+            key_str = key.decode('utf-8') if isinstance(key, bytes) else key
+            value_str = value.decode('utf-8') if isinstance(value, bytes) else value
+            decoded_data[key_str] = value_str
+
+        if 'data' in decoded_data:
+            if decoded_data['data']:
+                try:
+                    decoded_data['data'] = json.loads(decoded_data['data'])
+                except json.JSONDecodeError:
+                    decoded_data['data'] = {}
+            else:
+                decoded_data['data'] = {}
+
+        return decoded_data
+
     if celery_result:
         try:
             result_data = json.loads(celery_result)
@@ -40,34 +118,85 @@ def get_task_result(task_id: str) -> dict:
                 }
         except json.JSONDecodeError:
             pass
-    data = redis_client.hgetall(f"task:{task_id}")
+
+    return {}
+
+def update_task_status(task_id: str, status: str, data: list = None, error: str = None, new: bool = False):
+    """Один конвейерный запрос на переход состояния: пишутся только изменившиеся поля"""
+    item_count = None
+    if data is not None and result_store.enabled:
+        # Новости - в хранилище результатов, в Redis - только их число
+        item_count, data = result_store.put(task_id, data), None
+    _write_task_status(task_id, status, data, error, new, item_count)
+
+async def update_task_status_async(task_id: str, status: str, data: list = None, error: str = None,
+                                   new: bool = False):
+    """update_task_status для корутин воркера: сжатие и запись в SQLite - в пуле потоков,
+    чтобы ожидание блокировки файла не останавливало остальные загрузки event loop,
+    статус - через асинхронный клиент Redis
+    """
+    item_count = None
+    if data is not None and result_store.enabled:
+        item_count = await asyncio.get_running_loop().run_in_executor(None, result_store.put, task_id, data)
+        data = None
+    async with async_redis_client.pipeline(transaction=False) as pipeline:
+        _queue_task_status(pipeline, task_id, status, data, error, new, item_count)
+        await pipeline.execute()
+
+def _write_task_status(task_id: str, status: str, data, error, new: bool, item_count):
+    pipeline = redis_client.pipeline(transaction=False)
+    _queue_task_status(pipeline, task_id, status, data, error, new, item_count)
+    pipeline.execute()
+
+def _queue_task_status(pipeline, task_id: str, status: str, data, error, new: bool, item_count):
+    """Команды записи статуса в конвейер: общий для синхронного и асинхронного клиента"""
+    fields = {"status": status}
+    if item_count is not None:
+        fields["item_count"] = item_count
+        fields["data"] = ""
+    elif data is not None:
+        fields["data"] = json.dumps(data)
+    if error is not None:
+        fields["error"] = error
+
+    pipeline.hset(f"task:{task_id}", mapping=fields)
+    pipeline.expire(f"task:{task_id}", 86400)
+    if new:
+        pipeline.lpush("task_queue", task_id)
+        pipeline.ltrim("task_queue", 0, 99)
+    pipeline.publish("task_events", json.dumps({"task_id": task_id, "status": status}))
+
+async def init_batch_async(batch_id: str, urls: list):
+    async with async_redis_client.pipeline() as pipeline:
+        pipeline.hset(f"batch:{batch_id}", mapping={
+            str(i): json.dumps({"url": url, "status": "PENDING", "data": None, "error": None})
+            for i, url in enumerate(urls)
+        })
+        pipeline.expire(f"batch:{batch_id}", 86400)
+        await pipeline.execute()
+
+async def update_batch_item_async(batch_id: str, index: int, item: dict):
+    """Запись в хранилище результатов - в пуле потоков, не в event loop воркера"""
+    if item.get("data") is not None and result_store.enabled:
+        item_count = await asyncio.get_running_loop().run_in_executor(
+            None, result_store.put, f"{batch_id}:{index}", item["data"]
+        )
+        item = {**item, "data": None, "item_count": item_count}
+    await async_redis_client.hset(f"batch:{batch_id}", str(index), json.dumps(item))
+
+def get_batch_result(batch_id: str) -> dict:
+    data = redis_client.hgetall(f"batch:{batch_id}")
     if not data:
         return {}
-    
-    decoded_data = {}
-    for key, value in data.items():
-        key_str = key.decode('utf-8') if isinstance(key, bytes) else key
-        value_str = value.decode('utf-8') if isinstance(value, bytes) else value
-        decoded_data[key_str] = value_str
-    
-    if 'data' in decoded_data:
-        if decoded_data['data']:
-            try:
-                decoded_data['data'] = json.loads(decoded_data['data'])
-            except json.JSONDecodeError:
-                decoded_data['data'] = {}
-        else:
-            decoded_data['data'] = {}
-    
-    return decoded_data
-
-def update_task_status(task_id: str, status: str, data: dict = None, error: str = None):
-    current_data = get_task_result(task_id)
-    current_data.update({
-        "status": status,
-        "data": json.dumps(data) if data else "",
-        "error": error or ""
-    })
-    save_task(task_id, current_data)
-
-   
\ No newline at end of file
+
+    items = [json.loads(data[key]) for key in sorted(data, key=int)]
+    for index, item in enumerate(items):
+        if "item_count" in item:
+            item["data"] = result_store.get(f"{batch_id}:{index}")
+    completed = sum(1 for item in items if item["status"] in ("SUCCESS", "FAILED"))
+    return {
+        "status": "SUCCESS" if completed == len(items) else "STARTED",
+        "total": len(items),
+        "completed": completed,
+        "items": items
+    }
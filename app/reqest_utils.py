@@ -1,11 +1,44 @@
 import asyncio
+import logging
+import time
+from typing import Dict, List, NamedTuple, Optional
 import aiohttp
 from app.config import settings
 import random
 from app.domain_limiter import domain_limiter
+from app.scheduler import request_scheduler
+from app.adaptive import adaptive_controller, parse_retry_after, OVERLOAD_STATUSES
+from app.metrics import FETCH_LATENCY, FETCH_RESPONSES, RESPONSE_BYTES
+from app.transports import transports
+from app.proxy_pool import proxy_pool, PROXY_ERRORS, PROXY_AUTH_REQUIRED
+from app.circuit_breaker import circuit_breaker, CircuitOpenError, OPEN, SERVER_ERROR_STATUS
 
+logger = logging.getLogger(__name__)
 
-async def make_request(url: str, session: aiohttp.ClientSession, retry_count: int = 0):
+REQUEST_TIMEOUT = 30
+
+
+class FetchResult(NamedTuple):
+    status: int
+    body: Optional[bytes]
+    encoding: Optional[str]
+    headers: Dict[str, str]
+    # Новости, разобранные потоково (fetch с stream_parser); тело при этом не сохраняется
+    items: Optional[List[Dict]] = None
+
+    @property
+    def text(self) -> Optional[str]:
+        if self.body is None:
+            return None
+        return self.body.decode(self.encoding or 'utf-8', errors='replace')
+
+
+async def make_request(url: str, session: aiohttp.ClientSession):
+    return (await fetch(url, session)).text
+
+
+async def fetch(url: str, session: aiohttp.ClientSession, extra_headers: Dict[str, str] = None,
+                stream_parser=None, max_retries: int = None) -> FetchResult:
     headers = {
         "User-Agent": random.choice(settings.USER_AGENTS),
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
@@ -14,34 +47,103 @@ async def make_request(url: str, session: aiohttp.ClientSession, retry_count: in
         "Connection": "keep-alive",
         "Upgrade-Insecure-Requests": "1",
     }
-    
-    await domain_limiter.acquire(url)
-
-    try:
-        await asyncio.sleep(settings.REQUEST_DELAY + random.uniform(0, 1))
-        
-        proxy = random.choice(settings.PROXIES) if settings.PROXIES else None
-        timeout = aiohttp.ClientTimeout(total=30)
-        
-        async with session.get(url, headers=headers, proxy=proxy, timeout=timeout) as response:
-            if response.status == 403:
-                raise Exception("Access forbidden (403)")
-            elif response.status == 429:
-                raise Exception("Rate limited (429)")
-            elif response.status >= 400:
-                raise Exception(f"HTTP error {response.status}")
-            
-            return await response.text()
-    except Exception as e:
-        if "Access forbidden (403)" in str(e):
-            raise e
-            
-        if retry_count < settings.MAX_RETRIES:
-            retry_delay = (settings.RETRY_BACKOFF ** retry_count) * 2
-            print(f"Retry {retry_count + 1}/{settings.MAX_RETRIES} after {retry_delay}s for {url}")
-            await asyncio.sleep(retry_delay)
-            return await make_request(url, session, retry_count + 1)
-        raise e
-    finally:
-        await domain_limiter.release(url)
-        
\ No newline at end of file
+    if extra_headers:
+        headers.update(extra_headers)
+
+
+    domain = domain_limiter.get_domain(url)
+    max_retries = settings.MAX_RETRIES if max_retries is None else max_retries
+    retry_count = 0
+    # Прокси, подведшие в этом запросе: повтор идёт через другой
+    failed_proxies = set()
+    # Выключатель считает запросы, а не попытки: повторы одного URL дают ему не больше одной ошибки
+    circuit_failed = False
+
+    while True:
+        # Домен, признанный недоступным, не ждёт ни паузы, ни слота: отказ сразу
+        try:
+            probe = await circuit_breaker.allow(domain)
+        except CircuitOpenError:
+            FETCH_RESPONSES.labels(domain, "circuit_open").inc()
+            raise
+
+        # Вежливая пауза и ожидание повтора проходят без занятого слота домена
+        await request_scheduler.wait_turn(url)
+        await domain_limiter.acquire(url)
+
+        started = time.monotonic()
+        proxy = None
+        proxy_recorded = False
+        circuit = None
+        try:
+            # Выбор прокси - внутри try: его ошибка не должна оставить занятым слот домена
+            proxy = await proxy_pool.choose(domain, exclude=failed_proxies)
+            transport = transports.get(domain)
+            requested = time.monotonic()
+            async with transport.request(url, headers, proxy, REQUEST_TIMEOUT, session=session) as response:
+                # Задержка ответа - от отправки запроса: ожидание соединения в пуле её не раздувает
+                latency = time.monotonic() - (response.sent_at or requested)
+                proxy_recorded = True
+                await proxy_pool.record(proxy, response.status != PROXY_AUTH_REQUIRED, latency)
+                if proxy and response.status == PROXY_AUTH_REQUIRED:
+                    failed_proxies.add(proxy)
+                FETCH_RESPONSES.labels(domain, str(response.status)).inc()
+                server_ok = response.status < SERVER_ERROR_STATUS
+                # Исход пробы выключатель ждёт всегда, иначе домен висит в half-open до probe_timeout
+                if server_ok or probe or not circuit_failed:
+                    circuit = await circuit_breaker.record(domain, server_ok)
+                    circuit_failed = circuit_failed or not server_ok
+                await adaptive_controller.record(domain, response.status, latency)
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                if retry_after and response.status in OVERLOAD_STATUSES:
+                    request_scheduler.defer(url, retry_after)
+
+                if response.status == 403:
+                    raise Exception("Access forbidden (403)")
+                elif response.status == 429:
+                    raise Exception("Rate limited (429)")
+                elif response.status >= 400:
+                    raise Exception(f"HTTP error {response.status}")
+
+                if response.status == 304:
+                    return FetchResult(response.status, None, None, dict(response.headers))
+
+                if stream_parser is not None:
+                    items = await stream_parser.consume(response)
+                    RESPONSE_BYTES.observe(stream_parser.bytes_read)
+                    return FetchResult(response.status, None, stream_parser.encoding, dict(response.headers), items)
+
+                body = await response.read()
+                RESPONSE_BYTES.observe(len(body))
+                return FetchResult(response.status, body, response.get_encoding(), dict(response.headers))
+        except Exception as e:
+            if proxy and not proxy_recorded and isinstance(e, PROXY_ERRORS):
+                proxy_recorded = True
+                failed_proxies.add(proxy)
+                await proxy_pool.record(proxy, False, None)
+            if isinstance(e, asyncio.TimeoutError):
+                FETCH_RESPONSES.labels(domain, "timeout").inc()
+                await adaptive_controller.record(domain, None, time.monotonic() - started, timed_out=True)
+            elif isinstance(e, aiohttp.ClientError):
+                FETCH_RESPONSES.labels(domain, "error").inc()
+            if circuit is None and (probe or not circuit_failed) \
+                    and isinstance(e, (asyncio.TimeoutError, aiohttp.ClientError)):
+                circuit = await circuit_breaker.record(domain, False)
+                circuit_failed = True
+            if circuit is not None and circuit[0] == OPEN:
+                # Эта ошибка открыла выключатель: повторы до пробы бессмысленны
+                raise CircuitOpenError(domain, circuit[1]) from e
+            if "Access forbidden (403)" in str(e) or retry_count >= max_retries:
+                raise e
+            error = e
+        finally:
+            if not proxy_recorded:
+                proxy_pool.release(proxy)
+            FETCH_LATENCY.observe(time.monotonic() - started)
+            await domain_limiter.release(url)
+
+        deadline = request_scheduler.retry_deadline(retry_count)
+        retry_count += 1
+        logger.info("Retry %s/%s after %.1fs for %s: %s",
+                    retry_count, max_retries, deadline - time.monotonic(), url, error)
+        await request_scheduler.wait_until(deadline)
@@ -0,0 +1,199 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import Dict, List, Optional
+
+from app.config import settings
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    result_id TEXT PRIMARY KEY,
+    created_at REAL NOT NULL,
+    item_count INTEGER NOT NULL,
+    chunk_count INTEGER NOT NULL,
+    chunk_items INTEGER NOT NULL,
+    codec TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_created_at ON results (created_at);
+CREATE TABLE IF NOT EXISTS chunks (
+    result_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (result_id, seq)
+) WITHOUT ROWID;
+"""
+
+
+def _serializer() -> str:
+    return "msgpack" if msgpack is not None else "json"
+
+
+def _compressor() -> str:
+    return "zstd" if zstandard is not None else "zlib"
+
+
+def encode_chunk(items: List[Dict], codec: str) -> bytes:
+    serializer, compressor = codec.split('+')
+    raw = msgpack.packb(items) if serializer == "msgpack" else json.dumps(items, ensure_ascii=False).encode('utf-8')
+    if compressor == "zstd":
+        return zstandard.ZstdCompressor(level=settings.RESULT_STORE_COMPRESSION_LEVEL).compress(raw)
+    return zlib.compress(raw, settings.RESULT_STORE_COMPRESSION_LEVEL)
+
+
+def decode_chunk(data: bytes, codec: str) -> List[Dict]:
+    """Кодек берётся из строки результата: записанное zstd/msgpack читается, только если они установлены"""
+    serializer, compressor = codec.split('+')
+    if (compressor == "zstd" and zstandard is None) or (serializer == "msgpack" and msgpack is None):
+        raise RuntimeError(f"Result codec {codec} is not available: install zstandard and msgpack")
+    raw = zstandard.ZstdDecompressor().decompress(data) if compressor == "zstd" else zlib.decompress(data)
+    return msgpack.unpackb(raw) if serializer == "msgpack" else json.loads(raw)
+
+
+class ResultStore:
+    """Новости завершённых задач вне Redis: SQLite-файл на общем для API и воркеров томе.
+
+    Результат режется на куски по RESULT_CHUNK_ITEMS новостей, каждый кусок
+    сжимается отдельно, так что читать можно с любого места, не распаковывая
+    всё. В Redis остаётся только статус и число новостей. Результаты старше
+    RESULT_RETENTION удаляются попутно с записью.
+    """
+
+    def __init__(self, path: str = None):
+        self.enabled = settings.RESULT_STORE_ENABLED
+        self.path = path or settings.RESULT_STORE_PATH
+        self.chunk_items = settings.RESULT_CHUNK_ITEMS
+        # Соединение SQLite нельзя делить между потоками и переносить через fork
+        self._local = threading.local()
+        self._last_purge = 0.0
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=settings.RESULT_STORE_BUSY_TIMEOUT, isolation_level=None)
+            # WAL: читатели (API) не блокируют писателей (воркеры) и наоборот
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._local.connection, self._local.pid = connection, os.getpid()
+        return connection
+
+    def put(self, result_id: str, items: List[Dict]) -> int:
+        """Сохраняет (или заменяет) результат; возвращает число новостей"""
+        codec = f"{_serializer()}+{_compressor()}"
+        chunks = [
+            encode_chunk(items[i:i + self.chunk_items], codec) for i in range(0, len(items), self.chunk_items)
+        ]
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("DELETE FROM chunks WHERE result_id = ?", (result_id,))
+            connection.execute(
+                "INSERT OR REPLACE INTO results (result_id, created_at, item_count, chunk_count, chunk_items, codec) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (result_id, time.time(), len(items), len(chunks), self.chunk_items, codec)
+            )
+            connection.executemany(
+                "INSERT INTO chunks (result_id, seq, data) VALUES (?, ?, ?)",
+                [(result_id, seq, data) for seq, data in enumerate(chunks)]
+            )
+        self._maybe_purge()
+        return len(items)
+
+    def info(self, result_id: str) -> Optional[Dict]:
+        row = self._connection().execute(
+            "SELECT created_at, item_count, chunk_count, chunk_items, codec FROM results WHERE result_id = ?",
+            (result_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return dict(zip(("created_at", "item_count", "chunk_count", "chunk_items", "codec"), row))
+
+    def read_items(self, result_id: str, start: int = 0, limit: int = None) -> Optional[List[Dict]]:
+        """Новости результата с позиции start (не больше limit) или None, если результата нет.
+
+        Читаются и распаковываются только куски, в которые попадает срез.
+        """
+        info = self.info(result_id)
+        if info is None:
+            return None
+        # Размер куска - тот, с которым результат записан, а не текущий RESULT_CHUNK_ITEMS
+        first_chunk, skip = divmod(start, info["chunk_items"])
+        last_chunk = info["chunk_count"] - 1
+        if limit is not None:
+            last_chunk = min(last_chunk, (start + limit - 1) // info["chunk_items"])
+        rows = self._connection().execute(
+            "SELECT data FROM chunks WHERE result_id = ? AND seq BETWEEN ? AND ? ORDER BY seq",
+            (result_id, first_chunk, last_chunk)
+        ).fetchall()
+
+        items = []
+        for (data,) in rows:
+            items.extend(decode_chunk(data, info["codec"]))
+        return items[skip:] if limit is None else items[skip:skip + limit]
+
+    def get(self, result_id: str) -> Optional[List[Dict]]:
+        """Все новости результата или None, если его нет (не сохранялся или удалён по сроку)"""
+        return self.read_items(result_id)
+
+    def delete(self, result_id: str) -> None:
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute("DELETE FROM chunks WHERE result_id = ?", (result_id,))
+            connection.execute("DELETE FROM results WHERE result_id = ?", (result_id,))
+
+    def purge(self, older_than: float = None) -> int:
+        """Удаляет результаты старше older_than секунд (по умолчанию RESULT_RETENTION)"""
+        cutoff = time.time() - (settings.RESULT_RETENTION if older_than is None else older_than)
+        connection = self._connection()
+        with connection:
+            connection.execute("BEGIN IMMEDIATE")
+            connection.execute(
+                "DELETE FROM chunks WHERE result_id IN (SELECT result_id FROM results WHERE created_at < ?)",
+                (cutoff,)
+            )
+            deleted = connection.execute("DELETE FROM results WHERE created_at < ?", (cutoff,)).rowcount
+        if deleted:
+            logger.info("Result store: purged %s results older than %s", deleted, time.ctime(cutoff))
+        return deleted
+
+    def _maybe_purge(self) -> None:
+        now = time.monotonic()
+        if now - self._last_purge < settings.RESULT_PURGE_INTERVAL:
+            return
+        self._last_purge = now
+        try:
+            self.purge()
+        except sqlite3.Error as e:
+            logger.warning("Result store: purge failed: %s", e)
+
+    def get_stats(self) -> Dict:
+        row = self._connection().execute("SELECT COUNT(*), COALESCE(SUM(item_count), 0) FROM results").fetchone()
+        return {
+            "results": row[0],
+            "items": row[1],
+            "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+            "codec": f"{_serializer()}+{_compressor()}"
+        }
+
+
+result_store = ResultStore()
@@ -0,0 +1,59 @@
+import asyncio
+import random
+import time
+from collections import defaultdict
+from urllib.parse import urlparse
+
+from app.config import settings
+from app.adaptive import adaptive_controller
+from app.metrics import POLITENESS_DELAY
+
+
+class RequestScheduler:
+    """Планировщик отправки запросов: вежливая пауза по домену и отложенные повторы.
+
+    Ожидание здесь никогда не занимает слот domain_limiter: слот берётся
+    только на время самого запроса.
+    """
+
+    def __init__(self, delay: float = None, jitter: float = 1.0):
+        self.delay = settings.REQUEST_DELAY if delay is None else delay
+        self.jitter = jitter
+        # Самое раннее время (time.monotonic), когда домену можно отправить следующий запрос
+        self.next_send_time = defaultdict(float)
+
+    def get_domain(self, url: str) -> str:
+        """Извлекает домен из URL"""
+        return urlparse(url).netloc
+
+    def reserve(self, url: str) -> float:
+        """Бронирует ближайшее окно отправки для домена и возвращает его время"""
+        domain = self.get_domain(url)
+        now = time.monotonic()
+        send_at = max(now, self.next_send_time[domain])
+        delay = adaptive_controller.delay(domain) if adaptive_controller.enabled else self.delay
+        self.next_send_time[domain] = send_at + delay + random.uniform(0, self.jitter)
+        return send_at
+
+    def defer(self, url: str, seconds: float) -> None:
+        """Не отправлять домену ничего ближайшие seconds секунд (Retry-After)"""
+        domain = self.get_domain(url)
+        self.next_send_time[domain] = max(self.next_send_time[domain], time.monotonic() + seconds)
+
+    async def wait_turn(self, url: str) -> None:
+        """Ждёт своего окна отправки для домена"""
+        send_at = self.reserve(url)
+        POLITENESS_DELAY.observe(max(0.0, send_at - time.monotonic()))
+        await self.wait_until(send_at)
+
+    def retry_deadline(self, retry_count: int) -> float:
+        """Момент, не раньше которого можно повторить запрос"""
+        return time.monotonic() + (settings.RETRY_BACKOFF ** retry_count) * 2
+
+    async def wait_until(self, deadline: float) -> None:
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+request_scheduler = RequestScheduler()
@@ -0,0 +1,138 @@
+import logging
+import re
+from typing import Dict, List, Optional
+
+from cssselect import HTMLTranslator
+from lxml import etree
+
+from app.config import settings
+from app.lxml_parser import extract_article, fallback_items
+from app.news_selectors import CONTAINER_SELECTORS
+
+logger = logging.getLogger(__name__)
+
+_translator = HTMLTranslator()
+
+# Все селекторы контейнеров простые, поэтому проверяются на самом элементе при его закрытии
+CONTAINER_SELF_XPATHS = [
+    etree.XPath(_translator.css_to_xpath(selector, prefix='self::')) for selector in CONTAINER_SELECTORS
+]
+
+DROPPED_TAGS = {'script', 'style'}
+
+# Сколько байт в начале документа смотреть в поисках <meta charset>
+CHARSET_SNIFF_BYTES = 1024
+_META_CHARSET = re.compile(rb'<meta[^>]+charset=["\']?([\w.:-]+)', re.IGNORECASE)
+
+
+def sniff_charset(head: bytes) -> Optional[str]:
+    match = _META_CHARSET.search(head)
+    return match.group(1).decode('ascii') if match else None
+
+
+class StreamingNewsParser:
+    """Разбирает новости по мере прихода ответа, не держа в памяти всю страницу.
+
+    Куски тела идут прямо в инкрементальный парсер lxml; карточка разбирается,
+    как только закрывается её тег. Чтение прекращается, когда набрано
+    max_items новостей или прочитано max_bytes байт, так что память на
+    дерево ограничена max_bytes.
+    """
+
+    def __init__(self, max_items: int = None, max_bytes: int = None, chunk_size: int = None):
+        self.max_items = max_items or settings.STREAM_MAX_ITEMS
+        self.max_bytes = max_bytes or settings.STREAM_MAX_BYTES
+        self.chunk_size = chunk_size or settings.STREAM_CHUNK_SIZE
+        self._reset(None)
+
+    def _reset(self, encoding: Optional[str]) -> None:
+        self.encoding = encoding
+        self.bytes_read = 0
+        self.truncated = False
+        self.items: List[Dict] = []
+        # Лучший (самый ранний в CONTAINER_SELECTORS) селектор, по которому уже нашлись карточки
+        self.container_index: Optional[int] = None
+        self._parser = None
+
+    def _start_parser(self, head: bytes) -> None:
+        self.encoding = self.encoding or sniff_charset(head[:CHARSET_SNIFF_BYTES]) or 'utf-8'
+        self._parser = etree.HTMLPullParser(events=('end',), encoding=self.encoding)
+
+    def _container_index(self, element) -> Optional[int]:
+        for index, xpath in enumerate(CONTAINER_SELF_XPATHS):
+            if self.container_index is not None and index > self.container_index:
+                break
+            if xpath(element):
+                return index
+        return None
+
+    def _process_events(self) -> None:
+        for _, element in self._parser.read_events():
+            if not isinstance(element.tag, str):
+                continue
+            if element.tag in DROPPED_TAGS:
+                # Инлайновый JS/CSS в новости не попадает, а места занимает больше всего
+                element.text = None
+                continue
+            index = self._container_index(element)
+            if index is None:
+                continue
+
+            if self.container_index is None or index < self.container_index:
+                # Нашёлся более приоритетный тип карточек - как и parse_html, берём только его
+                self.container_index = index
+                self.items = []
+
+            try:
+                news_item, _ = extract_article(element)
+            except Exception as e:
+                logger.warning("Error parsing article: %s", e)
+                continue
+
+            if news_item:
+                self.items.append(news_item)
+
+    def feed(self, chunk: bytes) -> None:
+        if self._parser is None:
+            self._start_parser(chunk)
+        self.bytes_read += len(chunk)
+        self._parser.feed(chunk)
+        self._process_events()
+
+    @property
+    def done(self) -> bool:
+        return len(self.items) >= self.max_items or self.bytes_read >= self.max_bytes
+
+    def close(self) -> List[Dict]:
+        if self._parser is None:
+            return []
+        root = self._parser.close()
+        self._process_events()
+        if not self.items and root is not None:
+            self.items = fallback_items(root)
+        return self.items[:self.max_items]
+
+    async def consume(self, response) -> List[Dict]:
+        """Читает ответ транспорта (TransportResponse) кусками до конца, лимита новостей или лимита байт"""
+        self._reset(response.charset)
+        pending = b''
+
+        async for chunk in response.iter_chunked(self.chunk_size):
+            if self._parser is None and len(pending) + len(chunk) < CHARSET_SNIFF_BYTES:
+                # Копим начало документа, чтобы определить кодировку по <meta charset>
+                pending += chunk
+                continue
+            self.feed(pending + chunk)
+            pending = b''
+            if self.done:
+                self.truncated = True
+                response.close()
+                break
+
+        if pending:
+            self.feed(pending)
+
+        items = self.close()
+        logger.debug("Streaming parser: %s items from %s bytes%s",
+                     len(items), self.bytes_read, " (stopped early)" if self.truncated else "")
+        return items
@@ -0,0 +1,88 @@
+import asyncio
+import json
+import logging
+from collections import defaultdict
+from typing import Optional
+
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.redis_client import async_redis_client
+
+logger = logging.getLogger(__name__)
+
+TASK_EVENTS_CHANNEL = "task_events"
+TERMINAL_STATUSES = {"SUCCESS", "FAILED", "FAILURE"}
+
+
+class TaskEventHub:
+    """Одна подписка Redis pub/sub на процесс API, раздающая события всем ожидающим"""
+
+    def __init__(self):
+        self.waiters = defaultdict(set)
+        self._listener: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+    async def start(self) -> None:
+        async with self._lock:
+            if self._listener is None or self._listener.done():
+                pubsub = async_redis_client.pubsub(ignore_subscribe_messages=True)
+                await pubsub.subscribe(TASK_EVENTS_CHANNEL)
+                self._listener = asyncio.create_task(self._listen(pubsub))
+
+    async def stop(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+
+    async def _listen(self, pubsub) -> None:
+        try:
+            while True:
+                try:
+                    async for message in pubsub.listen():
+                        if message["type"] == "message":
+                            self._dispatch(message["data"])
+                except (RedisConnectionError, OSError) as e:
+                    # Подписка восстановится при следующем чтении, а события за это время
+                    # могли потеряться - пусть ожидающие перечитают статус сами
+                    logger.warning("Task events: subscriber connection lost (%s), reconnecting", e)
+                    self._wake_all()
+                    await asyncio.sleep(1)
+        finally:
+            await pubsub.aclose()
+
+    def _dispatch(self, raw) -> None:
+        event = json.loads(raw)
+        if event.get("status") not in TERMINAL_STATUSES:
+            return
+        for future in self.waiters.pop(event["task_id"], ()):
+            if not future.done():
+                future.set_result(event["status"])
+
+    def _wake_all(self) -> None:
+        for task_id in list(self.waiters):
+            for future in self.waiters.pop(task_id, ()):
+                if not future.done():
+                    future.set_result(None)
+
+    def subscribe(self, task_id: str) -> asyncio.Future:
+        """Регистрирует ожидание до чтения статуса, чтобы не пропустить событие между ними"""
+        future = asyncio.get_running_loop().create_future()
+        self.waiters[task_id].add(future)
+        return future
+
+    def unsubscribe(self, task_id: str, future: asyncio.Future) -> None:
+        waiters = self.waiters.get(task_id)
+        if waiters is not None:
+            waiters.discard(future)
+            if not waiters:
+                del self.waiters[task_id]
+
+    async def wait(self, future: asyncio.Future, timeout: float) -> bool:
+        try:
+            await asyncio.wait_for(future, timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+
+task_events = TaskEventHub()
@@ -1,88 +1,316 @@
 import asyncio
-import aiohttp
+import logging
+import os
+import random
+import time
+from urllib.parse import urlparse
 from bs4 import BeautifulSoup
 from celery import current_task
+from celery.signals import (
+    before_task_publish, task_prerun, worker_init, worker_process_init, worker_process_shutdown
+)
 from app.celery import celery
 from app.config import settings
-from app.reqest_utils import make_request
-from app.redis_client import update_task_status
+from app.reqest_utils import fetch
+from app.circuit_breaker import CircuitOpenError
+from app.http_cache import response_cache
+from app import dedup, fair_queue, change_feed
+from app.http_pool import http_pool, get_worker_loop
+from app.parse_executor import parse_executor
+from app.streaming import StreamingNewsParser
+from app.feed_discovery import FeedParser, feed_discovery, feed_links
+from app.news_selectors import (
+    CONTAINER_SELECTORS, CONTAINER_CLASS_KEYWORDS, TITLE_SELECTORS, DATE_SELECTORS,
+    LINK_SELECTORS, FALLBACK_TITLE_TAGS, FALLBACK_MAX_TITLES
+)
+from app.lxml_parser import parse_html_lxml, extract_links
+from app.crawler import CrawlFrontier
+from app.redis_client import update_task_status, update_task_status_async, init_batch_async, update_batch_item_async
+from app import metrics
 
-async def scrape_url_async(url, task_id):
-    connector = aiohttp.TCPConnector(limit_per_host=settings.MAX_CONCURRENT_REQUESTS_PER_DOMAIN)
-    
-    async with aiohttp.ClientSession(connector=connector) as session:
+logger = logging.getLogger(__name__)
+metrics.configure_logging()
+
+@worker_init.connect
+def start_metrics_exporter(**kwargs):
+    metrics.start_worker_exporter()
+
+@worker_process_init.connect
+def init_http_pool(**kwargs):
+    get_worker_loop().run_until_complete(http_pool.start())
+
+@worker_process_shutdown.connect
+def close_http_pool(**kwargs):
+    loop = get_worker_loop()
+    loop.run_until_complete(http_pool.close())
+    loop.run_until_complete(http_pool.flush_stats())
+    parse_executor.shutdown()
+    metrics.mark_process_dead(os.getpid())
+
+@before_task_publish.connect
+def stamp_enqueued_at(headers=None, **kwargs):
+    # Заголовок доходит до воркера как task.request.enqueued_at
+    if headers is not None:
+        headers.setdefault("enqueued_at", time.time())
+
+@task_prerun.connect
+def observe_queue_wait(task=None, **kwargs):
+    # Повторы ставятся с countdown, их ожидание - не очередь
+    if task is not None and not task.request.retries:
+        metrics.observe_queue_wait(task.name, getattr(task.request, "enqueued_at", None))
+
+async def fetch_and_parse(url, session):
+    """Новости источника: из его RSS/Atom-ленты, если она есть, иначе из HTML страницы.
+
+    Возвращает (новости, задание на поиск ленты или None, если искать её не нужно). В задании -
+    ссылки на ленты со страницы или None, если тело страницы не читалось (304, потоковый разбор).
+    """
+    if not settings.FEED_FAST_PATH_ENABLED:
+        return (await fetch_and_parse_html(url, session))[0], None
+
+    discovered = await feed_discovery.get(url)
+    if discovered and discovered["feed_url"]:
         try:
-            update_task_status(task_id, 'PENDING', {})
-            
-            html = await make_request(url, session)
-            
-            if html:
-                result = parse_html(html)
-                
-                update_task_status(task_id, 'SUCCESS', result)
-                return result
-            else:
-                error_msg = "Failed to fetch HTML content"
-                update_task_status(task_id, 'FAILED', {}, error=error_msg)
-                raise Exception(error_msg)
-                
+            items = await stream_and_parse(discovered["feed_url"], session, FeedParser())
         except Exception as e:
-            update_task_status(task_id, 'FAILED', {}, error=str(e))
-            raise e
+            logger.warning("Feed %s failed, falling back to HTML: %s", discovered["feed_url"], e)
+            items = None
+        if items:
+            await feed_discovery.count("feed_hits")
+            return items, None
+        # Лента перестала отдавать новости - при следующем HTML-скрапинге поищем заново
+        await feed_discovery.forget(url)
+        discovered = None
+
+    result, body = await fetch_and_parse_html(url, session)
+    await feed_discovery.count("html_fallbacks")
+    if discovered is None:
+        return result, {"candidates": feed_links(body, url) if body else None}
+    return result, None
+
+async def schedule_feed_discovery(url, discovery):
+    """Ставит поиск ленты источника отдельной задачей в bulk-очередь, если его ещё никто не поставил"""
+    if discovery is not None and await feed_discovery.mark_pending(url):
+        # Публикация в брокер синхронная - в пуле потоков, чтобы не останавливать event loop
+        await asyncio.get_running_loop().run_in_executor(None, discover_feed.delay, url, discovery["candidates"])
+
+async def discover_feed_async(url, candidates=None):
+    """candidates=None - страницу источника задача скачивает сама, чтобы найти на ней ссылки на ленты"""
+    session = await http_pool.get_session()
+    try:
+        if candidates is None:
+            try:
+                response = await fetch(url, session, max_retries=0)
+                candidates = feed_links(response.body, url) if response.body else []
+            except Exception as e:
+                # Без ссылок со страницы решение "ленты нет" кэшировать нельзя
+                logger.warning("Feed discovery: failed to fetch %s: %s", url, e)
+                await feed_discovery.release_pending(url)
+                return None
+        return await feed_discovery.discover(
+            url, candidates, lambda feed_url: stream_and_parse(feed_url, session, FeedParser(), max_retries=0)
+        )
+    finally:
+        await http_pool.flush_stats()
+
+async def fetch_and_parse_html(url, session):
+    """Загружает страницу и разбирает её; неизменившиеся страницы берутся из кэша.
+
+    Возвращает (новости, тело страницы или None, если тело не скачивалось целиком).
+    """
+    if settings.STREAMING_ENABLED:
+        return await stream_and_parse(url, session), None
+
+    if not settings.HTTP_CACHE_ENABLED:
+        response = await fetch(url, session)
+        if not response.body:
+            raise Exception("Failed to fetch HTML content")
+        return await parse_executor.run(parse_page_bytes, response.body, response.encoding, url), response.body
+
+    cached = await response_cache.get(url)
+    response = await fetch(url, session, response_cache.conditional_headers(cached))
+
+    if response.status == 304 and cached:
+        result = await response_cache.load_result(url, cached)
+        if result is not None:
+            await response_cache.refresh(url, response.headers, "not_modified")
+            return result, None
+        # Прошлый результат удалён из хранилища: без условных заголовков сайт отдаст страницу целиком
+        cached = None
+        response = await fetch(url, session)
+
+    if not response.body:
+        raise Exception("Failed to fetch HTML content")
+
+    content_hash = response_cache.content_hash(response.body)
+    if cached and cached.get("content_hash") == content_hash:
+        result = await response_cache.load_result(url, cached)
+        if result is not None:
+            await response_cache.refresh(url, response.headers, "unchanged")
+            return result, response.body
+
+    result = await parse_executor.run(parse_page_bytes, response.body, response.encoding, url)
+    await response_cache.store(url, response.headers, content_hash, result)
+    return result, response.body
+
+async def stream_and_parse(url, session, stream_parser=None, max_retries=None):
+    """Потоковый вариант fetch_and_parse: новости извлекаются, пока страница или лента ещё качается"""
+    stream_parser = stream_parser or StreamingNewsParser()
+    cached = await response_cache.get(url) if settings.HTTP_CACHE_ENABLED else None
+    response = await fetch(url, session, response_cache.conditional_headers(cached),
+                           stream_parser=stream_parser, max_retries=max_retries)
+
+    if response.status == 304 and cached:
+        result = await response_cache.load_result(url, cached)
+        if result is not None:
+            await response_cache.refresh(url, response.headers, "not_modified")
+            return result
+        # На 304 тело не читалось, поэтому тот же разборщик годится для полного запроса
+        response = await fetch(url, session, stream_parser=stream_parser, max_retries=max_retries)
+
+    if settings.HTTP_CACHE_ENABLED:
+        await response_cache.store(url, response.headers, "", response.items)
+    return response.items
+
+async def scrape_url_async(url, task_id, first_attempt=True, incremental=False):
+    session = await http_pool.get_session()
+
+    try:
+        await update_task_status_async(task_id, 'PENDING', new=first_attempt)
+
+        result, discovery = await fetch_and_parse(url, session)
+
+        if settings.FEED_ENABLED:
+            new_items = await change_feed.record(url, result)
+            if incremental:
+                # Клиенту нужны только новости, которых по этому источнику ещё не было
+                result = new_items
+
+        await update_task_status_async(task_id, 'SUCCESS', result, error="")
+        # Ленту ищем после сохранения результата и отдельной задачей: клиент этого не ждёт
+        await schedule_feed_discovery(url, discovery)
+        return result
+    finally:
+        await http_pool.flush_stats()
+
+async def scrape_batch_async(urls, batch_id):
+    session = await http_pool.get_session()
+    semaphore = asyncio.Semaphore(settings.BATCH_CONCURRENCY)
+
+    await init_batch_async(batch_id, urls)
+
+    async def scrape_one(index, url):
+        async with semaphore:
+            discovery = None
+            try:
+                items, discovery = await fetch_and_parse(url, session)
+                item = {"url": url, "status": "SUCCESS", "data": items, "error": None}
+            except Exception as e:
+                item = {"url": url, "status": "FAILED", "data": None, "error": str(e)}
+
+            await update_batch_item_async(batch_id, index, item)
+            await schedule_feed_discovery(url, discovery)
+            return item["status"]
+
+    try:
+        statuses = await asyncio.gather(*(scrape_one(i, url) for i, url in enumerate(urls)))
+    finally:
+        await http_pool.flush_stats()
+
+    return {
+        "total": len(urls),
+        "succeeded": statuses.count("SUCCESS"),
+        "failed": statuses.count("FAILED")
+    }
+
+async def crawl_async(job_id, start_url, max_depth, max_pages):
+    frontier = CrawlFrontier(job_id)
+    frontier.init(start_url, max_depth, max_pages)
+    session = await http_pool.get_session()
+
+    progress = frontier.get_progress()
+    budget = max_pages - progress["pages_done"] - progress["pages_failed"]
+    in_progress = 0
+
+    async def crawl_worker():
+        nonlocal budget, in_progress
+        while budget > 0:
+            entry = frontier.pop()
+            if entry is None:
+                # Очередь пуста, но идущие загрузки ещё могут добавить ссылки
+                if in_progress == 0:
+                    return
+                await asyncio.sleep(0.2)
+                continue
+
+            budget -= 1
+            in_progress += 1
+            url, depth = entry["url"], entry["depth"]
+            try:
+                response = await fetch(url, session)
+                if not response.body:
+                    raise Exception("Failed to fetch HTML content")
+                items, links = await parse_executor.run(parse_crawl_page, response.body, response.encoding, url)
+                await frontier.record_page(url, depth, items)
+                if depth < max_depth:
+                    frontier.add_urls([dedup.normalize_url(link) for link in links], depth + 1)
+            except Exception as e:
+                await frontier.record_page(url, depth, None, error=str(e))
+            finally:
+                in_progress -= 1
+
+    try:
+        await asyncio.gather(*(crawl_worker() for _ in range(settings.CRAWL_CONCURRENCY)))
+    except Exception:
+        frontier.finish("FAILED")
+        raise
+    finally:
+        await http_pool.flush_stats()
+
+    frontier.finish()
+    return frontier.get_progress()
+
+def parse_page(html, url):
+    """Разбирает страницу движком из настроек PARSER_ENGINE"""
+    with metrics.PARSE_TIME.labels(settings.PARSER_ENGINE).time():
+        if settings.PARSER_ENGINE == "lxml":
+            return parse_html_lxml(html, urlparse(url).netloc)
+        return parse_html(html)
+
+def parse_page_bytes(body, encoding, url):
+    """Точка входа для пула парсинга: сырые байты страницы -> список новостей"""
+    return parse_page(body.decode(encoding or 'utf-8', errors='replace'), url)
+
+def parse_crawl_page(body, encoding, url):
+    """Для обхода сайта: новости страницы и ссылки, по которым идти дальше"""
+    html = body.decode(encoding or 'utf-8', errors='replace')
+    return parse_page(html, url), extract_links(html, url)
 
 def parse_html(html):
     soup = BeautifulSoup(html, 'html.parser')
     news_items = []
     
-    selectors = [
-        'article',
-        '.entry',
-        '.entry_card',
-        '.news-item',
-        '.post',
-        'div[class*="entry"]',
-        'div[class*="article"]',
-        'div[class*="news"]',
-        'div[class*="card"]'
-    ]
-    
     articles = []
-    for selector in selectors:
+    for selector in CONTAINER_SELECTORS:
         found = soup.select(selector)
         if found:
             articles = found
-            print(f"Found {len(found)} articles using selector: {selector}")
+            logger.debug("Found %s articles using selector: %s", len(found), selector)
             break
     
     if not articles:
         containers = soup.find_all('div', class_=lambda x: x and any(
-            keyword in x.lower() for keyword in ['entry', 'article', 'news', 'post', 'card', 'item', 'block']
+            keyword in x.lower() for keyword in CONTAINER_CLASS_KEYWORDS
         ))
         articles = containers
-        print(f"Found {len(articles)} containers by class keywords")
+        logger.debug("Found %s containers by class keywords", len(articles))
     
     for article in articles:
         try:
             # Ищем (entity_title)
             title = None
-            title_selectors = [
-                
-                '.entry_title',
-                'h2.entry_title', 
-                'h3.entry_title',
-                # Альтернативные варианты
-                '.entity_title',
-                '.entry-title',
-                'h1', 'h2', 'h3', 'h4',
-                '.title',
-                '.headline',
-                'a[href*="/news/"]',
-                'a[href*="/world/"]',
-                'a[href*="/"]',  # Любые ссылки
-                '[class*="title"]'
-            ]
             
-            for selector in title_selectors:
+            for selector in TITLE_SELECTORS:
                 title_elem = article.select_one(selector)
                 if title_elem:
                     title = title_elem.get_text(strip=True)
@@ -92,26 +320,8 @@ def parse_html(html):
             
             # Ищем дату (entry_meta_date)
             date = None
-            date_selectors = [
-                # Точные классы
-                '.entry_meta_date',
-                'li.entry_meta_date',
-                # Альтернативные варианты
-                '.entry-meta-date',
-                '.entry_meta .entry_meta_date',
-                '.meta_date',
-                '.date',
-                '.publish-date',
-                '.entry-date',
-                'time',
-                '[datetime]',
-                '[class*="date"]',
-                '[class*="time"]',
-                '.entry_meta li',  # Элементы внутри метаданных
-                '.meta li'
-            ]
             
-            for selector in date_selectors:
+            for selector in DATE_SELECTORS:
                 date_elem = article.select_one(selector)
                 if date_elem:
                     date = date_elem.get('datetime') or date_elem.get_text(strip=True)
@@ -121,16 +331,7 @@ def parse_html(html):
             
             url = None
             # Ищем ссылку в заголовке или в статье
-            link_selectors = [
-                'a[href*="/news/"]',
-                'a[href*="/world/"]', 
-                '.entry_title a',
-                'h2 a',
-                'h3 a',
-                'a[href]'
-            ]
-            
-            for selector in link_selectors:
+            for selector in LINK_SELECTORS:
                 link_elem = article.select_one(selector)
                 if link_elem and link_elem.get('href'):
                     url = link_elem['href']
@@ -154,16 +355,16 @@ def parse_html(html):
                 
         except Exception as e:
            
-            print(f"Error parsing article: {e}")
+            logger.warning("Error parsing article: %s", e)
             continue
     
     
     if not news_items:
-        print("No articles found, trying fallback method...")
+        logger.debug("No articles found, trying fallback method...")
         
         
-        title_elements = soup.find_all(['h1', 'h2', 'h3', 'h4'], string=True)
-        for title_elem in title_elements[:15]: 
+        title_elements = soup.find_all(FALLBACK_TITLE_TAGS, string=True)
+        for title_elem in title_elements[:FALLBACK_MAX_TITLES]: 
             title = title_elem.get_text(strip=True)
             if len(title) > 10 and not title.isdigit():
                
@@ -188,32 +389,97 @@ def parse_html(html):
                     'url': url
                 })
     
-    print(f"Total news items found: {len(news_items)}")
+    logger.debug("Total news items found: %s", len(news_items))
     return news_items
 
-@celery.task(bind=True, name='app.tasks.scrape_url', max_retries=settings.MAX_RETRIES)
-def scrape_url(self, url):
+def finish_task(url, task_id, success):
+    """Окончательное завершение задачи (не повтор): снимаем отметки и раздаём следующие задачи"""
+    dedup.release(url, task_id, success=success)
+    if settings.FAIR_SCHEDULING_ENABLED:
+        fair_queue.task_done(url)
+        # Раздача - отдельной задачей: до FAIR_DISPATCH_BATCH публикаций не должны задерживать эту
+        dispatch_fair_queue.delay()
+
+def enqueue_scrape(url, task_id, priority="bulk", incremental=False):
+    """Ставит скрапинг в честную очередь по доменам или сразу в Celery"""
+    if settings.FAIR_SCHEDULING_ENABLED:
+        fair_queue.submit(url, task_id, priority, incremental)
+        dispatch_fair_queue.delay()
+    else:
+        scrape_url.apply_async(args=[url], kwargs={"incremental": incremental}, task_id=task_id,
+                               queue=fair_queue.LANE_QUEUES[priority])
+
+def scrape_retry_countdown(url, task_id, exc, retry_count):
+    """Через сколько секунд повторить упавший скрапинг; None - задача завершена с ошибкой"""
+    if "Access forbidden (403)" in str(exc):
+        update_task_status(task_id, 'FAILED', error="Access forbidden (403) - no retries")
+        finish_task(url, task_id, success=False)
+        return None
+
+    if isinstance(exc, CircuitOpenError) and settings.CIRCUIT_OPEN_ACTION == "fail":
+        update_task_status(task_id, 'FAILED', error=str(exc))
+        finish_task(url, task_id, success=False)
+        return None
+
+    if retry_count < settings.MAX_RETRIES:
+        if isinstance(exc, CircuitOpenError):
+            # Откладываем до пробы домена; разброс, чтобы отложенные задачи не пришли все разом
+            countdown = exc.retry_in * random.uniform(1.0, 1.2) + 1
+        else:
+            countdown = (settings.RETRY_BACKOFF ** retry_count) * 2
+        logger.info("Celery retry %s/%s after %.1fs", retry_count + 1, settings.MAX_RETRIES, countdown)
+        update_task_status(task_id, 'RETRY', error=str(exc))
+        return countdown
+
+    update_task_status(task_id, 'FAILED', error=f"Max retries exceeded: {str(exc)}")
+    finish_task(url, task_id, success=False)
+    return None
+
+# Результат хранится только в хэше task:*, бэкенд Celery его не дублирует
+@celery.task(bind=True, name='app.tasks.scrape_url', max_retries=settings.MAX_RETRIES, ignore_result=True)
+def scrape_url(self, url, incremental=False):
     task_id = self.request.id
     
+    loop = get_worker_loop()
+
     try:
-        loop = asyncio.get_event_loop()
-    except RuntimeError:
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-    
-    try:
-        result = loop.run_until_complete(scrape_url_async(url, task_id))
+        result = loop.run_until_complete(
+            scrape_url_async(url, task_id, first_attempt=not self.request.retries, incremental=incremental)
+        )
+        finish_task(url, task_id, success=True)
         return result
     except Exception as exc:
-        if "Access forbidden (403)" in str(exc):
-            update_task_status(task_id, 'FAILED', {}, error="Access forbidden (403) - no retries")
-            raise exc
-        
-        retry_count = self.request.retries
-        if retry_count < settings.MAX_RETRIES:
-            countdown = (settings.RETRY_BACKOFF ** retry_count) * 2
-            print(f"Celery retry {retry_count + 1}/{settings.MAX_RETRIES} after {countdown}s")
-            raise self.retry(exc=exc, countdown=countdown, max_retries=settings.MAX_RETRIES)
-        else:
-            update_task_status(task_id, 'FAILED', {}, error=f"Max retries exceeded: {str(exc)}")
+        countdown = scrape_retry_countdown(url, task_id, exc, self.request.retries)
+        if countdown is None:
             raise exc
+        raise self.retry(exc=exc, countdown=countdown, max_retries=settings.MAX_RETRIES)
+
+@celery.task(bind=True, name='app.tasks.scrape_batch')
+def scrape_batch(self, urls):
+    """Скрапит пачку URL в одной задаче через общую сессию"""
+    batch_id = self.request.id
+
+    loop = get_worker_loop()
+
+    return loop.run_until_complete(scrape_batch_async(urls, batch_id))
+
+@celery.task(name='app.tasks.dispatch_fair_queue', ignore_result=True)
+def dispatch_fair_queue():
+    """Отправляет воркерам задачи из подочередей доменов по кругу, interactive первыми"""
+    for lane, job in fair_queue.pop_ready():
+        scrape_url.apply_async(args=[job["url"]], kwargs={"incremental": job.get("incremental", False)},
+                               task_id=job["task_id"], queue=fair_queue.LANE_QUEUES[lane])
+
+@celery.task(name='app.tasks.discover_feed', ignore_result=True)
+def discover_feed(url, candidates=None):
+    """Ищет RSS/Atom-ленту источника: ссылки со страницы, для главной страницы - известные пути домена"""
+    loop = get_worker_loop()
+
+    return loop.run_until_complete(discover_feed_async(url, candidates))
+
+@celery.task(bind=True, name='app.tasks.crawl_site', ignore_result=True)
+def crawl_site(self, start_url, max_depth, max_pages):
+    """Обходит сайт от start_url; все страницы собираются под id этой задачи"""
+    loop = get_worker_loop()
+
+    return loop.run_until_complete(crawl_async(self.request.id, start_url, max_depth, max_pages))
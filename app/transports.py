@@ -0,0 +1,342 @@
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, Optional
+
+import aiohttp
+
+from app.config import settings
+from app.http_pool import http_pool
+from app.streaming import sniff_charset, CHARSET_SNIFF_BYTES
+
+logger = logging.getLogger(__name__)
+
+AIOHTTP = "aiohttp"
+HTTPX = "httpx"
+CURL_CFFI = "curl_cffi"
+
+# CURLINFO_HTTP_VERSION -> строка протокола, как у aiohttp и httpx
+CURL_HTTP_VERSIONS = {1: "HTTP/1.0", 2: "HTTP/1.1", 3: "HTTP/2", 30: "HTTP/3"}
+
+
+class TransportTimeout(asyncio.TimeoutError):
+    """Таймаут httpx или curl-cffi: fetch обрабатывает его как таймаут aiohttp"""
+
+
+class TransportConnectionError(aiohttp.ClientConnectionError):
+    """Ошибка соединения httpx или curl-cffi.
+
+    Наследник ClientConnectionError: повторы, метрики и учёт ошибок прокси
+    в fetch работают с ним так же, как с ошибками aiohttp.
+    """
+
+
+class TransportResponse:
+    """Ответ любого транспорта с той частью интерфейса aiohttp.ClientResponse, что нужна fetch и парсерам"""
+
+    def __init__(self, raw, status: int, headers, url: str, http_version: str, charset: Optional[str]):
+        self.raw = raw
+        self.status = status
+        self.headers = headers
+        self.url = url
+        self.http_version = http_version
+        self.charset = charset
+        # Когда ушли заголовки запроса (соединение уже получено); None - транспорт этого не сообщает
+        self.sent_at: Optional[float] = None
+        self._body: Optional[bytes] = None
+
+    @property
+    def content_type(self) -> str:
+        return self.headers.get('Content-Type', '').split(';')[0].strip().lower()
+
+    async def _read(self) -> bytes:
+        raise NotImplementedError
+
+    def _iter_chunked(self, size: int) -> AsyncIterator[bytes]:
+        raise NotImplementedError
+
+    async def read(self) -> bytes:
+        if self._body is None:
+            self._body = await self._read()
+        return self._body
+
+    async def iter_chunked(self, size: int) -> AsyncIterator[bytes]:
+        async for chunk in self._iter_chunked(size):
+            yield chunk
+
+    def get_encoding(self) -> str:
+        return self.charset or sniff_charset((self._body or b'')[:CHARSET_SNIFF_BYTES]) or 'utf-8'
+
+    def close(self) -> None:
+        """Обрывает чтение тела; соединение транспорт закроет при выходе из request()"""
+
+
+class AiohttpResponse(TransportResponse):
+    def __init__(self, response: aiohttp.ClientResponse):
+        version = f"HTTP/{response.version.major}.{response.version.minor}" if response.version else "HTTP/1.1"
+        super().__init__(response, response.status, response.headers, str(response.url), version, response.charset)
+
+    @property
+    def content_type(self) -> str:
+        return self.raw.content_type
+
+    async def _read(self) -> bytes:
+        return await self.raw.read()
+
+    def _iter_chunked(self, size: int) -> AsyncIterator[bytes]:
+        return self.raw.content.iter_chunked(size)
+
+    def get_encoding(self) -> str:
+        return self.raw.get_encoding()
+
+    def close(self) -> None:
+        self.raw.close()
+
+
+class HttpxResponse(TransportResponse):
+    def __init__(self, response):
+        super().__init__(response, response.status_code, response.headers, str(response.url),
+                         response.http_version, response.charset_encoding)
+
+    async def _read(self) -> bytes:
+        with _map_errors(HTTPX):
+            return await self.raw.aread()
+
+    async def _iter_chunked(self, size: int) -> AsyncIterator[bytes]:
+        with _map_errors(HTTPX):
+            async for chunk in self.raw.aiter_bytes(size):
+                yield chunk
+
+
+class CurlCffiResponse(TransportResponse):
+    def __init__(self, response):
+        super().__init__(response, response.status_code, response.headers, response.url,
+                         CURL_HTTP_VERSIONS.get(int(response.http_version or 0), "HTTP/1.1"), response.charset)
+
+    async def _read(self) -> bytes:
+        with _map_errors(CURL_CFFI):
+            return await self.raw.acontent()
+
+    async def _iter_chunked(self, size: int) -> AsyncIterator[bytes]:
+        with _map_errors(CURL_CFFI):
+            async for chunk in self.raw.aiter_content(size):
+                yield chunk
+
+
+class _map_errors:
+    """Переводит исключения httpx и curl-cffi в TransportTimeout / TransportConnectionError"""
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc is None:
+            return False
+        if self.name == HTTPX:
+            import httpx
+            if isinstance(exc, httpx.TimeoutException):
+                raise TransportTimeout(str(exc)) from exc
+            if isinstance(exc, httpx.TransportError):
+                raise TransportConnectionError(str(exc)) from exc
+        elif self.name == CURL_CFFI:
+            from curl_cffi.requests import exceptions
+            if isinstance(exc, exceptions.Timeout):
+                raise TransportTimeout(str(exc)) from exc
+            if isinstance(exc, exceptions.RequestException):
+                raise TransportConnectionError(str(exc)) from exc
+        return False
+
+
+class Transport:
+    """HTTP-клиент за fetch: request() отдаёт TransportResponse и считает протокол и соединения"""
+
+    name = None
+
+    def _count(self, response: TransportResponse, connections_opened: int) -> None:
+        counters = http_pool.counters
+        counters[f"{self.name}_requests"] += 1
+        counters[f"{self.name}_{response.http_version}"] += 1
+        counters[f"{self.name}_connections_opened"] += connections_opened
+
+    def request(self, url: str, headers: Dict[str, str], proxy: Optional[str], timeout: float,
+                session: aiohttp.ClientSession = None):
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class AiohttpTransport(Transport):
+    """HTTP/1.1 через общий пул HttpPool; новые соединения уже считает его trace (connection_misses)"""
+
+    name = AIOHTTP
+
+    @asynccontextmanager
+    async def request(self, url, headers, proxy, timeout, session=None):
+        if proxy or session is None:
+            session = await http_pool.get_proxy_session(proxy) if proxy else await http_pool.get_session()
+        timing = {}
+        async with session.get(url, headers=headers, proxy=proxy, timeout=aiohttp.ClientTimeout(total=timeout),
+                               trace_request_ctx=timing) as raw:
+            response = AiohttpResponse(raw)
+            response.sent_at = timing.get("sent_at")
+            self._count(response, 0)
+            yield response
+
+
+class HttpxTransport(Transport):
+    """httpx с HTTP/2: параллельные запросы к хосту идут потоками одного соединения.
+
+    Клиент (и пул соединений) - свой на каждый прокси. Без пакета h2
+    (httpx[http2]) работает по HTTP/1.1.
+    """
+
+    name = HTTPX
+
+    def __init__(self):
+        self.clients = {}
+        self._http2 = None
+
+    def _client(self, proxy: Optional[str]):
+        import httpx
+
+        if self._http2 is None:
+            try:
+                import h2  # noqa: F401
+                self._http2 = True
+            except ImportError:
+                logger.warning("httpx transport: h2 is not installed, falling back to HTTP/1.1")
+                self._http2 = False
+
+        client = self.clients.get(proxy)
+        if client is None or client.is_closed:
+            limits = httpx.Limits(max_connections=settings.HTTP_POOL_LIMIT,
+                                  max_keepalive_connections=settings.HTTP_POOL_LIMIT,
+                                  keepalive_expiry=settings.HTTP_KEEPALIVE_TIMEOUT)
+            client = self.clients[proxy] = httpx.AsyncClient(http2=self._http2, proxy=proxy,
+                                                              limits=limits, follow_redirects=True)
+        return client
+
+    @asynccontextmanager
+    async def request(self, url, headers, proxy, timeout, session=None):
+        client = self._client(proxy)
+        connections = 0
+        sent_at = None
+
+        async def trace(event_name, info):
+            nonlocal connections, sent_at
+            if event_name == "connection.connect_tcp.complete":
+                connections += 1
+            elif event_name.endswith(".send_request_headers.started"):
+                sent_at = time.monotonic()
+
+        with _map_errors(HTTPX):
+            async with client.stream("GET", url, headers=headers, timeout=timeout,
+                                     extensions={"trace": trace}) as raw:
+                response = HttpxResponse(raw)
+                response.sent_at = sent_at
+                self._count(response, connections)
+                yield response
+
+    async def close(self) -> None:
+        for client in self.clients.values():
+            await client.aclose()
+        self.clients = {}
+
+
+class CurlCffiTransport(Transport):
+    """curl-cffi: TLS/HTTP2-отпечаток настоящего браузера (CURL_IMPERSONATE) для сайтов, режущих ботов"""
+
+    name = CURL_CFFI
+
+    def __init__(self):
+        self.sessions = {}
+
+    def _session(self, proxy: Optional[str]):
+        from curl_cffi import CurlInfo
+        from curl_cffi.requests import AsyncSession
+
+        session = self.sessions.get(proxy)
+        if session is None:
+            session = self.sessions[proxy] = AsyncSession(
+                impersonate=settings.CURL_IMPERSONATE, proxy=proxy, max_clients=settings.HTTP_POOL_LIMIT,
+                curl_infos=[CurlInfo.NUM_CONNECTS]
+            )
+        return session
+
+    @asynccontextmanager
+    async def request(self, url, headers, proxy, timeout, session=None):
+        from curl_cffi import CurlInfo
+
+        client = self._session(proxy)
+        with _map_errors(CURL_CFFI):
+            raw = await client.request("GET", url, headers=headers, timeout=timeout, stream=True)
+        try:
+            response = CurlCffiResponse(raw)
+            self._count(response, int(raw.infos.get(CurlInfo.NUM_CONNECTS) or 0))
+            yield response
+        finally:
+            await raw.aclose()
+
+    async def close(self) -> None:
+        for session in self.sessions.values():
+            await session.close()
+        self.sessions = {}
+
+
+TRANSPORTS = {AIOHTTP: AiohttpTransport, HTTPX: HttpxTransport, CURL_CFFI: CurlCffiTransport}
+
+
+class TransportRegistry:
+    """Транспорт по домену: HTTP_TRANSPORT_DOMAINS, иначе HTTP_TRANSPORT"""
+
+    def __init__(self, default: str = None, domains: Dict[str, str] = None):
+        self.default = default or settings.HTTP_TRANSPORT
+        self.domains = settings.HTTP_TRANSPORT_DOMAINS if domains is None else domains
+        for name in [self.default, *self.domains.values()]:
+            if name not in TRANSPORTS:
+                raise ValueError(f"Unknown HTTP transport: {name}")
+        self.transports: Dict[str, Transport] = {}
+
+    def name_for(self, domain: str) -> str:
+        name = self.domains.get(domain)
+        if name is None and domain.startswith('www.'):
+            name = self.domains.get(domain[4:])
+        return name or self.default
+
+    def get(self, domain: str) -> Transport:
+        name = self.name_for(domain)
+        transport = self.transports.get(name)
+        if transport is None:
+            transport = self.transports[name] = TRANSPORTS[name]()
+            http_pool.add_transport(transport)
+        return transport
+
+
+transports = TransportRegistry()
+
+
+def get_transport_stats(pool_stats: Dict) -> Dict:
+    """Протоколы и переиспользование соединений по транспортам из счётчиков stats:http_pool"""
+    stats = {}
+    for name in TRANSPORTS:
+        requests = pool_stats.get(f"{name}_requests", 0)
+        if not requests:
+            continue
+        if name == AIOHTTP:
+            opened = pool_stats.get("connection_misses", 0)
+        else:
+            opened = pool_stats.get(f"{name}_connections_opened", 0)
+        prefix = f"{name}_HTTP/"
+        stats[name] = {
+            "requests": requests,
+            "connections_opened": opened,
+            "requests_per_connection": round(requests / opened, 2) if opened else None,
+            "connection_reuse_ratio": max(0.0, 1 - opened / requests),
+            "protocols": {k[len(name) + 1:]: v for k, v in pool_stats.items() if k.startswith(prefix)}
+        }
+    return stats
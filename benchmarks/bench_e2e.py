@@ -0,0 +1,152 @@
+import asyncio
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List
+
+from redis.exceptions import RedisError
+
+from app import change_feed
+from app.circuit_breaker import circuit_breaker
+from app.config import settings
+from app.domain_limiter import domain_limiter
+from app.feed_discovery import feed_discovery
+from app.http_cache import response_cache
+from app.http_pool import http_pool
+from app.redis_client import redis_client, _task_keys
+from app.result_store import result_store
+from app.reqest_utils import make_request
+from app.scheduler import request_scheduler
+from app.tasks import scrape_url_async
+from benchmarks.stub_server import StubServer
+
+
+def _percentile(values: List[float], percent: float) -> float:
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+async def _measure(call: Callable[[int], Awaitable], requests: int, concurrency: int) -> Dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+
+    async def one(i: int):
+        nonlocal errors
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                await call(i)
+            except Exception:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': requests,
+        'errors': errors,
+        'requests_per_second': requests / elapsed if elapsed else 0,
+        'p50_ms': _percentile(latencies, 50) * 1000,
+        'p95_ms': _percentile(latencies, 95) * 1000,
+    }
+
+
+def _redis_available() -> bool:
+    try:
+        return redis_client.ping()
+    except RedisError:
+        return False
+
+
+def _hold_feed_discovery(urls: List[str]) -> None:
+    """Отметки "поиск ленты уже поставлен": прогон не публикует в брокер задачи поиска для заглушки"""
+    pipeline = redis_client.pipeline(transaction=False)
+    for url in urls:
+        pipeline.set(f"{feed_discovery._source_key(url)}:pending", 1, ex=feed_discovery.PENDING_TTL)
+    pipeline.execute()
+
+
+def _cleanup(task_ids: List[str], urls: List[str]) -> None:
+    """Удаляет всё, что прогон scrape_url_async оставил в Redis и хранилище результатов"""
+    sources = [change_feed.source_id(url) for url in urls]
+    # Ссылки потока на новости в хранилище результатов - до удаления самих потоков
+    refs = set()
+    for sid in sources:
+        for _, fields in redis_client.xrange(f"feed:{sid}:stream"):
+            if b"ref" in fields:
+                refs.add(fields[b"ref"].decode('utf-8'))
+
+    pipeline = redis_client.pipeline(transaction=False)
+    for task_id in task_ids:
+        pipeline.delete(*_task_keys(task_id))
+        pipeline.lrem("task_queue", 0, task_id)
+    for url, sid in zip(urls, sources):
+        pipeline.delete(f"feed:{sid}:seen", f"feed:{sid}:stream", response_cache._key(url),
+                        feed_discovery._source_key(url), f"{feed_discovery._source_key(url)}:pending")
+        pipeline.hdel(change_feed.SOURCES_KEY, sid)
+    pipeline.execute()
+
+    if result_store.enabled:
+        for result_id in [*task_ids, *refs, *(response_cache._key(url) for url in urls)]:
+            result_store.delete(result_id)
+
+
+async def _run(page: str, requests: int, concurrency: int, latency: float, jitter: float,
+               error_rate: float) -> Dict:
+    server = StubServer(latency=latency, jitter=jitter, error_rate=error_rate)
+    await server.start()
+    url = server.url(page)
+    session = await http_pool.start()
+    results = {}
+    redis_available = _redis_available()
+    # Выключатель доменов живёт в Redis; без него make_request меряется без выключателя
+    circuit_breaker.enabled = circuit_breaker.enabled and redis_available
+
+    try:
+        results[f'make_request.{page}'] = await _measure(
+            lambda i: make_request(url, session), requests, concurrency
+        )
+
+        if redis_available:
+            # Разные URL, чтобы кэш условных запросов не превратил прогон в замер Redis
+            task_ids = [f"bench-{uuid.uuid4()}" for _ in range(requests)]
+            urls = [f"{url}?n={i}" for i in range(requests)]
+            _hold_feed_discovery(urls)
+            try:
+                results[f'scrape_url_async.{page}'] = await _measure(
+                    lambda i: scrape_url_async(urls[i], task_ids[i]), requests, concurrency
+                )
+            finally:
+                _cleanup(task_ids, urls)
+        else:
+            print(f"scrape_url_async skipped: Redis at {settings.REDIS_URL} is not available")
+    finally:
+        await http_pool.close()
+        await server.stop()
+
+    for name, result in results.items():
+        print(f"e2e   {name:<28} {result['requests_per_second']:8.1f} req/s "
+              f"p50 {result['p50_ms']:7.1f} ms  p95 {result['p95_ms']:7.1f} ms  errors {result['errors']}")
+    return results
+
+
+def run(page: str = 'index', requests: int = 200, concurrency: int = 20, latency: float = 0.05,
+        jitter: float = 0.0, error_rate: float = 0.0, per_domain: int = None, delay: float = 0.0,
+        max_retries: int = None) -> Dict:
+    """make_request и scrape_url_async против заглушки на 127.0.0.1.
+
+    Вежливая пауза по умолчанию выключена (delay=0): иначе замер показывает
+    REQUEST_DELAY, а не скорость конвейера. Заглушка - один домен, поэтому
+    пропускная способность ограничена per_domain одновременными запросами.
+    """
+    request_scheduler.delay = delay
+    request_scheduler.jitter = 0.0
+    if per_domain:
+        domain_limiter.max_concurrent_per_domain = per_domain
+    if max_retries is not None:
+        settings.MAX_RETRIES = max_retries
+    return asyncio.run(_run(page, requests, concurrency, latency, jitter, error_rate))
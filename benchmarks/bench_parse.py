@@ -0,0 +1,55 @@
+import time
+from typing import Callable, Dict
+
+from app.lxml_parser import parse_html_lxml, selector_plans, _build_tree, _extract
+from app.tasks import parse_html
+from benchmarks.corpus import load_corpus
+
+ENGINES: Dict[str, Callable] = {
+    'bs4': parse_html,
+    'lxml': parse_html_lxml,
+    'lxml_plan': lambda html: parse_html_lxml(html, 'bench.local'),
+}
+
+# Минимальное время замера на страницу: маленькие страницы прогоняются много раз
+MIN_SECONDS = 1.0
+MAX_ROUNDS = 200
+
+
+def bench_page(parse: Callable, html: str, min_seconds: float = MIN_SECONDS) -> Dict:
+    parse(html)  # прогрев: импорты, план селекторов lxml
+    rounds = 0
+    items = 0
+    started = time.perf_counter()
+    while rounds < MAX_ROUNDS:
+        items = len(parse(html))
+        rounds += 1
+        if time.perf_counter() - started >= min_seconds:
+            break
+    elapsed = time.perf_counter() - started
+    return {
+        'rounds': rounds,
+        'items': items,
+        'bytes': len(html.encode('utf-8')),
+        'ms_per_page': elapsed / rounds * 1000,
+        'items_per_second': items * rounds / elapsed if elapsed else 0
+    }
+
+
+def seed_plan(html: str) -> None:
+    """План селекторов в памяти, как у воркера после первой страницы домена (без Redis)"""
+    news_items, learned = _extract(_build_tree(html), None)
+    selector_plans.plans['bench.local'] = learned if news_items else None
+
+
+def run(min_seconds: float = MIN_SECONDS) -> Dict:
+    """parse_html и parse_html_lxml (без плана и с планом селекторов) на каждой странице корпуса"""
+    results = {}
+    for page, html in load_corpus().items():
+        seed_plan(html)
+        for engine, parse in ENGINES.items():
+            result = bench_page(parse, html, min_seconds)
+            results[f'{page}.{engine}'] = result
+            print(f"parse {page:<9} {engine:<9} {result['ms_per_page']:9.2f} ms/page "
+                  f"{result['items_per_second']:10.0f} items/s ({result['items']} items)")
+    return results
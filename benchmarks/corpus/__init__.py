@@ -0,0 +1,33 @@
+import re
+from pathlib import Path
+from typing import Dict
+
+CORPUS_DIR = Path(__file__).parent
+
+# Огромная страница собирается из карточек index.html, чтобы не хранить мегабайты в репозитории
+HUGE_PAGE_CARDS = 5000
+_ARTICLE = re.compile(r'<article class="entry_card">.*?</article>\n', re.DOTALL)
+
+
+def _read(name: str) -> str:
+    return (CORPUS_DIR / name).read_text(encoding='utf-8')
+
+
+def build_huge_page(index_html: str, cards: int = HUGE_PAGE_CARDS) -> str:
+    articles = _ARTICLE.findall(index_html)
+    body = ''.join(articles[i % len(articles)] for i in range(cards))
+    # Большой инлайновый скрипт в начале, как у страниц с вшитым состоянием SPA
+    state = '<script>window.__STATE__=' + '{"a":1},' * 20000 + '{};</script>\n'
+    start = index_html.index('<section class="category-list">')
+    end = index_html.index('</section>', start)
+    return index_html[:start] + state + '<section class="category-list">\n' + body + index_html[end:]
+
+
+def load_corpus() -> Dict[str, str]:
+    """Страницы для бенчмарков: имя -> HTML"""
+    index_html = _read('index.html')
+    return {
+        'index': index_html,
+        'fallback': _read('fallback.html'),
+        'huge': build_huge_page(index_html)
+    }
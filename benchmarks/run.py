@@ -0,0 +1,99 @@
+import argparse
+import json
+import platform
+import sys
+from datetime import datetime, timezone
+from typing import Dict, List, Tuple
+
+from app.config import settings
+
+# Направление метрик: меньше - лучше или больше - лучше; остальные поля справочные
+LOWER_IS_BETTER = ('ms_per_page', 'p50_ms', 'p95_ms')
+HIGHER_IS_BETTER = ('items_per_second', 'requests_per_second')
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> List[Tuple[str, float, float, float]]:
+    """Регрессии хуже базовой линии больше чем на threshold: (метрика, было, стало, изменение)"""
+    regressions = []
+    for suite, benches in current.items():
+        if suite == 'meta':
+            continue
+        for bench, result in benches.items():
+            base = baseline.get(suite, {}).get(bench)
+            if not base:
+                continue
+            for metric, value in result.items():
+                old = base.get(metric)
+                if not old:
+                    continue
+                if metric in LOWER_IS_BETTER:
+                    change = (value - old) / old
+                elif metric in HIGHER_IS_BETTER:
+                    change = (old - value) / old
+                else:
+                    continue
+                name = f"{suite}.{bench}.{metric}"
+                marker = 'REGRESSION' if change > threshold else 'ok'
+                verdict = f"{change * 100:.1f}% worse" if change > 0 else f"{-change * 100:.1f}% better"
+                print(f"{marker:<10} {name:<55} {old:12.2f} -> {value:12.2f} ({verdict})")
+                if change > threshold:
+                    regressions.append((name, old, value, change))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Офлайн-бенчмарки парсинга и конвейера скрапинга")
+    parser.add_argument('--suite', nargs='+', choices=['parse', 'e2e'], default=['parse', 'e2e'])
+    parser.add_argument('--output', default='bench_results.json', help="куда записать результаты (JSON)")
+    parser.add_argument('--compare', help="базовая линия (JSON прошлого прогона) для поиска регрессий")
+    parser.add_argument('--threshold', type=float, default=0.15, help="допустимое ухудшение, доля")
+    parser.add_argument('--min-seconds', type=float, default=1.0, help="время замера на страницу в parse")
+    parser.add_argument('--page', default='index', help="страница корпуса для e2e")
+    parser.add_argument('--requests', type=int, default=200)
+    parser.add_argument('--concurrency', type=int, default=20)
+    parser.add_argument('--latency', type=float, default=0.05, help="задержка заглушки, секунд")
+    parser.add_argument('--jitter', type=float, default=0.0)
+    parser.add_argument('--error-rate', type=float, default=0.0, help="доля ответов 503 от заглушки")
+    parser.add_argument('--per-domain', type=int, help="лимит одновременных запросов к домену")
+    parser.add_argument('--delay', type=float, default=0.0, help="вежливая пауза между запросами к домену")
+    parser.add_argument('--max-retries', type=int)
+    args = parser.parse_args(argv)
+
+    results = {
+        'meta': {
+            'created': datetime.now(timezone.utc).isoformat(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'parser_engine': settings.PARSER_ENGINE,
+            'parse_executor': settings.PARSE_EXECUTOR,
+            'streaming': settings.STREAMING_ENABLED
+        }
+    }
+    if 'parse' in args.suite:
+        from benchmarks import bench_parse
+        results['parse'] = bench_parse.run(args.min_seconds)
+    if 'e2e' in args.suite:
+        from benchmarks import bench_e2e
+        results['e2e'] = bench_e2e.run(
+            page=args.page, requests=args.requests, concurrency=args.concurrency, latency=args.latency,
+            jitter=args.jitter, error_rate=args.error_rate, per_domain=args.per_domain, delay=args.delay,
+            max_retries=args.max_retries
+        )
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, results, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) over {args.threshold * 100:.0f}%")
+            return 1
+        print("No regressions")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
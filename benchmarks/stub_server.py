@@ -0,0 +1,74 @@
+import argparse
+import asyncio
+import random
+from typing import Dict, Optional
+
+from aiohttp import web
+
+from benchmarks.corpus import load_corpus
+
+
+class StubServer:
+    """Локальный сайт для бенчмарков: страницы корпуса с задержкой и долей ошибок"""
+
+    def __init__(self, pages: Dict[str, str] = None, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, seed: int = 0):
+        self.pages = {name: html.encode('utf-8') for name, html in (pages or load_corpus()).items()}
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url = None
+
+    async def handle(self, request: web.Request) -> web.Response:
+        self.requests += 1
+        delay = self.latency + self.random.uniform(0, self.jitter)
+        if delay:
+            await asyncio.sleep(delay)
+
+        body = self.pages.get(request.match_info['page'])
+        if body is None:
+            raise web.HTTPNotFound()
+        if self.random.random() < self.error_rate:
+            self.errors += 1
+            return web.Response(status=503, text="Service Unavailable")
+        return web.Response(body=body, content_type='text/html', charset='utf-8')
+
+    async def start(self, host: str = '127.0.0.1', port: int = 0) -> str:
+        app = web.Application()
+        app.router.add_get('/{page}', self.handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.base_url = f"http://{host}:{port}"
+        return self.base_url
+
+    async def stop(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def url(self, page: str) -> str:
+        return f"{self.base_url}/{page}"
+
+
+async def serve(args) -> None:
+    server = StubServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    await server.start(args.host, args.port)
+    print(f"Stub server on {server.base_url}: pages {', '.join(server.pages)}")
+    await asyncio.Event().wait()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Сайт-заглушка для ручной проверки скрапера")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help="задержка ответа, секунд")
+    parser.add_argument('--jitter', type=float, default=0.0, help="случайная добавка к задержке, секунд")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="доля ответов 503")
+    asyncio.run(serve(parser.parse_args()))
@@ -31,10 +31,13 @@ def test_create_task(url):
     except Exception as e:
         return {"status": "FAILED", "error": str(e)}
 
-def test_task_status(task_id):
-    """Получает статус задачи"""
+def test_task_status(task_id, wait=None):
+    """Получает статус задачи (с wait - ждёт завершения до wait секунд)"""
     try:
-        response = requests.get(f"{API_BASE}/tasks/{task_id}")
+        if wait:
+            response = requests.get(f"{API_BASE}/tasks/{task_id}/wait", params={"timeout": wait}, timeout=wait + 10)
+        else:
+            response = requests.get(f"{API_BASE}/tasks/{task_id}")
         if response.status_code == 200:
             data = response.json()
             return {
@@ -106,27 +109,26 @@ def test_scraping_workflow():
     
     task_id = create_result["task_id"]
     
-    for i in range(60):
-        time.sleep(1)
-        status_result = test_task_status(task_id)
+    started = time.time()
+    status_result = test_task_status(task_id, wait=60)
+    
+    if status_result["status"] == "OK":
+        task_status = status_result["task_status"]
         
-        if status_result["status"] == "OK":
-            task_status = status_result["task_status"]
-            
-            if task_status == "SUCCESS":
-                return {
-                    "status": "OK",
-                    "task_id": task_id,
-                    "execution_time": i + 1,
-                    "news_count": status_result["data_count"],
-                    "final_status": status_result
-                }
-            elif task_status == "FAILED":
-                return {
-                    "status": "FAILED", 
-                    "step": "task_failed",
-                    "error": status_result["error"]
-                }
+        if task_status == "SUCCESS":
+            return {
+                "status": "OK",
+                "task_id": task_id,
+                "execution_time": round(time.time() - started, 2),
+                "news_count": status_result["data_count"],
+                "final_status": status_result
+            }
+        elif task_status == "FAILED":
+            return {
+                "status": "FAILED", 
+                "step": "task_failed",
+                "error": status_result["error"]
+            }
     
     return {"status": "TIMEOUT", "task_id": task_id, "waited": 60}
 
@@ -0,0 +1,19 @@
+import fakeredis
+import pytest
+
+
+@pytest.fixture
+def redis_server():
+    return fakeredis.FakeServer()
+
+
+@pytest.fixture
+def fake_redis(redis_server):
+    """Синхронный клиент fakeredis; Lua-скрипты выполняются по-настоящему (lupa)"""
+    return fakeredis.FakeRedis(server=redis_server)
+
+
+@pytest.fixture
+def fake_async_redis(redis_server):
+    """Асинхронный клиент к тому же серверу, что и fake_redis"""
+    return fakeredis.FakeAsyncRedis(server=redis_server)
@@ -0,0 +1,91 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from app import adaptive
+from app.adaptive import AdaptiveController, parse_retry_after
+from app.config import settings
+
+DOMAIN = "example.com"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(adaptive, "time", SimpleNamespace(monotonic=lambda: now[0], time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def controller(fake_redis, fake_async_redis, clock, monkeypatch):
+    monkeypatch.setattr(adaptive, "redis_client", fake_redis)
+    monkeypatch.setattr(adaptive, "async_redis_client", fake_async_redis)
+    monkeypatch.setattr(settings, "ADAPTIVE_CONCURRENCY_ENABLED", True)
+    monkeypatch.setattr(settings, "ADAPTIVE_MIN_CONCURRENCY", 1)
+    monkeypatch.setattr(settings, "ADAPTIVE_MAX_CONCURRENCY", 10)
+    monkeypatch.setattr(settings, "ADAPTIVE_MIN_DELAY", 0.2)
+    monkeypatch.setattr(settings, "ADAPTIVE_MAX_DELAY", 30)
+    monkeypatch.setattr(settings, "ADAPTIVE_DECREASE", 0.5)
+    monkeypatch.setattr(settings, "MAX_CONCURRENT_REQUESTS_PER_DOMAIN", 4)
+    monkeypatch.setattr(settings, "REQUEST_DELAY", 1.0)
+    return AdaptiveController()
+
+
+def record(controller, *results):
+    async def scenario():
+        for status, latency in results:
+            await controller.record(DOMAIN, status, latency)
+    asyncio.run(scenario())
+
+
+def test_successes_raise_limit_additively(controller):
+    # Окно - столько успехов, каков лимит: +1/limit за каждый
+    record(controller, *[(200, 0.1)] * 4)
+    assert controller.limit(DOMAIN) == 4
+    record(controller, (200, 0.1))
+    assert controller.limit(DOMAIN) == 5
+    assert controller.delay(DOMAIN) < 1.0
+
+    record(controller, *[(200, 0.1)] * 200)
+    assert controller.limit(DOMAIN) == 10
+    assert controller.delay(DOMAIN) == 0.2
+
+
+def test_overload_halves_limit_and_doubles_delay(controller):
+    record(controller, (429, 0.1))
+    assert controller.limit(DOMAIN) == 2
+    assert controller.delay(DOMAIN) == 2.0
+
+
+def test_one_decrease_per_wave_of_errors(controller, clock):
+    record(controller, (503, 0.1), (503, 0.1), (503, 0.1))
+    assert controller.limit(DOMAIN) == 2
+
+    clock[0] += 2
+    record(controller, (503, 0.1))
+    assert controller.limit(DOMAIN) == 1
+
+
+def test_latency_spike_decreases_limit(controller):
+    record(controller, *[(200, 0.1)] * 6)
+    limit = controller._state(DOMAIN).limit
+
+    record(controller, (200, 1.0))
+    assert controller._state(DOMAIN).limit == pytest.approx(limit * 0.5)
+
+
+def test_client_errors_do_not_change_limit(controller):
+    record(controller, (404, 0.1))
+    assert controller.limit(DOMAIN) == 4 and controller.delay(DOMAIN) == 1.0
+
+
+def test_new_worker_starts_from_shared_snapshot(controller, fake_redis):
+    record(controller, (429, 0.1))
+    assert AdaptiveController().limit(DOMAIN) == 2
+
+
+def test_parse_retry_after(clock):
+    assert parse_retry_after("120") == 120.0
+    assert parse_retry_after("Thu, 01 Jan 1970 00:17:00 GMT") == 20.0
+    assert parse_retry_after("soon") is None
@@ -0,0 +1,90 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from app import async_worker
+from app.async_worker import AsyncWorker
+from app.celery import celery
+
+
+class Message:
+    """Сообщение kombu с той частью интерфейса, что читает воркер"""
+
+    def __init__(self, task, args, retries=0):
+        self.headers = {"task": task, "id": "t1", "retries": retries}
+        self.delivery_info = {"routing_key": "scraping"}
+        self.args = args
+
+    def decode(self):
+        return self.args, {}, {}
+
+
+@pytest.fixture
+def calls(monkeypatch):
+    """Синхронные вызовы воркера: имя, аргументы и поток, в котором они выполнились"""
+    calls = []
+
+    def recorder(name, result=None):
+        def call(*args, **kwargs):
+            calls.append((name, args, threading.get_ident()))
+            return result
+        return call
+
+    monkeypatch.setattr(async_worker, "finish_task", recorder("finish_task"))
+    monkeypatch.setattr(async_worker, "scrape_url", SimpleNamespace(apply_async=recorder("apply_async")))
+    monkeypatch.setattr(async_worker.metrics, "observe_queue_wait", lambda *args: None)
+    return calls
+
+
+def execute(worker, message):
+    async def scenario():
+        worker.loop = asyncio.get_running_loop()
+        worker._stopping = asyncio.Event()
+        await worker._execute(message)
+        return threading.get_ident()
+    return asyncio.run(scenario())
+
+
+def test_success_finishes_task_off_the_loop_and_acks(calls, monkeypatch):
+    async def scrape_url_async(url, task_id, first_attempt=True, incremental=False):
+        return [{"url": url}]
+
+    monkeypatch.setattr(async_worker, "scrape_url_async", scrape_url_async)
+    worker = AsyncWorker(queues=["scraping"], concurrency=1)
+    message = Message("app.tasks.scrape_url", ["https://example.com/"])
+    loop_thread = execute(worker, message)
+
+    assert [(name, args) for name, args, _ in calls] == [("finish_task", ("https://example.com/", "t1", True))]
+    assert calls[0][2] != loop_thread
+    assert worker._settlements.get_nowait() == (message, False)
+
+
+def test_failure_schedules_retry_off_the_loop(calls, monkeypatch):
+    async def scrape_url_async(*args, **kwargs):
+        raise ConnectionError("reset")
+
+    monkeypatch.setattr(async_worker, "scrape_url_async", scrape_url_async)
+    monkeypatch.setattr(async_worker, "scrape_retry_countdown", lambda url, task_id, exc, retries: 4.0)
+    worker = AsyncWorker(queues=["scraping"], concurrency=1)
+    loop_thread = execute(worker, Message("app.tasks.scrape_url", ["https://example.com/"], retries=1))
+
+    [(name, _, thread)] = calls
+    assert name == "apply_async" and thread != loop_thread
+
+
+def test_final_failure_is_marked_without_retry(calls, monkeypatch):
+    async def scrape_batch_async(urls, batch_id):
+        raise RuntimeError("boom")
+
+    failures = []
+    monkeypatch.setattr(async_worker, "scrape_batch_async", scrape_batch_async)
+    monkeypatch.setattr(celery.backend, "mark_as_failure",
+                        lambda task_id, exc: failures.append((task_id, str(exc), threading.get_ident())))
+    worker = AsyncWorker(queues=["scraping"], concurrency=1)
+    loop_thread = execute(worker, Message("app.tasks.scrape_batch", [["https://example.com/"]]))
+
+    [(task_id, error, thread)] = failures
+    assert (task_id, error) == ("t1", "boom") and thread != loop_thread
+    assert calls == []
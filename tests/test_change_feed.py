@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from app import change_feed
+from app.config import settings
+from app.result_store import ResultStore
+
+URL = "https://example.com/news"
+
+
+@pytest.fixture
+def redis(fake_redis, fake_async_redis, monkeypatch):
+    monkeypatch.setattr(change_feed, "redis_client", fake_redis)
+    monkeypatch.setattr(change_feed, "async_redis_client", fake_async_redis)
+    monkeypatch.setattr(change_feed, "_blocking_client", fake_async_redis)
+    monkeypatch.setattr(change_feed, "_record_script", fake_async_redis.register_script(change_feed.RECORD_SCRIPT))
+    monkeypatch.setattr(settings, "RESULT_STORE_ENABLED", False)
+    monkeypatch.setattr(change_feed, "result_store", ResultStore())
+    return fake_redis
+
+
+@pytest.fixture
+def store(redis, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "RESULT_STORE_ENABLED", True)
+    store = ResultStore(str(tmp_path / "results.db"))
+    monkeypatch.setattr(change_feed, "result_store", store)
+    return store
+
+
+def record(url, items):
+    return asyncio.run(change_feed.record(url, items))
+
+
+def item(n):
+    return {"url": f"https://example.com/{n}", "entity_title": f"News {n}"}
+
+
+def test_record_returns_only_unseen_items(redis):
+    assert record(URL, [item(1), item(2)]) == [item(1), item(2)]
+    assert record(URL, [item(2), item(3)]) == [item(3)]
+    assert change_feed.list_sources() == {change_feed.source_id(URL): "https://example.com/news"}
+
+
+def test_read_continues_from_cursor(redis):
+    sid = change_feed.source_id(URL)
+    record(URL, [item(1)])
+    first = asyncio.run(change_feed.read(sid))
+    record(URL, [item(2)])
+    second = asyncio.run(change_feed.read(sid, first["cursor"]))
+
+    assert first["items"] == [item(1)]
+    assert second["items"] == [item(2)]
+
+
+def test_wait_returns_immediately_when_all_waiters_are_busy(redis, monkeypatch):
+    sid = change_feed.source_id(URL)
+    monkeypatch.setattr(change_feed, "_waiters", asyncio.Semaphore(0))
+
+    async def read():
+        return await asyncio.wait_for(change_feed.read(sid, wait=30), timeout=1)
+
+    assert asyncio.run(read()) == {"source": sid, "items": [], "cursor": "0-0"}
+
+
+def test_stream_keeps_references_to_result_store(store, redis):
+    sid = change_feed.source_id(URL)
+    record(URL, [item(1), item(2)])
+    record(URL, [item(2), item(3)])
+
+    entries = redis.xrange(f"feed:{sid}:stream")
+    assert all(b"item" not in fields for _, fields in entries)
+    assert asyncio.run(change_feed.read(sid))["items"] == [item(1), item(2), item(3)]
+
+
+def test_result_without_new_items_is_not_kept(store):
+    record(URL, [item(1)])
+    record(URL, [item(1)])
+    assert store.get_stats()["results"] == 1
@@ -0,0 +1,111 @@
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from app import circuit_breaker as circuit_breaker_module
+from app import reqest_utils
+from app.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, HALF_OPEN, OPEN
+from app.config import settings
+from app.http_pool import http_pool
+from benchmarks.stub_server import StubServer
+
+DOMAIN = "example.com"
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Время выключателя в секундах; тест двигает его вручную"""
+    now = [1_000_000.0]
+    monkeypatch.setattr(circuit_breaker_module, "time", SimpleNamespace(time=lambda: now[0]))
+    return now
+
+
+@pytest.fixture
+def breaker(fake_redis, fake_async_redis, clock, monkeypatch):
+    monkeypatch.setattr(circuit_breaker_module, "redis_client", fake_redis)
+    monkeypatch.setattr(circuit_breaker_module, "async_redis_client", fake_async_redis)
+    monkeypatch.setattr(settings, "CIRCUIT_BREAKER_ENABLED", True)
+    monkeypatch.setattr(settings, "CIRCUIT_FAILURE_THRESHOLD", 3)
+    monkeypatch.setattr(settings, "CIRCUIT_COOLDOWN", 30)
+    monkeypatch.setattr(settings, "CIRCUIT_MAX_COOLDOWN", 600)
+    monkeypatch.setattr(settings, "CIRCUIT_PROBE_TIMEOUT", 60)
+    return CircuitBreaker()
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def fail(breaker, times):
+    async def record():
+        return [await breaker.record(DOMAIN, False) for _ in range(times)]
+    return run(record())[-1]
+
+
+def test_opens_after_threshold_consecutive_failures(breaker):
+    assert fail(breaker, 2) == (CLOSED, 0.0)
+    assert fail(breaker, 1) == (OPEN, 30.0)
+    with pytest.raises(CircuitOpenError):
+        run(breaker.allow(DOMAIN))
+
+
+def test_success_resets_failure_streak(breaker):
+    fail(breaker, 2)
+    run(breaker.record(DOMAIN, True))
+    assert fail(breaker, 2) == (CLOSED, 0.0)
+
+
+def test_single_probe_after_cooldown(breaker, clock):
+    fail(breaker, 3)
+    clock[0] += 31
+
+    assert run(breaker.allow(DOMAIN)) is True
+    with pytest.raises(CircuitOpenError):
+        run(breaker.allow(DOMAIN))
+    assert breaker.get_stats()[DOMAIN]["state"] == HALF_OPEN
+
+
+def test_successful_probe_closes(breaker, clock):
+    fail(breaker, 3)
+    clock[0] += 31
+    run(breaker.allow(DOMAIN))
+
+    assert run(breaker.record(DOMAIN, True)) == (CLOSED, 0.0)
+    assert run(breaker.allow(DOMAIN)) is False
+
+
+def test_failed_probe_reopens_with_doubled_cooldown(breaker, clock):
+    fail(breaker, 3)
+    clock[0] += 31
+    run(breaker.allow(DOMAIN))
+
+    assert fail(breaker, 1) == (OPEN, 60.0)
+    assert breaker.get_stats()[DOMAIN]["times_opened"] == 2
+
+
+def test_fetch_counts_one_failure_per_request(breaker, monkeypatch):
+    """Повторы одного URL, отвечающего 5xx, не должны открыть выключатель всего домена"""
+    monkeypatch.setattr(reqest_utils, "circuit_breaker", breaker)
+    monkeypatch.setattr(reqest_utils.request_scheduler, "delay", 0)
+    monkeypatch.setattr(reqest_utils.request_scheduler, "jitter", 0)
+    monkeypatch.setattr(reqest_utils.request_scheduler, "retry_deadline", lambda retry_count: time.monotonic())
+    server = StubServer(pages={"index": "<html></html>"}, error_rate=1.0)
+
+    async def scenario():
+        await server.start()
+        await http_pool.start()
+        try:
+            with pytest.raises(Exception, match="HTTP error 503"):
+                await reqest_utils.fetch(server.url("index"), await http_pool.get_session(), max_retries=5)
+        finally:
+            await http_pool.close()
+            await server.stop()
+        return server.requests, reqest_utils.domain_limiter.get_domain(server.url("index"))
+
+    requests, domain = run(scenario())
+
+    assert requests == 6
+    stats = breaker.get_stats()[domain]
+    assert stats["state"] == CLOSED and stats["consecutive_failures"] == 1
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from app import crawler
+from app.config import settings
+from app.crawler import CrawlFrontier, bloom_size
+from app.result_store import ResultStore
+
+ITEMS = [{"entity_title": "News", "url": "https://example.com/1"}]
+
+
+@pytest.fixture
+def frontier(fake_redis, fake_async_redis, monkeypatch):
+    monkeypatch.setattr(crawler, "redis_client", fake_redis)
+    monkeypatch.setattr(crawler, "async_redis_client", fake_async_redis)
+    monkeypatch.setattr(settings, "RESULT_STORE_ENABLED", False)
+    monkeypatch.setattr(crawler, "result_store", ResultStore())
+    return CrawlFrontier("job1")
+
+
+@pytest.fixture
+def store(frontier, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "RESULT_STORE_ENABLED", True)
+    store = ResultStore(str(tmp_path / "results.db"))
+    monkeypatch.setattr(crawler, "result_store", store)
+    return store
+
+
+def test_bloom_size_follows_max_pages(monkeypatch):
+    monkeypatch.setattr(settings, "CRAWL_BLOOM_URLS_PER_PAGE", 50)
+    monkeypatch.setattr(settings, "CRAWL_BLOOM_FP_RATE", 0.01)
+
+    assert bloom_size(1) == (settings.CRAWL_BLOOM_MIN_BITS, 7)
+    bits, hashes = bloom_size(10000)
+    # 500 тыс. URL при 1% ложных срабатываний - около 9.6 бит на URL
+    assert 4_700_000 < bits < 4_900_000 and hashes == 7
+    assert bloom_size(10 ** 7)[0] == settings.CRAWL_BLOOM_BITS
+
+
+def test_small_crawl_keeps_small_filter(frontier, fake_redis):
+    frontier.init("https://example.com/", max_depth=2, max_pages=100)
+    frontier.add_urls([f"https://example.com/{i}" for i in range(1000)], 1)
+
+    assert fake_redis.strlen(frontier.seen_key) <= settings.CRAWL_BLOOM_MIN_BITS // 8
+
+
+def test_seen_urls_are_not_queued_again(frontier):
+    frontier.init("https://example.com/", max_depth=2, max_pages=100)
+
+    assert frontier.add_urls(["https://example.com/", "https://example.com/a"], 1) == 1
+    assert frontier.add_urls(["https://example.com/a", "https://example.com/b"], 1) == 1
+    assert [frontier.pop()["url"] for _ in range(3)] == [
+        "https://example.com/", "https://example.com/a", "https://example.com/b"]
+    assert frontier.pop() is None
+
+
+def test_resumed_crawl_reads_filter_size_from_meta(frontier, fake_redis):
+    frontier.init("https://example.com/", max_depth=2, max_pages=100)
+    frontier.add_urls(["https://example.com/a"], 1)
+
+    resumed = CrawlFrontier("job1")
+    assert resumed.init("https://example.com/", max_depth=2, max_pages=100000) is False
+    assert resumed.add_urls(["https://example.com/a"], 1) == 0
+    assert resumed.bloom_bits == frontier.bloom_bits
+
+
+def test_pages_are_kept_in_redis_without_result_store(frontier):
+    frontier.init("https://example.com/", max_depth=2, max_pages=100)
+    asyncio.run(frontier.record_page("https://example.com/", 0, ITEMS))
+
+    assert frontier.get_pages() == [{"url": "https://example.com/", "depth": 0, "items": ITEMS, "error": None}]
+
+
+def test_page_list_keeps_references_to_result_store(frontier, store, fake_redis):
+    frontier.init("https://example.com/", max_depth=2, max_pages=100)
+    asyncio.run(frontier.record_page("https://example.com/", 0, ITEMS))
+    asyncio.run(frontier.record_page("https://example.com/a", 1, None, error="HTTP error 404"))
+
+    assert b"entity_title" not in b"".join(fake_redis.lrange(frontier.pages_key, 0, -1))
+    assert frontier.get_pages() == [
+        {"url": "https://example.com/", "depth": 0, "items": ITEMS, "error": None},
+        {"url": "https://example.com/a", "depth": 1, "items": None, "error": "HTTP error 404"},
+    ]
+    progress = frontier.get_progress()
+    assert progress["pages_done"] == 1 and progress["pages_failed"] == 1 and progress["items_found"] == 1
@@ -0,0 +1,80 @@
+import asyncio
+
+import pytest
+
+from app import dedup
+from app.config import settings
+
+
+@pytest.fixture
+def redis(fake_redis, monkeypatch):
+    monkeypatch.setattr(dedup, "redis_client", fake_redis)
+    monkeypatch.setattr(dedup, "_claim_script", fake_redis.register_script(dedup.CLAIM_SCRIPT))
+    monkeypatch.setattr(dedup, "_release_script", fake_redis.register_script(dedup.RELEASE_SCRIPT))
+    return fake_redis
+
+
+def test_normalize_url_matches_equivalent_urls():
+    assert dedup.normalize_url("HTTPS://Example.com:443?b=2&a=1") == dedup.normalize_url("https://example.com/?a=1&b=2")
+
+
+def test_first_claim_is_new(redis):
+    assert dedup.claim("https://example.com/news", "t1") == ("new", "t1")
+
+
+def test_second_claim_joins_inflight_task(redis):
+    dedup.claim("https://example.com/news", "t1")
+    assert dedup.claim("https://EXAMPLE.com/news", "t2") == ("inflight", "t1")
+
+
+def test_successful_release_makes_result_fresh(redis):
+    dedup.claim("https://example.com/news", "t1")
+    dedup.release("https://example.com/news", "t1", success=True)
+    assert dedup.claim("https://example.com/news", "t2") == ("fresh", "t1")
+
+
+def test_failed_release_frees_url_without_fresh_result(redis):
+    dedup.claim("https://example.com/news", "t1")
+    dedup.release("https://example.com/news", "t1", success=False)
+    assert dedup.claim("https://example.com/news", "t2") == ("new", "t2")
+
+
+def test_release_by_task_without_claim_does_not_become_fresh(redis):
+    # Инкрементальная задача идёт мимо claim, но finish_task всё равно вызывает release
+    dedup.release("https://example.com/news", "incremental", success=True)
+    assert dedup.claim("https://example.com/news", "t1") == ("new", "t1")
+
+
+def test_release_by_other_task_keeps_inflight_claim(redis):
+    dedup.claim("https://example.com/news", "t1")
+    dedup.release("https://example.com/news", "incremental", success=True)
+    assert dedup.claim("https://example.com/news", "t2") == ("inflight", "t1")
+
+
+def test_zero_freshness_disables_fresh_reuse(redis, monkeypatch):
+    monkeypatch.setattr(settings, "DEDUP_FRESHNESS_SECONDS", 0)
+    dedup.claim("https://example.com/news", "t1")
+    dedup.release("https://example.com/news", "t1", success=True)
+    assert dedup.claim("https://example.com/news", "t2") == ("new", "t2")
+
+
+def test_stats_count_claims(redis):
+    dedup.claim("https://example.com/news", "t1")
+    dedup.claim("https://example.com/news", "t2")
+    stats = dedup.get_stats()
+    assert stats["new"] == 1 and stats["inflight"] == 1
+    assert stats["dedupe_rate"] == 0.5
+
+
+def test_claim_is_released_when_enqueue_fails(redis, monkeypatch):
+    from app import api
+
+    def enqueue_scrape(*args, **kwargs):
+        raise ConnectionError("broker is down")
+
+    monkeypatch.setattr(settings, "DEDUP_ENABLED", True)
+    monkeypatch.setattr(api, "enqueue_scrape", enqueue_scrape)
+    with pytest.raises(ConnectionError):
+        asyncio.run(api.create_task(api.TaskRequest(url="https://example.com/news")))
+
+    assert dedup.claim("https://example.com/news", "t2") == ("new", "t2")
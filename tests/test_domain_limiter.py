@@ -0,0 +1,71 @@
+import asyncio
+import time
+
+import pytest
+
+from app import domain_limiter as domain_limiter_module
+from app.config import settings
+from app.domain_limiter import ACQUIRE_SCRIPT, RedisDomainLimiter
+
+URL = "https://example.com/news"
+
+
+@pytest.fixture
+def limiter(fake_redis, fake_async_redis, monkeypatch):
+    monkeypatch.setattr(domain_limiter_module, "redis_client", fake_redis)
+    monkeypatch.setattr(domain_limiter_module, "async_redis_client", fake_async_redis)
+    monkeypatch.setattr(settings, "DOMAIN_RATE_LIMIT", 0)
+    monkeypatch.setattr(settings, "DOMAIN_LIMITER_POLL_INTERVAL", 0.01)
+    return RedisDomainLimiter(max_concurrent_per_domain=2)
+
+
+def acquire(redis, limiter, token, rate=0, burst=1, lease_ms=60000):
+    """Один вызов скрипта захвата: (выдан ли слот, через сколько мс повторить)"""
+    script = redis.register_script(ACQUIRE_SCRIPT)
+    granted, retry_ms = script(keys=limiter._keys("example.com"),
+                               args=[token, limiter.max_concurrent_per_domain, lease_ms, rate, burst, 0, "example.com"])
+    return granted, retry_ms
+
+
+def test_concurrency_cap(limiter, fake_redis):
+    assert acquire(fake_redis, limiter, "a")[0] == 1
+    assert acquire(fake_redis, limiter, "b")[0] == 1
+    assert acquire(fake_redis, limiter, "c") == (0, 0)
+
+    fake_redis.zrem(limiter._keys("example.com")[0], "a")
+    assert acquire(fake_redis, limiter, "c")[0] == 1
+
+
+def test_expired_lease_frees_the_slot(limiter, fake_redis):
+    acquire(fake_redis, limiter, "a", lease_ms=20)
+    acquire(fake_redis, limiter, "b", lease_ms=20)
+    time.sleep(0.05)
+    assert acquire(fake_redis, limiter, "c")[0] == 1
+
+
+def test_token_bucket_limits_rate(limiter, fake_redis):
+    limiter.max_concurrent_per_domain = 100
+    assert acquire(fake_redis, limiter, "a", rate=2, burst=2)[0] == 1
+    assert acquire(fake_redis, limiter, "b", rate=2, burst=2)[0] == 1
+
+    granted, retry_ms = acquire(fake_redis, limiter, "c", rate=2, burst=2)
+    assert granted == 0 and 0 < retry_ms <= 500
+
+    time.sleep(retry_ms / 1000 + 0.02)
+    assert acquire(fake_redis, limiter, "c", rate=2, burst=2)[0] == 1
+
+
+def test_acquire_waits_for_release(limiter):
+    async def scenario():
+        await limiter.acquire(URL)
+        await limiter.acquire(URL)
+        third = asyncio.ensure_future(limiter.acquire(URL))
+        await asyncio.sleep(0.05)
+        assert not third.done()
+        await limiter.release(URL)
+        await asyncio.wait_for(third, timeout=1)
+
+    asyncio.run(scenario())
+
+    stats = limiter.get_stats()["example.com"]
+    assert stats["active_requests"] == 2 and stats["total_requests"] == 3
@@ -0,0 +1,69 @@
+import pytest
+
+from app import fair_queue
+from app.config import settings
+
+
+@pytest.fixture
+def redis(fake_redis, monkeypatch):
+    monkeypatch.setattr(fair_queue, "redis_client", fake_redis)
+    monkeypatch.setattr(fair_queue, "_submit_script", fake_redis.register_script(fair_queue.SUBMIT_SCRIPT))
+    monkeypatch.setattr(fair_queue, "_dispatch_script", fake_redis.register_script(fair_queue.DISPATCH_SCRIPT))
+    monkeypatch.setattr(fair_queue, "_done_script", fake_redis.register_script(fair_queue.DONE_SCRIPT))
+    monkeypatch.setattr(settings, "FAIR_DOMAIN_INFLIGHT", 1)
+    return fake_redis
+
+
+def urls(jobs):
+    return [job["url"] for _, job in jobs]
+
+
+def test_domains_are_served_round_robin(redis, monkeypatch):
+    monkeypatch.setattr(settings, "FAIR_DOMAIN_INFLIGHT", 10)
+    for i in range(3):
+        fair_queue.submit(f"https://a.com/{i}", f"a{i}", "bulk")
+    fair_queue.submit("https://b.com/0", "b0", "bulk")
+
+    assert urls(fair_queue.pop_ready(3)) == ["https://a.com/0", "https://b.com/0", "https://a.com/1"]
+
+
+def test_domain_inflight_cap_holds_back_jobs(redis):
+    fair_queue.submit("https://a.com/0", "a0", "bulk")
+    fair_queue.submit("https://a.com/1", "a1", "bulk")
+
+    assert urls(fair_queue.pop_ready(10)) == ["https://a.com/0"]
+    assert fair_queue.pop_ready(10) == []
+
+
+def test_task_done_frees_domain_slot(redis):
+    fair_queue.submit("https://a.com/0", "a0", "bulk")
+    fair_queue.submit("https://a.com/1", "a1", "bulk")
+    fair_queue.pop_ready(10)
+
+    fair_queue.task_done("https://a.com/0")
+
+    assert urls(fair_queue.pop_ready(10)) == ["https://a.com/1"]
+
+
+def test_interactive_lane_is_dispatched_first(redis, monkeypatch):
+    monkeypatch.setattr(settings, "FAIR_DOMAIN_INFLIGHT", 10)
+    fair_queue.submit("https://a.com/bulk", "t1", "bulk")
+    fair_queue.submit("https://b.com/interactive", "t2", "interactive")
+
+    assert fair_queue.pop_ready(10) == [
+        ("interactive", {"task_id": "t2", "url": "https://b.com/interactive", "incremental": False}),
+        ("bulk", {"task_id": "t1", "url": "https://a.com/bulk", "incremental": False}),
+    ]
+
+
+def test_inflight_ttl_is_not_refreshed_by_later_dispatches(redis, monkeypatch):
+    monkeypatch.setattr(settings, "FAIR_DOMAIN_INFLIGHT", 10)
+    fair_queue.submit("https://a.com/0", "a0", "bulk")
+    fair_queue.pop_ready(10)
+    redis.expire("fair:inflight:a.com", 5)
+
+    fair_queue.submit("https://a.com/1", "a1", "bulk")
+    fair_queue.pop_ready(10)
+
+    assert int(redis.get("fair:inflight:a.com")) == 2
+    assert redis.ttl("fair:inflight:a.com") <= 5
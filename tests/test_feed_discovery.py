@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from app import feed_discovery as feed_discovery_module
+from app.config import settings
+from app.feed_discovery import FeedDiscovery, feed_links
+
+
+@pytest.fixture
+def discovery(fake_async_redis, monkeypatch):
+    monkeypatch.setattr(feed_discovery_module, "async_redis_client", fake_async_redis)
+    monkeypatch.setattr(settings, "FEED_WELL_KNOWN_PATHS", ["/rss", "/feed"])
+    return FeedDiscovery()
+
+
+def fetcher(feeds):
+    """fetch_feed, для которого лентами являются только адреса из feeds; запоминает пробы"""
+    probed = []
+
+    async def fetch_feed(feed_url):
+        probed.append(feed_url)
+        return [{"url": feed_url}] if feed_url in feeds else []
+
+    fetch_feed.probed = probed
+    return fetch_feed
+
+
+def test_feed_links_reads_alternate_links():
+    html = b'<head><link rel="alternate" type="application/rss+xml" href="/news/rss"></head>'
+    assert feed_links(html, "https://example.com/news/") == ["https://example.com/news/rss"]
+
+
+def test_page_link_wins(discovery):
+    fetch_feed = fetcher({"https://example.com/news/rss"})
+    feed = asyncio.run(discovery.discover("https://example.com/news/", ["https://example.com/news/rss"], fetch_feed))
+
+    assert feed == "https://example.com/news/rss"
+    assert asyncio.run(discovery.get("https://example.com/news/")) == {"feed_url": "https://example.com/news/rss"}
+
+
+def test_domain_root_falls_back_to_well_known_paths(discovery):
+    fetch_feed = fetcher({"https://example.com/feed"})
+    assert asyncio.run(discovery.discover("https://example.com/", [], fetch_feed)) == "https://example.com/feed"
+
+
+def test_section_page_is_not_replaced_by_domain_feed(discovery):
+    fetch_feed = fetcher({"https://example.com/rss"})
+    feed = asyncio.run(discovery.discover("https://example.com/sport/", [], fetch_feed))
+
+    assert feed is None
+    assert fetch_feed.probed == []
+    assert asyncio.run(discovery.get("https://example.com/sport/")) == {"feed_url": ""}
+
+
+def test_discovery_is_scheduled_once_until_it_finishes(discovery):
+    url = "https://example.com/"
+    assert asyncio.run(discovery.mark_pending(url))
+    assert not asyncio.run(discovery.mark_pending(url))
+
+    asyncio.run(discovery.discover(url, [], fetcher(set())))
+
+    assert asyncio.run(discovery.mark_pending(url))
+
+
+def test_discovery_without_page_links_fetches_the_page(discovery, monkeypatch):
+    """После 304 или потокового разбора тела страницы нет: задача поиска скачивает её сама"""
+    from app import tasks
+    from app.reqest_utils import FetchResult
+
+    page = b'<head><link rel="alternate" type="application/rss+xml" href="/sport/rss"></head>'
+    fetched = []
+
+    async def fetch(url, session, *args, **kwargs):
+        fetched.append(url)
+        return FetchResult(200, page, "utf-8", {})
+
+    async def get_session():
+        return None
+
+    async def flush_stats():
+        pass
+
+    async def stream_and_parse(feed_url, *args, **kwargs):
+        return [{"url": feed_url}]
+
+    monkeypatch.setattr(tasks, "feed_discovery", discovery)
+    monkeypatch.setattr(tasks, "fetch", fetch)
+    monkeypatch.setattr(tasks, "stream_and_parse", stream_and_parse)
+    monkeypatch.setattr(tasks.http_pool, "get_session", get_session)
+    monkeypatch.setattr(tasks.http_pool, "flush_stats", flush_stats)
+
+    feed = asyncio.run(tasks.discover_feed_async("https://example.com/sport/"))
+
+    assert fetched == ["https://example.com/sport/"]
+    assert feed == "https://example.com/sport/rss"
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+
+from app import http_cache
+from app.config import settings
+from app.http_cache import ResponseCache
+from app.result_store import ResultStore
+
+URL = "https://example.com/news"
+HEADERS = {"ETag": '"v1"', "Last-Modified": "Sun, 18 Oct 2026 10:00:00 GMT"}
+RESULT = [{"entity_title": "News", "url": "https://example.com/1"}]
+
+
+@pytest.fixture
+def cache(fake_async_redis, monkeypatch):
+    monkeypatch.setattr(http_cache, "async_redis_client", fake_async_redis)
+    return ResponseCache()
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "RESULT_STORE_ENABLED", True)
+    store = ResultStore(str(tmp_path / "results.db"))
+    monkeypatch.setattr(http_cache, "result_store", store)
+    return store
+
+
+def test_result_is_kept_in_redis_without_result_store(cache, fake_redis, monkeypatch):
+    monkeypatch.setattr(settings, "RESULT_STORE_ENABLED", False)
+    monkeypatch.setattr(http_cache, "result_store", ResultStore())
+    asyncio.run(cache.store(URL, HEADERS, "hash", RESULT))
+
+    entry = asyncio.run(cache.get(URL))
+    assert cache.conditional_headers(entry) == {"If-None-Match": '"v1"', "If-Modified-Since": HEADERS["Last-Modified"]}
+    assert asyncio.run(cache.load_result(URL, entry)) == RESULT
+
+
+def test_result_moves_to_result_store(cache, store, fake_redis):
+    asyncio.run(cache.store(URL, HEADERS, "hash", RESULT))
+
+    assert fake_redis.hget(cache._key(URL), "result") is None
+    assert asyncio.run(cache.load_result(URL, asyncio.run(cache.get(URL)))) == RESULT
+
+
+def test_purged_result_is_reported_missing(cache, store):
+    asyncio.run(cache.store(URL, HEADERS, "hash", RESULT))
+    store.purge(older_than=-1)
+
+    assert asyncio.run(cache.load_result(URL, asyncio.run(cache.get(URL)))) is None
@@ -0,0 +1,44 @@
+import asyncio
+import time
+
+from app.config import settings
+from app.http_pool import HttpPool, limit_per_host
+from app.transports import AiohttpTransport
+from benchmarks.stub_server import StubServer
+
+
+def test_limit_per_host_follows_adaptive_ceiling(monkeypatch):
+    monkeypatch.setattr(settings, "MAX_CONCURRENT_REQUESTS_PER_DOMAIN", 3)
+    monkeypatch.setattr(settings, "ADAPTIVE_MAX_CONCURRENCY", 10)
+    monkeypatch.setattr(settings, "ADAPTIVE_CONCURRENCY_ENABLED", False)
+    assert limit_per_host() == 3
+    monkeypatch.setattr(settings, "ADAPTIVE_CONCURRENCY_ENABLED", True)
+    assert limit_per_host() == 10
+
+
+def test_latency_excludes_wait_for_pooled_connection(monkeypatch):
+    monkeypatch.setattr(settings, "ADAPTIVE_CONCURRENCY_ENABLED", False)
+    monkeypatch.setattr(settings, "MAX_CONCURRENT_REQUESTS_PER_DOMAIN", 1)
+    server = StubServer(pages={"index": "<html></html>"}, latency=0.2)
+    pool = HttpPool()
+    transport = AiohttpTransport()
+
+    async def request():
+        started = time.monotonic()
+        async with transport.request(server.url("index"), {}, None, 10, session=await pool.get_session()) as response:
+            await response.read()
+            return time.monotonic() - response.sent_at, time.monotonic() - started
+
+    async def scenario():
+        await server.start()
+        try:
+            return await asyncio.gather(request(), request())
+        finally:
+            await pool.close()
+            await server.stop()
+
+    (first, _), (second, second_total) = asyncio.run(scenario())
+
+    # Второй запрос ждал соединения ~0.2 с, но его задержка ответа - как у первого
+    assert second_total > 0.35
+    assert first < 0.3 and second < 0.3
@@ -0,0 +1,32 @@
+import asyncio
+
+import billiard
+
+from app.parse_executor import ParseExecutor
+
+
+def _parse_in_child(results):
+    executor = ParseExecutor(mode="process", workers=1, queue_size=1)
+    try:
+        results.put((asyncio.run(executor.run(sum, [1, 2])), executor.mode))
+    finally:
+        executor.shutdown()
+
+
+def test_process_mode_works_outside_daemons():
+    executor = ParseExecutor(mode="process", workers=1, queue_size=1)
+    try:
+        assert asyncio.run(executor.run(sum, [1, 2])) == 3
+        assert executor.mode == "process"
+    finally:
+        executor.shutdown()
+
+
+def test_process_mode_falls_back_to_threads_in_prefork_child():
+    # Процесс prefork-пула Celery - демон billiard
+    results = billiard.Queue()
+    child = billiard.Process(target=_parse_in_child, args=(results,), daemon=True)
+    child.start()
+    child.join(30)
+
+    assert results.get(timeout=5) == (3, "thread")
@@ -0,0 +1,51 @@
+import pytest
+
+from app import lxml_parser
+from app.lxml_parser import SelectorPlans, parse_html_lxml
+from app.streaming import StreamingNewsParser
+from app.tasks import parse_html
+from benchmarks.corpus import load_corpus
+
+CORPUS = load_corpus()
+
+
+@pytest.fixture
+def plans(fake_redis, monkeypatch):
+    monkeypatch.setattr(lxml_parser, "redis_client", fake_redis)
+    plans = SelectorPlans()
+    monkeypatch.setattr(lxml_parser, "selector_plans", plans)
+    return plans
+
+
+def parse_streaming(html, chunk_size=4096):
+    parser = StreamingNewsParser(max_items=10 ** 6, max_bytes=10 ** 9)
+    body = html.encode('utf-8')
+    for i in range(0, len(body), chunk_size):
+        parser.feed(body[i:i + chunk_size])
+    return parser.close()
+
+
+@pytest.mark.parametrize("page", ["index", "fallback"])
+def test_engines_agree_on_corpus(page):
+    html = CORPUS[page]
+    expected = parse_html(html)
+
+    assert expected
+    assert parse_html_lxml(html) == expected
+    assert parse_streaming(html) == expected
+
+
+def test_streaming_matches_lxml_on_huge_page():
+    # BeautifulSoup на 5000 карточках - секунды; с ним сверяются страницы выше
+    html = CORPUS["huge"]
+    assert parse_streaming(html, chunk_size=1024) == parse_html_lxml(html)
+
+
+@pytest.mark.parametrize("page", ["index", "fallback"])
+def test_learned_selector_plan_gives_same_items(page, plans):
+    html = CORPUS[page]
+    expected = parse_html(html)
+
+    assert parse_html_lxml(html, "example.com") == expected
+    # Второй разбор идёт по плану, сохранённому первым
+    assert parse_html_lxml(html, "example.com") == expected
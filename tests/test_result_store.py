@@ -0,0 +1,50 @@
+import asyncio
+import threading
+
+import pytest
+
+from app import redis_client as redis_client_module
+from app.config import settings
+from app.result_store import ResultStore
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "RESULT_STORE_ENABLED", True)
+    store = ResultStore(str(tmp_path / "results.db"))
+    store.chunk_items = 3
+    return store
+
+
+def items(count):
+    return [{"entity_title": f"News {i}", "url": f"https://example.com/{i}"} for i in range(count)]
+
+
+def test_read_items_slices_across_chunks(store):
+    store.put("t1", items(10))
+
+    assert store.info("t1")["chunk_count"] == 4
+    assert store.read_items("t1", 2, 5) == items(10)[2:7]
+    assert store.get("t1") == items(10)
+    assert store.read_items("missing") is None
+
+
+def test_purge_removes_old_results(store):
+    store.put("t1", items(1))
+    assert store.purge(older_than=-1) == 1
+    assert store.get("t1") is None
+
+
+def test_async_status_update_writes_store_off_the_event_loop(store, fake_redis, fake_async_redis, monkeypatch):
+    monkeypatch.setattr(redis_client_module, "redis_client", fake_redis)
+    monkeypatch.setattr(redis_client_module, "async_redis_client", fake_async_redis)
+    monkeypatch.setattr(redis_client_module, "result_store", store)
+    writers = []
+    put = store.put
+    monkeypatch.setattr(store, "put", lambda *args: writers.append(threading.get_ident()) or put(*args))
+
+    asyncio.run(redis_client_module.update_task_status_async("t1", "SUCCESS", items(4), error=""))
+
+    assert writers and writers[0] != threading.get_ident()
+    assert fake_redis.hget("task:t1", "item_count") == b"4"
+    assert redis_client_module.get_task_result("t1")["data"] == items(4)
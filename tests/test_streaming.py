@@ -0,0 +1,73 @@
+import asyncio
+
+from app.lxml_parser import parse_html_lxml
+from app.streaming import StreamingNewsParser
+from app.transports import TransportResponse
+from benchmarks.corpus import load_corpus
+
+HUGE = load_corpus()["huge"]
+
+
+class BodyResponse(TransportResponse):
+    """Ответ с телом из памяти; считает, сколько кусков у него забрали"""
+
+    def __init__(self, body: bytes, charset=None):
+        super().__init__(None, 200, {"Content-Type": "text/html"}, "https://example.com/", "1.1", charset)
+        self.body = body
+        self.chunks_read = 0
+        self.closed = False
+
+    async def _iter_chunked(self, size):
+        for i in range(0, len(self.body), size):
+            if self.closed:
+                return
+            self.chunks_read += 1
+            yield self.body[i:i + size]
+
+    def close(self):
+        self.closed = True
+
+
+def consume(parser, response):
+    return asyncio.run(parser.consume(response))
+
+
+def test_stops_after_max_items():
+    response = BodyResponse(HUGE.encode('utf-8'))
+    parser = StreamingNewsParser(max_items=30, max_bytes=10 ** 9, chunk_size=4096)
+    items = consume(parser, response)
+
+    assert items == parse_html_lxml(HUGE)[:30]
+    assert parser.truncated and response.closed
+    assert parser.bytes_read < len(response.body) // 10
+
+
+def test_stops_at_byte_cap():
+    response = BodyResponse(HUGE.encode('utf-8'))
+    parser = StreamingNewsParser(max_items=10 ** 6, max_bytes=256 * 1024, chunk_size=16 * 1024)
+    items = consume(parser, response)
+
+    assert parser.truncated and response.closed
+    assert 256 * 1024 <= parser.bytes_read < 256 * 1024 + 16 * 1024
+    assert 0 < len(items) < 5000
+    assert items == parse_html_lxml(HUGE)[:len(items)]
+
+
+def test_small_page_is_read_to_the_end():
+    html = load_corpus()["index"]
+    response = BodyResponse(html.encode('utf-8'))
+    parser = StreamingNewsParser(chunk_size=512)
+    items = consume(parser, response)
+
+    assert not parser.truncated and not response.closed
+    assert parser.bytes_read == len(response.body)
+    assert items == parse_html_lxml(html)
+
+
+def test_charset_is_sniffed_from_meta():
+    html = load_corpus()["index"].replace('<meta charset="utf-8">', '<meta charset="windows-1251">')
+    response = BodyResponse(html.encode('cp1251'))
+    parser = StreamingNewsParser(chunk_size=512)
+
+    assert consume(parser, response) == parse_html_lxml(html)
+    assert parser.encoding == "windows-1251"
@@ -0,0 +1,95 @@
+import asyncio
+import json
+
+import pytest
+
+from app import api
+from app import redis_client as redis_client_module
+from app.config import settings
+from app.result_store import ResultStore
+
+
+def items(count):
+    return [{"entity_title": f"News {i}", "entry_meta_date": "", "url": f"https://example.com/{i}"}
+            for i in range(count)]
+
+
+@pytest.fixture
+def redis(fake_redis, fake_async_redis, monkeypatch):
+    monkeypatch.setattr(redis_client_module, "redis_client", fake_redis)
+    monkeypatch.setattr(redis_client_module, "async_redis_client", fake_async_redis)
+    monkeypatch.setattr(settings, "RESULT_STORE_ENABLED", False)
+    monkeypatch.setattr(redis_client_module, "result_store", ResultStore())
+    return fake_redis
+
+
+@pytest.fixture
+def store(redis, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "RESULT_STORE_ENABLED", True)
+    monkeypatch.setattr(settings, "RESULT_CHUNK_ITEMS", 3)
+    store = ResultStore(str(tmp_path / "results.db"))
+    store.chunk_items = 3
+    monkeypatch.setattr(redis_client_module, "result_store", store)
+    return store
+
+
+def finish(task_id, data):
+    asyncio.run(redis_client_module.update_task_status_async(task_id, "SUCCESS", data, error=""))
+
+
+def page(task_id, cursor="0", limit=4, fields=None):
+    return asyncio.run(api.get_task_items(task_id, cursor=cursor, limit=limit, fields=fields))
+
+
+def walk(task_id, limit=4):
+    """Все страницы по next_cursor, пока он не станет None"""
+    pages, cursor = [], "0"
+    while cursor is not None:
+        response = page(task_id, cursor, limit)
+        pages.append(response)
+        cursor = response.next_cursor
+    return pages
+
+
+@pytest.mark.parametrize("backend", ["redis", "store"])
+def test_pages_end_with_empty_cursor(backend, request):
+    request.getfixturevalue(backend)
+    finish("t1", items(10))
+
+    pages = walk("t1")
+
+    assert [len(p.items) for p in pages] == [4, 4, 2]
+    assert [item for p in pages for item in p.items] == items(10)
+    assert pages[-1].next_cursor is None and all(p.total == 10 for p in pages)
+
+
+def test_exact_multiple_of_limit_has_no_extra_page(store):
+    finish("t1", items(8))
+    assert [len(p.items) for p in walk("t1")] == [4, 4]
+
+
+def test_cursor_past_the_end_returns_nothing(store):
+    finish("t1", items(3))
+    response = page("t1", cursor="10")
+    assert response.items == [] and response.next_cursor is None
+
+
+def test_empty_result_and_unknown_task(store):
+    finish("t1", [])
+    response = page("t1")
+    assert response.status == "SUCCESS" and response.total == 0 and response.next_cursor is None
+    assert page("missing").status == "PENDING"
+
+
+def test_stream_continues_from_cursor(store):
+    finish("t1", items(10))
+
+    async def read():
+        response = await api.stream_task_items("t1", cursor="4", fields="url")
+        return response, [chunk async for chunk in response.body_iterator]
+
+    response, chunks = asyncio.run(read())
+
+    assert response.headers["X-Total-Count"] == "10"
+    lines = [json.loads(line) for line in "".join(chunks).splitlines()]
+    assert lines == [{"url": item["url"]} for item in items(10)[4:]]
@@ -0,0 +1,102 @@
+import asyncio
+
+import pytest
+
+from app.http_pool import HttpPool, http_pool
+from app.streaming import StreamingNewsParser
+from app.transports import AIOHTTP, CURL_CFFI, HTTPX, TRANSPORTS, TransportRegistry, TransportTimeout
+from benchmarks.corpus import load_corpus
+from benchmarks.stub_server import StubServer
+
+INDEX = load_corpus()["index"]
+
+
+def run_with_server(scenario, **server_options):
+    """Запускает сценарий scenario(server, session) против локального StubServer"""
+    server = StubServer(pages={"index": INDEX}, **server_options)
+    pool = HttpPool()
+
+    async def main():
+        await server.start()
+        try:
+            return await scenario(server, await pool.get_session())
+        finally:
+            await pool.close()
+            await server.stop()
+
+    return asyncio.run(main())
+
+
+@pytest.mark.parametrize("name", [AIOHTTP, HTTPX, CURL_CFFI])
+def test_transports_return_the_same_page(name):
+    transport = TRANSPORTS[name]()
+
+    async def scenario(server, session):
+        try:
+            async with transport.request(server.url("index"), {}, None, 10, session=session) as response:
+                body = await response.read()
+                return response.status, response.get_encoding(), body
+        finally:
+            await transport.close()
+
+    status, encoding, body = run_with_server(scenario)
+    assert (status, encoding.lower()) == (200, "utf-8")
+    assert body == INDEX.encode('utf-8')
+
+
+@pytest.mark.parametrize("name", [AIOHTTP, HTTPX, CURL_CFFI])
+def test_streaming_parse_is_transport_independent(name):
+    transport = TRANSPORTS[name]()
+
+    async def scenario(server, session):
+        try:
+            async with transport.request(server.url("index"), {}, None, 10, session=session) as response:
+                return await StreamingNewsParser(chunk_size=1024).consume(response)
+        finally:
+            await transport.close()
+
+    items = run_with_server(scenario)
+    assert len(items) == 40
+
+
+def test_httpx_reuses_connection(monkeypatch):
+    transport = TRANSPORTS[HTTPX]()
+    monkeypatch.setattr(http_pool, "counters", type(http_pool.counters)(int))
+
+    async def scenario(server, session):
+        try:
+            for _ in range(3):
+                async with transport.request(server.url("index"), {}, None, 10) as response:
+                    await response.read()
+        finally:
+            await transport.close()
+
+    run_with_server(scenario)
+    assert http_pool.counters["httpx_requests"] == 3
+    assert http_pool.counters["httpx_connections_opened"] == 1
+
+
+@pytest.mark.parametrize("name", [HTTPX, CURL_CFFI])
+def test_timeouts_are_mapped(name):
+    transport = TRANSPORTS[name]()
+
+    async def scenario(server, session):
+        try:
+            # curl не всегда соблюдает таймауты меньше секунды
+            async with transport.request(server.url("index"), {}, None, 1.0) as response:
+                await response.read()
+        finally:
+            await transport.close()
+
+    with pytest.raises(TransportTimeout):
+        run_with_server(scenario, latency=2.0)
+
+
+def test_registry_routes_domains():
+    registry = TransportRegistry(default=AIOHTTP, domains={"example.com": HTTPX})
+
+    assert registry.name_for("example.com") == HTTPX
+    assert registry.name_for("www.example.com") == HTTPX
+    assert registry.name_for("other.com") == AIOHTTP
+    with pytest.raises(ValueError):
+        TransportRegistry(default="urllib")